@@ -0,0 +1,156 @@
+import os
+import pickle
+import pandas as pd
+from datetime import datetime
+from pathlib import Path
+
+import geoanalytics.preprocess as gp
+import geoanalytics.parallel as gpp
+from geoanalytics.geo_layer import GeometryDict
+from geoanalytics.records import MISSING
+
+
+# Каталог с контрольными точками этапов обработки
+CHECKPOINT_DIR_NAME = "checkpoints"
+# Количество пожаров, после обработки которых результаты сохраняются в контрольную точку
+CHECKPOINT_INTERVAL = 1000
+
+
+def get_checkpoint_file(stage_name, output_file_name=gp.OUTPUT_FILE_NAME):
+    """
+    Получение пути к файлу контрольной точки этапа обработки.
+    :param stage_name: название этапа обработки
+    :param output_file_name: название выходного csv-файла (контрольные точки разных запусков не смешиваются)
+    :return: путь к файлу контрольной точки
+    """
+    return Path(Path.cwd().parent, gp.DATA_DIR_NAME, CHECKPOINT_DIR_NAME,
+                Path(output_file_name).stem + "_" + stage_name + ".pkl").resolve()
+
+
+def read_checkpoint(checkpoint_file, keys=None):
+    """
+    Чтение результатов обработки пожаров из файла контрольной точки.
+    Файл читается по записям, поэтому при заданных ключах в памяти сохраняются только результаты по ним
+    (например, по пожарам одной части файла с пожарами).
+    Не дописанная при сбое последняя запись файла пропускается.
+    :param checkpoint_file: путь к файлу контрольной точки
+    :param keys: множество ключей результатов (по умолчанию читаются все результаты)
+    :return: словарь с результатами по обработанным пожарам (ключ пожара: измененные этапом поля)
+    """
+    results = dict()
+    if Path(checkpoint_file).exists():
+        with open(checkpoint_file, "rb") as file:
+            while True:
+                try:
+                    record = pickle.load(file)
+                except (EOFError, pickle.UnpicklingError):
+                    break
+                if keys is None:
+                    results.update(record)
+                else:
+                    results.update((key, item) for key, item in record.items() if key in keys)
+
+    return results
+
+
+def write_checkpoint(checkpoint_file, results):
+    """
+    Дописывание результатов обработки пожаров в файл контрольной точки.
+    :param checkpoint_file: путь к файлу контрольной точки
+    :param results: словарь с результатами по обработанным пожарам (ключ пожара: измененные этапом поля)
+    """
+    Path(checkpoint_file).parent.mkdir(parents=True, exist_ok=True)
+    with open(checkpoint_file, "ab") as file:
+        pickle.dump(results, file, protocol=pickle.HIGHEST_PROTOCOL)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def remove_checkpoint(checkpoint_file):
+    """
+    Удаление файла контрольной точки (обработка начинается заново).
+    :param checkpoint_file: путь к файлу контрольной точки
+    """
+    Path(checkpoint_file).unlink(missing_ok=True)
+
+
+def get_changed_fields(before, after):
+    """
+    Получение полей записи о пожаре, добавленных или измененных этапом обработки.
+    :param before: запись до обработки
+    :param after: запись после обработки
+    :return: словарь добавленных и измененных полей
+    """
+    changed = dict()
+    for field, value in after.items():
+        before_value = before.get(field, MISSING)
+        # Пустые значения (NaN) считаются равными друг другу
+        if before_value != value and not (before_value is not MISSING and pd.isna(before_value) is True and
+                                          pd.isna(value) is True):
+            changed[field] = value
+
+    return changed
+
+
+def process_fires_with_checkpoints(fires_dict, stage, checkpoint_file, references=None, workers=None, done=None,
+                                   checkpoint_interval=CHECKPOINT_INTERVAL, get_key=None, outputs=()):
+    """
+    Выполнение этапа обработки, обрабатывающего каждый пожар независимо от остальных (fp.determine_*),
+    с сохранением результатов в контрольную точку после каждой группы пожаров.
+    Пожары, результаты по которым уже есть в контрольной точке, повторно не обрабатываются:
+    их результаты берутся из контрольной точки. Из файла контрольной точки читаются только результаты
+    по пожарам словаря, поэтому при обработке файла с пожарами по частям в памяти хранятся результаты одной части.
+    :param fires_dict: словарь с данными по пожарам
+    :param stage: этап обработки (функция, первым аргументом принимающая словарь с данными по пожарам)
+    :param checkpoint_file: путь к файлу контрольной точки
+    :param references: словарь справочных данных (остальные аргументы этапа по названиям)
+    :param workers: количество процессов (None — обработка в текущем процессе)
+    :param done: результаты по уже обработанным пожарам (по умолчанию читаются из файла контрольной точки),
+    дополняемые результатами этапа
+    :param checkpoint_interval: количество пожаров в одной группе
+    :param get_key: функция получения ключа результата по записи о пожаре (по умолчанию результаты хранятся
+    по ключам пожаров)
+    :param outputs: названия полей, записываемых этапом: при заданном get_key результат одного пожара используется
+    для других пожаров с тем же ключом, поэтому сохраняются значения всех этих полей, а не только измененных
+    :return: дополненный словарь с данными по пожарам
+    """
+    start_full_time = datetime.now()
+    references = dict() if references is None else references
+    result_keys = {key: key if get_key is None else get_key(item) for key, item in fires_dict.items()}
+    done = read_checkpoint(checkpoint_file, set(result_keys.values())) if done is None else done
+    keys = []
+    for key, result_key in result_keys.items():
+        if result_key in done:
+            fires_dict[key].update(done[result_key])
+        else:
+            keys.append(key)
+    print("Пожаров с сохраненными результатами: " + str(len(fires_dict) - len(keys)))
+
+    def save_results(results):
+        if get_key is None:
+            # Сохраняются только поля, добавленные или измененные этапом
+            results = {key: get_changed_fields(fires_dict[key], item) for key, item in results.items()}
+        else:
+            results = {result_keys[key]: {field: item[field] for field in outputs if field in item}
+                       for key, item in results.items()}
+        write_checkpoint(checkpoint_file, results)
+        done.update(results)
+        print("Контрольная точка: " + str(len(done)))
+
+    if workers is not None:
+        # Каждая часть пожаров, обработанная пулом процессов, сохраняется в контрольную точку
+        shard_number = max(workers * gpp.SHARDS_PER_WORKER, -(-len(keys) // checkpoint_interval))
+        gpp.process_fires_in_parallel(GeometryDict((key, fires_dict[key]) for key in keys), stage, references,
+                                      workers, shard_number, save_results)
+    else:
+        for start in range(0, len(keys), checkpoint_interval):
+            group_keys = keys[start:start + checkpoint_interval]
+            group_dict = GeometryDict((key, dict(fires_dict[key])) for key in group_keys)
+            stage(group_dict, **references)
+            save_results(group_dict)
+            for key, item in group_dict.items():
+                fires_dict[key].update(item)
+    print("***************************************************")
+    print("Full time: " + str(datetime.now() - start_full_time))
+
+    return fires_dict
@@ -0,0 +1,272 @@
+import os
+import json
+import hashlib
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+import geoanalytics.preprocess as gp
+from geoanalytics.records import get_field_values
+from geoanalytics.gazetteer import NameGazetteer, normalize_name
+
+
+# Каталог с сохраненными атрибутами лесных кварталов
+DISTRICT_ATTRIBUTES_DIR_NAME = "district_attributes"
+# Поля лесного квартала, по которым определяются его атрибуты
+DISTRICT_NAME_FIELDS = ("name_in", "uch_l_ru", "dacha_ru", "kv")
+# Поля справочника классов опасности лесов
+HAZARD_CLASSES_FIELDS = ("municipality", "forest_plot", "dacha", "forest_districts", "hazard_class")
+# Поля справочника типов лесов
+FOREST_TYPES_FIELDS = ("name_in", "uch_l_ru", "dacha_ru", "kv", "forest_zone", "forest_seed_zoning_zone")
+
+# Атрибуты лесных кварталов, определенные в текущем процессе (по версиям входных данных)
+_district_attributes = dict()
+
+
+def get_district_numbers(numbers_cache, reference_key, numbers, skip_nan=False):
+    """
+    Получение количества вхождений номеров лесных кварталов в запись справочника
+    (номера приводятся к целым числам один раз для записи).
+    :param numbers_cache: словарь уже полученных номеров (по ключам записей справочника)
+    :param reference_key: ключ записи справочника
+    :param numbers: список номеров лесных кварталов записи справочника (строки)
+    :param skip_nan: пропускать номера "nan"
+    :return: счетчик номеров лесных кварталов
+    """
+    if reference_key not in numbers_cache:
+        numbers_cache[reference_key] = Counter(int(number) for number in numbers
+                                               if str(number) and not (skip_nan and str(number) == "nan"))
+
+    return numbers_cache[reference_key]
+
+
+def get_district_number(fd_kv):
+    """
+    Приведение номера лесного квартала к целому числу.
+    :param fd_kv: номер лесного квартала
+    :return: номер лесного квартала или None, если номер не задан
+    """
+    try:
+        return int(fd_kv)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def get_version(forest_districts_dict, reference_dict, reference_fields):
+    """
+    Получение версии входных данных (хэш названий и номеров лесных кварталов и полей справочника).
+    :param forest_districts_dict: словарь с данными по лесным кварталам
+    :param reference_dict: словарь справочника
+    :param reference_fields: используемые поля справочника
+    :return: строка с версией входных данных
+    """
+    version_hash = hashlib.sha1()
+    version_hash.update(repr(list(forest_districts_dict.keys())).encode("utf-8"))
+    for field in DISTRICT_NAME_FIELDS:
+        version_hash.update(repr(get_field_values(forest_districts_dict, field).tolist()).encode("utf-8"))
+    version_hash.update(repr(list(reference_dict.keys())).encode("utf-8"))
+    for field in reference_fields:
+        version_hash.update(repr(get_field_values(reference_dict, field).tolist()).encode("utf-8"))
+
+    return version_hash.hexdigest()
+
+
+def get_attributes_file(name, version):
+    """
+    Получение пути к csv-файлу с атрибутами лесных кварталов.
+    :param name: название набора атрибутов ("hazard_classes" или "forest_types")
+    :param version: версия входных данных
+    :return: путь к csv-файлу
+    """
+    return Path(Path.cwd().parent, gp.DATA_DIR_NAME, DISTRICT_ATTRIBUTES_DIR_NAME,
+                name + "_" + version[:16] + ".csv").resolve()
+
+
+def read_attributes(attributes_file, keys, columns):
+    """
+    Чтение атрибутов лесных кварталов из csv-файла.
+    :param attributes_file: путь к csv-файлу
+    :param keys: ключи лесных кварталов
+    :param columns: названия столбцов с атрибутами (списками в формате JSON)
+    :return: словарь атрибутов по ключам лесных кварталов или None, если файл отсутствует или не соответствует
+    """
+    if not attributes_file.exists():
+        return None
+    data = pd.read_csv(attributes_file, sep=";", header=0, index_col=False, dtype=str, keep_default_na=False)
+    if len(data) != len(keys):
+        return None
+    values = [data["kv"].tolist()] + [[json.loads(value) for value in data[column].tolist()] for column in columns]
+
+    return dict(zip(keys, zip(*values)))
+
+
+def save_attributes(attributes_file, attributes, columns):
+    """
+    Сохранение атрибутов лесных кварталов в csv-файл.
+    :param attributes_file: путь к csv-файлу
+    :param attributes: словарь атрибутов по ключам лесных кварталов
+    :param columns: названия столбцов с атрибутами (списками в формате JSON)
+    """
+    attributes_file.parent.mkdir(parents=True, exist_ok=True)
+    data = {"id": list(attributes.keys()), "kv": [values[0] for values in attributes.values()]}
+    for index, column in enumerate(columns):
+        data[column] = [json.dumps(values[index + 1], ensure_ascii=False) for values in attributes.values()]
+    # Файл записывается под временным именем и переименовывается (параллельные процессы не читают его частично)
+    temporary_file = attributes_file.with_name(attributes_file.name + "." + str(os.getpid()) + ".tmp")
+    pd.DataFrame(data).to_csv(temporary_file, sep=";", index=False)
+    os.replace(temporary_file, attributes_file)
+
+
+def materialize_attributes(name, forest_districts_dict, reference_dict, reference_fields, columns, determine):
+    """
+    Определение атрибутов всех лесных кварталов (один раз для версии входных данных) с сохранением в csv-файл.
+    :param name: название набора атрибутов
+    :param forest_districts_dict: словарь с данными по лесным кварталам
+    :param reference_dict: словарь справочника
+    :param reference_fields: используемые поля справочника
+    :param columns: названия атрибутов
+    :param determine: функция определения атрибутов лесного квартала
+    :return: словарь атрибутов по ключам лесных кварталов (строка с названиями квартала и списки атрибутов)
+    """
+    version = get_version(forest_districts_dict, reference_dict, reference_fields)
+    if (name, version) not in _district_attributes:
+        start_full_time = datetime.now()
+        attributes_file = get_attributes_file(name, version)
+        attributes = read_attributes(attributes_file, list(forest_districts_dict.keys()), columns)
+        if attributes is None:
+            determine_attributes = determine(reference_dict)
+            attributes = {key: determine_attributes(item) for key, item in forest_districts_dict.items()}
+            save_attributes(attributes_file, attributes, columns)
+        _district_attributes[(name, version)] = attributes
+        print("Атрибуты лесных кварталов (" + name + "): " + str(datetime.now() - start_full_time))
+
+    return _district_attributes[(name, version)]
+
+
+def get_district_description(forest_district_item):
+    """
+    Получение строки с названиями лесничества, участкового лесничества, дачи и номером лесного квартала.
+    :param forest_district_item: запись о лесном квартале
+    :return: строка с названиями и номером лесного квартала
+    """
+    return str([forest_district_item["name_in"], forest_district_item["uch_l_ru"], forest_district_item["dacha_ru"],
+                forest_district_item["kv"]])
+
+
+def determine_hazard_classes(forest_hazard_classes_dict):
+    """
+    Получение функции определения классов опасности лесного квартала и кодов результата сопоставления:
+    0 — класс опасности определен, 1 — номер квартала не найден, 2, 4, 6 — не найдены лесничество,
+    участковое лесничество, дача, 3, 5, 7 — не заданы лесничество, участковое лесничество, дача.
+    :param forest_hazard_classes_dict: словарь с данными по классам опасностей лесов
+    :return: функция, возвращающая для записи о лесном квартале строку с его названиями, список классов опасности
+    и список кодов
+    """
+    hazard_classes_gazetteer = NameGazetteer(forest_hazard_classes_dict, ("municipality", "forest_plot", "dacha"))
+    numbers_cache = dict()
+
+    def determine(forest_district_item):
+        forest_hazard_classes = []
+        flag = []
+        description = get_district_description(forest_district_item)
+        try:
+            fd_municipality = normalize_name(forest_district_item["name_in"])
+            if fd_municipality is None:
+                flag.append(3)
+            fd_forest_plot = normalize_name(forest_district_item["uch_l_ru"])
+            if fd_forest_plot is None:
+                flag.append(5)
+            fd_dacha = normalize_name(forest_district_item["dacha_ru"])
+            if fd_dacha is None:
+                flag.append(7)
+            if fd_municipality is not None and fd_forest_plot is not None and fd_dacha is not None:
+                fd_kv = get_district_number(forest_district_item["kv"])
+                exist_kv = False
+                # Классы опасности с суммарным расстоянием Левенштейна названий меньше 4 и номером квартала
+                for forest_hazard_classes_key in hazard_classes_gazetteer.search(fd_municipality, fd_forest_plot,
+                                                                                 fd_dacha):
+                    forest_hazard_classes_item = forest_hazard_classes_dict[forest_hazard_classes_key]
+                    number_count = get_district_numbers(numbers_cache, forest_hazard_classes_key,
+                                                        forest_hazard_classes_item["forest_districts"])[fd_kv]
+                    forest_hazard_classes.extend([str(forest_hazard_classes_item["hazard_class"])] * number_count)
+                    flag.extend([0] * number_count)
+                    exist_kv = exist_kv or number_count != 0
+                if not exist_kv:
+                    flag.append(1)
+                if not hazard_classes_gazetteer.contains(0, fd_municipality):
+                    flag.append(2)
+                if not hazard_classes_gazetteer.contains(1, fd_forest_plot):
+                    flag.append(4)
+                if not hazard_classes_gazetteer.contains(2, fd_dacha):
+                    flag.append(6)
+        except UnicodeEncodeError:
+            print("Проблема с кодировкой.")
+
+        return description, forest_hazard_classes, flag
+
+    return determine
+
+
+def determine_forest_types(forest_types_dict):
+    """
+    Получение функции определения лесорастительных зон и лесосеменных районов лесного квартала.
+    :param forest_types_dict: словарь с данными по типам лесов
+    :return: функция, возвращающая для записи о лесном квартале строку с его названиями, список лесорастительных
+    зон и список лесосеменных районов
+    """
+    forest_types_gazetteer = NameGazetteer(forest_types_dict, ("name_in", "uch_l_ru", "dacha_ru"))
+    numbers_cache = dict()
+
+    def determine(forest_district_item):
+        forest_zones = []
+        forest_seed_zoning_zones = []
+        description = get_district_description(forest_district_item)
+        try:
+            fd_municipality = normalize_name(forest_district_item["name_in"])
+            fd_forest_plot = normalize_name(forest_district_item["uch_l_ru"])
+            fd_dacha = normalize_name(forest_district_item["dacha_ru"])
+            fd_kv = forest_district_item["kv"]
+            if fd_municipality is not None and fd_forest_plot is not None and fd_dacha is not None and \
+                    str(fd_kv) != "nan":
+                fd_kv = get_district_number(fd_kv)
+                # Типы лесов с суммарным расстоянием Левенштейна названий меньше 4 и номером квартала
+                for forest_types_key in forest_types_gazetteer.search(fd_municipality, fd_forest_plot, fd_dacha):
+                    forest_types_item = forest_types_dict[forest_types_key]
+                    number_count = get_district_numbers(numbers_cache, forest_types_key, forest_types_item["kv"],
+                                                        True)[fd_kv]
+                    forest_zones.extend([str(forest_types_item["forest_zone"])] * number_count)
+                    forest_seed_zoning_zones.extend([str(forest_types_item["forest_seed_zoning_zone"])] *
+                                                    number_count)
+        except UnicodeEncodeError:
+            print("Проблема с кодировкой в строке.")
+
+        return description, forest_zones, forest_seed_zoning_zones
+
+    return determine
+
+
+def get_forest_district_hazard_classes(forest_districts_dict, forest_hazard_classes_dict):
+    """
+    Получение классов опасности лесов и кодов результата сопоставления для всех лесных кварталов
+    (определяются один раз и сохраняются в csv-файл в каталоге "district_attributes").
+    :param forest_districts_dict: словарь с данными по лесным кварталам
+    :param forest_hazard_classes_dict: словарь с данными по классам опасностей лесов
+    :return: словарь по ключам лесных кварталов: (строка с названиями квартала, классы опасности, коды)
+    """
+    return materialize_attributes("hazard_classes", forest_districts_dict, forest_hazard_classes_dict,
+                                  HAZARD_CLASSES_FIELDS, ("hazard_classes", "flag"), determine_hazard_classes)
+
+
+def get_forest_district_forest_types(forest_districts_dict, forest_types_dict):
+    """
+    Получение лесорастительных зон и лесосеменных районов для всех лесных кварталов
+    (определяются один раз и сохраняются в csv-файл в каталоге "district_attributes").
+    :param forest_districts_dict: словарь с данными по лесным кварталам
+    :param forest_types_dict: словарь с данными по типам лесов
+    :return: словарь по ключам лесных кварталов: (строка с названиями квартала, лесорастительные зоны,
+    лесосеменные районы)
+    """
+    return materialize_attributes("forest_types", forest_districts_dict, forest_types_dict, FOREST_TYPES_FIELDS,
+                                  ("forest_zone", "forest_seed_zoning_zones"), determine_forest_types)
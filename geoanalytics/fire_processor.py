@@ -1,15 +1,20 @@
-import re
+import numpy as np
+import pandas as pd
 import shapely
 import shapely.wkb
-import shapely.wkt
-from shapely.geometry import Point
-from shapely.ops import cascaded_union
-from shapely.errors import WKBReadingError
+from shapely.ops import unary_union
 from datetime import datetime
-from Levenshtein._levenshtein import distance
 
-import geoanalytics.preprocess as gp
-from geoanalytics.geo_utilitys import get_area, get_min_distance, nearest, get_distance
+from geoanalytics.geo_layer import get_geometry_layer
+from geoanalytics.records import get_field_values
+from geoanalytics.geo_utilitys import get_area, get_distance
+from geoanalytics.snowiness import SnowinessIndex
+from geoanalytics.district_attributes import get_forest_district_hazard_classes, get_forest_district_forest_types
+from geoanalytics.weather_store import WEATHER_COLUMNS, get_weather_series, get_weather_conditions_series, \
+    get_weather_hazard_classes, get_daily_weather_values, get_datetimes, group_by_station
+from geoanalytics.station_registry import get_weather_stations_with_data
+from geoanalytics.spatial_index import NearestFeatureIndex, SpatioTemporalIndex, WeatherStationIndex, \
+    get_spatial_join, get_intersection_components, get_days, get_day
 
 
 def determine_area_and_distances(fires_dict, car_roads_dict, railways_dict, rivers_dict, lakes_dict):
@@ -24,25 +29,34 @@ def determine_area_and_distances(fires_dict, car_roads_dict, railways_dict, rive
     :return: дополненный словарь с данными по пожарам
     """
     start_full_time = datetime.now()
-    for fire_item in fires_dict.values():
+    # Построение пространственных индексов по слоям (один раз для всех пожаров)
+    car_roads_index = NearestFeatureIndex(car_roads_dict)
+    railways_index = NearestFeatureIndex(railways_dict)
+    rivers_index = NearestFeatureIndex(rivers_dict)
+    lakes_index = NearestFeatureIndex(lakes_dict)
+    print("Index time: " + str(datetime.now() - start_full_time))
+    fires_layer = get_geometry_layer(fires_dict, "poly")
+    # Перепроецирование полигонов пожаров (один раз для каждого пожара)
+    fires_projected_layer = fires_layer.projected()
+    for fire_key, fire_item in fires_dict.items():
         start_time = datetime.now()
-        try:
-            # Получение полигона пожара
-            fire_polygon = shapely.wkb.loads(fire_item["poly"], hex=True)
+        # Получение полигона пожара
+        fire_polygon = fires_layer.geometry(fire_key)
+        if fire_polygon is not None:
             # Получение площади полигона пожара
             fire_polygon_area = get_area(fire_polygon)
             fire_item["area"] = "{:.3f}".format(fire_polygon_area)
+            # Получение полигона пожара в метрах
+            fire_polygon_in_meters = fires_projected_layer.geometry(fire_key)
             # Получение минимального расстояния текущего полигона с пожаром до автомобильной дороги
-            fire_item["distance_to_car_road"] = get_min_distance(fire_polygon, car_roads_dict)
+            fire_item["distance_to_car_road"] = car_roads_index.get_min_distance(fire_polygon_in_meters)
             # Получение минимального расстояния текущего полигона с пожаром до железной дороги
-            fire_item["distance_to_railway"] = get_min_distance(fire_polygon, railways_dict)
+            fire_item["distance_to_railway"] = railways_index.get_min_distance(fire_polygon_in_meters)
             # Получение минимального расстояния текущего полигона с пожаром до реки
-            fire_item["distance_to_river"] = get_min_distance(fire_polygon, rivers_dict)
+            fire_item["distance_to_river"] = rivers_index.get_min_distance(fire_polygon_in_meters)
             # Получение минимального расстояния текущего полигона с пожаром до озера
-            fire_item["distance_to_lake"] = get_min_distance(fire_polygon, lakes_dict)
+            fire_item["distance_to_lake"] = lakes_index.get_min_distance(fire_polygon_in_meters)
             print(str(fire_item["new_fire_id"]) + ": " + str(datetime.now() - start_time))
-        except WKBReadingError:
-            print("Не удалось создать геометрию из-за ошибок при чтении.")
     print("***************************************************")
     print("Full time: " + str(datetime.now() - start_full_time))
 
@@ -58,30 +72,31 @@ def determine_average_population_density(fires_dict, population_density_dict):
     :return: дополненный словарь с данными по пожарам
     """
     start_full_time = datetime.now()
-    for fire_item in fires_dict.values():
+    fires_layer = get_geometry_layer(fires_dict, "poly")
+    population_density_layer = get_geometry_layer(population_density_dict, "geom")
+    for fire_key, fire_item in fires_dict.items():
         # Получение полигона пожара
-        fire_polygon = shapely.wkb.loads(fire_item["poly"], hex=True)
+        fire_polygon = fires_layer.geometry(fire_key)
         municipalities = ""
         average_population_density = 0
         full_population_density = 0
         counter = 0
-        for population_density_item in population_density_dict.values():
-            try:
-                # Получение полигона муниципального образования
-                population_density_polygon = shapely.wkb.loads(population_density_item["geom"], hex=True)
-                # Если есть пересечение полигона пожара с полигоном муниципального образования
-                if fire_polygon.intersects(population_density_polygon):
-                    if municipalities == "":
-                        municipalities = population_density_item["name"]
-                    else:
-                        municipalities += ", " + population_density_item["name"]
-                    try:
-                        full_population_density += float(population_density_item["population_density_2016"])
-                    except ValueError:
-                        print("Не удалось преобразовать строку в число с плавающей запятой.")
-                    counter += 1
-            except WKBReadingError:
-                print("Не удалось создать геометрию из-за ошибок при чтении.")
+        for population_density_key, population_density_item in population_density_dict.items():
+            # Получение полигона муниципального образования
+            population_density_polygon = population_density_layer.geometry(population_density_key)
+            if fire_polygon is None or population_density_polygon is None:
+                continue
+            # Если есть пересечение полигона пожара с полигоном муниципального образования
+            if fire_polygon.intersects(population_density_polygon):
+                if municipalities == "":
+                    municipalities = population_density_item["name"]
+                else:
+                    municipalities += ", " + population_density_item["name"]
+                try:
+                    full_population_density += float(population_density_item["population_density_2016"])
+                except ValueError:
+                    print("Не удалось преобразовать строку в число с плавающей запятой.")
+                counter += 1
         # Вычисление средней плотности населения
         if counter != 0:
             average_population_density = full_population_density / counter
@@ -101,22 +116,23 @@ def determine_intersection_with_forestry(fires_dict, forestry_dict):
     :return: дополненный словарь с данными по пожарам
     """
     start_full_time = datetime.now()
-    for fire_item in fires_dict.values():
+    fires_layer = get_geometry_layer(fires_dict, "poly")
+    forestry_layer = get_geometry_layer(forestry_dict, "geom")
+    for fire_key, fire_item in fires_dict.items():
         # Получение полигона пожара
-        fire_polygon = shapely.wkb.loads(fire_item["poly"], hex=True)
+        fire_polygon = fires_layer.geometry(fire_key)
         forestry = ""
-        for forestry_item in forestry_dict.values():
-            try:
-                # Получение полигона лесничества
-                forestry_polygon = shapely.wkb.loads(forestry_item["geom"], hex=True)
-                # Если есть пересечение полигона пожара с полигоном лесничества
-                if fire_polygon.intersects(forestry_polygon):
-                    if forestry == "":
-                        forestry = forestry_item["frname"]
-                    else:
-                        forestry += ", " + forestry_item["frname"]
-            except WKBReadingError:
-                print("Не удалось создать геометрию из-за ошибок при чтении.")
+        for forestry_key, forestry_item in forestry_dict.items():
+            # Получение полигона лесничества
+            forestry_polygon = forestry_layer.geometry(forestry_key)
+            if fire_polygon is None or forestry_polygon is None:
+                continue
+            # Если есть пересечение полигона пожара с полигоном лесничества
+            if fire_polygon.intersects(forestry_polygon):
+                if forestry == "":
+                    forestry = forestry_item["frname"]
+                else:
+                    forestry += ", " + forestry_item["frname"]
         # Формирование данных по лесничествам
         fire_item["forestry"] = forestry
     print("Full time: " + str(datetime.now() - start_full_time))
@@ -126,51 +142,25 @@ def determine_intersection_with_forestry(fires_dict, forestry_dict):
 
 def determine_nearest_weather_station_to_fire(fires_dict, weather_stations_dict):
     """
-    Определение ближайших к пожарам метеостанций.
+    Определение ближайших к пожарам метеостанций (по геодезическому расстоянию).
+    Учитываются только метеостанции, по которым есть данные о погоде и об условиях погоды.
     :param fires_dict: словарь с данными по пожарам
     :param weather_stations_dict: словарь с данными по метеостанциям
     :return: дополненный словарь с данными по пожарам
     """
     start_full_time = datetime.now()
-    for fire_item in fires_dict.values():
-        weather_stations = dict()
-        # Получение точки пожара по координатам
-        fire_point = Point(float(fire_item["lat"]), float(fire_item["lon"]))
-        # Определение расстояния от метеостанции к текущему пожару по координатам
-        for geom_item in weather_stations_dict.values():
-            try:
-                # Получение точки метеостанции по координатам
-                weather_station_point = Point(float(geom_item["latitude"]), float(geom_item["longitude"]))
-                # Формирование словаря расстояний до метеостанций
-                weather_stations[fire_point.distance(weather_station_point)] = [int(geom_item["weather_station_id"]),
-                                                                                geom_item["weather_station_name"]]
-            except WKBReadingError:
-                print("Не удалось создать геометрию из-за ошибок при чтении.")
-        # Сортировка метеостанций по расстояниям
-        weather_stations = dict(sorted(weather_stations.items(), key=lambda item: item[0]))
-        # Обход метеостанций
-        for weather_station in weather_stations.values():
-            exist_weather_station = False
-            # Получение списка csv-файлов с информацией о погоде из каталога "weather_data"
-            weather_file_list = gp.get_csv_file_list(gp.WEATHER_DIR_NAME)
-            # Обход списка csv-файлов с информацией о погоде
-            for weather_file_name in weather_file_list:
-                # Если csv-файл относится к искомой метеостанции
-                if weather_file_name.find(str(weather_station[0])) != -1:
-                    exist_weather_station = True
-            exist_weather_conditions_station = False
-            # Получение списка csv-файлов с информацией о погоде из каталога "kp_po_forcast"
-            weather_conditions_file_list = gp.get_csv_file_list(gp.WEATHER_CONDITIONS_DIR_NAME)
-            # Обход списка csv-файлов с информацией о погоде
-            for weather_conditions_file_name in weather_conditions_file_list:
-                # Если csv-файл относится к искомой метеостанции
-                if weather_conditions_file_name.find(str(weather_station[0])) != -1:
-                    exist_weather_conditions_station = True
-            if exist_weather_station and exist_weather_conditions_station:
-                # Формирование данных по метеостанции
-                fire_item["weather_station_id"] = int(weather_station[0])
-                fire_item["weather_station_name"] = weather_station[1]
-                break
+    # Построение индекса по метеостанциям, по которым есть данные
+    weather_station_ids = get_weather_stations_with_data(
+        get_field_values(weather_stations_dict, "weather_station_id"))
+    weather_stations_index = WeatherStationIndex(weather_stations_dict, weather_station_ids)
+    if len(weather_stations_index) != 0:
+        # Поиск ближайшей метеостанции сразу для всех пожаров
+        indices, _ = weather_stations_index.query(get_field_values(fires_dict, "lat").astype(float),
+                                                  get_field_values(fires_dict, "lon").astype(float))
+        for fire_item, index in zip(fires_dict.values(), indices[:, 0].tolist()):
+            # Формирование данных по метеостанции
+            fire_item["weather_station_id"] = weather_stations_index.ids[index]
+            fire_item["weather_station_name"] = weather_stations_index.names[index]
 
     print("Full time: " + str(datetime.now() - start_full_time))
 
@@ -179,44 +169,24 @@ def determine_nearest_weather_station_to_fire(fires_dict, weather_stations_dict)
 
 def determine_weather_characteristics(fires_dict):
     """
-    Определение характеристик погоды по метеостанциям.
+    Определение характеристик погоды по метеостанциям (по ближайшему по времени к пожару наблюдению).
     :param fires_dict: словарь с данными по пожарам
     :return: дополненный словарь с данными по пожарам
     """
     start_full_time = datetime.now()
-    # Получение списка csv-файлов с информацией о погоде из каталога "weather_data"
-    weather_file_list = gp.get_csv_file_list(gp.WEATHER_DIR_NAME)
-    # Обход словаря с пожарами
-    for fire_item in fires_dict.values():
+    # Обход пожаров, сгруппированных по метеостанциям
+    for weather_station_id, fire_items in group_by_station(fires_dict.values()).items():
         start_time = datetime.now()
-        # Обход списка csv-файлов с информацией о погоде
-        for weather_file_name in weather_file_list:
-            # Поиск подстроки (номера метеостанции) в названии csv-файла электронной таблицы
-            index = weather_file_name.find(str(fire_item["weather_station_id"]))
-            # Если csv-файл относится к искомой метеостанции
-            if index != -1:
-                print(weather_file_name)
-                # Определение строки с характеристиками погоды по ближайшей дате и времени с пожаром
-                weather_csv_data = gp.get_csv_data(weather_file_name, gp.WEATHER_DIR_NAME)
-                weather_dict = gp.get_weather_dict(weather_csv_data)
-                weather_datetime = []
-                for weather_item in weather_dict.values():
-                    weather_datetime.append(datetime.strptime(str(weather_item["datetime"]), '%d.%m.%Y %H:%M'))
-                nearest_datetime = nearest(weather_datetime, datetime.strptime(fire_item["dt"], '%d.%m.%Y %H:%M'))
-                for weather_item in weather_dict.values():
-                    if datetime.strptime(weather_item["datetime"], '%d.%m.%Y %H:%M') == nearest_datetime:
-                        # Формирование характеристик по погоде
-                        fire_item["RRR"] = weather_item["RRR"]
-                        fire_item["Ff"] = weather_item["Ff"]
-                        fire_item["U"] = weather_item["U"]
-                        fire_item["T"] = weather_item["T"]
-                        fire_item["Td"] = weather_item["Td"]
-                        fire_item["DD"] = weather_item["DD"]
-                        fire_item["WW"] = weather_item["WW"]
-                        fire_item["W1"] = weather_item["W1"]
-                        fire_item["W2"] = weather_item["W2"]
-                        fire_item["Po"] = weather_item["Po"]
-        print(str(fire_item["new_fire_id"]) + ": " + str(datetime.now() - start_time))
+        weather_series = get_weather_series(weather_station_id)
+        if weather_series is not None and len(weather_series.times) != 0:
+            # Определение строк с характеристиками погоды по ближайшей дате и времени с пожарами
+            rows = weather_series.get_nearest(get_datetimes(fire_item["dt"] for fire_item in fire_items))
+            # Формирование характеристик по погоде
+            for column in WEATHER_COLUMNS:
+                if column not in ["Tn", "Tx"]:
+                    for fire_item, value in zip(fire_items, weather_series.get_values(column, rows)):
+                        fire_item[column] = value
+        print(str(weather_station_id) + ": " + str(datetime.now() - start_time))
     print("***************************************************")
     print("Full time: " + str(datetime.now() - start_full_time))
 
@@ -234,105 +204,27 @@ def determine_hazard_classes_by_forest_districts(fires_dict, forest_districts_di
     start_full_time = datetime.now()
     defined_hazard_class_number = 0
     fire_number = 0
-    for fire_item in fires_dict.values():
+    # Классы опасности лесов для всех лесных кварталов (определяются один раз и сохраняются)
+    district_hazard_classes = get_forest_district_hazard_classes(forest_districts_dict, forest_hazard_classes_dict)
+    # Определение пар пересекающихся пожаров и лесных кварталов (вычисляется один раз для пары слоев)
+    fire_district_join = get_spatial_join(get_geometry_layer(fires_dict, "poly"),
+                                          get_geometry_layer(forest_districts_dict, "geom"))
+    for fire_key, fire_item in fires_dict.items():
         start_time = datetime.now()
         fire_number += 1
-        # Получение полигона пожара
-        fire_polygon = shapely.wkb.loads(fire_item["poly"], hex=True)
         forest_districts = ""
         forest_hazard_classes = []
         flag = []
-        for forest_district_item in forest_districts_dict.values():
-            try:
-                # Получение полигона лесного квартала
-                forest_district_polygon = shapely.wkb.loads(forest_district_item["geom"], hex=True)
-                # Если есть пересечение полигона пожара с полигоном лесного квартала
-                if fire_polygon.intersects(forest_district_polygon):
-                    fd_municipality = forest_district_item["name_in"]
-                    fd_forest_plot = forest_district_item["uch_l_ru"]
-                    fd_dacha = forest_district_item["dacha_ru"]
-                    fd_kv = forest_district_item["kv"]
-
-                    # Формирование строки с лесными кварталами затронутых пожарами
-                    if forest_districts == "":
-                        forest_districts = str([fd_municipality, fd_forest_plot, fd_dacha, fd_kv])
-                    else:
-                        forest_districts += ", " + str([fd_municipality, fd_forest_plot, fd_dacha, fd_kv])
-
-                    #
-                    if str(fd_municipality) != "nan":
-                        fd_municipality = re.sub(r"[-']", "", fd_municipality)
-                        fd_municipality = fd_municipality.lower()
-                    else:
-                        flag.append(3)
-                    if str(fd_forest_plot) != "nan":
-                        fd_forest_plot = re.sub(r"[-']", "", fd_forest_plot)
-                        fd_forest_plot = fd_forest_plot.lower()
-                    else:
-                        flag.append(5)
-                    if str(fd_dacha) != "nan":
-                        fd_dacha = re.sub(r"[-']", "", fd_dacha)
-                        fd_dacha = fd_dacha.lower()
-                    else:
-                        flag.append(7)
-
-                    if str(fd_municipality) != "nan" and str(fd_forest_plot) != "nan" and str(fd_dacha) != "nan":
-                        exist_municipality = False
-                        exist_forest_plot = False
-                        exist_dacha = False
-                        exist_kv = False
-
-                        # Обход данных по классам опасностей лесов
-                        for forest_hazard_classes_item in forest_hazard_classes_dict.values():
-                            fhc_municipality = forest_hazard_classes_item["municipality"]
-                            fhc_municipality = re.sub(r"[-']", "", fhc_municipality)
-                            fhc_municipality = fhc_municipality.lower()
-
-                            fhc_forest_plot = forest_hazard_classes_item["forest_plot"]
-                            fhc_forest_plot = re.sub(r"[-']", "", fhc_forest_plot)
-                            fhc_forest_plot = fhc_forest_plot.lower()
-
-                            fhc_dacha = forest_hazard_classes_item["dacha"]
-                            fhc_dacha = re.sub(r"[-']", "", fhc_dacha)
-                            fhc_dacha = fhc_dacha.lower()
-
-                            if fhc_municipality == fd_municipality:
-                                exist_municipality = True
-                            if fhc_forest_plot == fd_forest_plot:
-                                exist_forest_plot = True
-                            if fhc_dacha == fd_dacha:
-                                exist_dacha = True
-
-                            # Вычисление расстояния Левенштейна
-                            levenshtein_distance_for_municipality = distance(fhc_municipality, fd_municipality)
-                            # Вычисление расстояния Левенштейна
-                            levenshtein_distance_for_forest_plot = distance(fhc_forest_plot, fd_forest_plot)
-                            # Вычисление расстояния Левенштейна
-                            levenshtein_distance_for_dacha = distance(fhc_dacha, fd_dacha)
-                            total_levenshtein_distance = levenshtein_distance_for_municipality + \
-                                                         levenshtein_distance_for_forest_plot + \
-                                                         levenshtein_distance_for_dacha
-                            if total_levenshtein_distance < 4:
-                                for forest_district_number in forest_hazard_classes_item["forest_districts"]:
-                                    if str(fd_kv) and str(forest_district_number):
-                                        if int(forest_district_number) == int(fd_kv):
-                                            # Формирование списка определенных классов опасности лесов
-                                            forest_hazard_classes.append(str(forest_hazard_classes_item["hazard_class"]))
-                                            flag.append(0)
-                                            exist_kv = True
-
-                        if not exist_kv:
-                            flag.append(1)
-                        if not exist_municipality:
-                            flag.append(2)
-                        if not exist_forest_plot:
-                            flag.append(4)
-                        if not exist_dacha:
-                            flag.append(6)
-            except WKBReadingError:
-                print("Не удалось создать геометрию из-за ошибок при чтении.")
-            except UnicodeEncodeError:
-                print("Проблема с кодировкой.")
+        # Обход лесных кварталов, пересекающихся с полигоном пожара
+        for forest_district_key in fire_district_join.get_right_keys(fire_key):
+            description, district_forest_hazard_classes, district_flag = district_hazard_classes[forest_district_key]
+            # Формирование строки с лесными кварталами затронутых пожарами
+            if forest_districts == "":
+                forest_districts = description
+            else:
+                forest_districts += ", " + description
+            forest_hazard_classes.extend(district_forest_hazard_classes)
+            flag.extend(district_flag)
 
         # Формирование данных по лесным кварталам
         fire_item["kv"] = forest_districts
@@ -357,48 +249,25 @@ def determine_hazard_classes_by_forest_districts(fires_dict, forest_districts_di
 
 def determine_hazard_classes_by_weather(fires_dict):
     """
-    Определение класса пожарной опасности по условиям погоды.
+    Определение класса пожарной опасности по условиям погоды (по ближайшему по времени к пожару прогнозу).
     :param fires_dict: словарь с данными по пожарам
     :return: дополненный словарь с данными по пожарам
     """
     start_full_time = datetime.now()
-    for fire_item in fires_dict.values():
+    # Обход пожаров, сгруппированных по метеостанциям
+    for weather_station_id, fire_items in group_by_station(fires_dict.values()).items():
         start_time = datetime.now()
-        weather_conditions_dict = dict()
-        # Получение списка csv-файлов с информацией по погодным условиям (прогноз погоды)
-        weather_conditions_list = gp.get_csv_file_list(gp.WEATHER_CONDITIONS_DIR_NAME)
-        # Обход списка csv-файлов с информацией по погодным условиям (прогноз погоды)
-        for weather_conditions_file_name in weather_conditions_list:
-            # Если csv-файл относится к искомой метеостанции
-            if weather_conditions_file_name.find(str(fire_item["weather_station_id"])) != -1:
-                # Получение данных по погодным условиям (прогноз погоды)
-                weather_conditions_csv_data = gp.get_csv_data(weather_conditions_file_name,
-                                                              gp.WEATHER_CONDITIONS_DIR_NAME)
-                weather_conditions_dict = gp.get_weather_conditions_dict(weather_conditions_csv_data)
-        if weather_conditions_dict:
-            weather_datetime = []
-            for weather_conditions_item in weather_conditions_dict.values():
-                weather_datetime.append(datetime.strptime(str(weather_conditions_item["datetime"]),
-                                                          "%Y-%m-%d %H:%M:%S"))
-            nearest_datetime = nearest(weather_datetime, datetime.strptime(fire_item["dt"], "%d.%m.%Y %H:%M"))
-            for weather_conditions_item in weather_conditions_dict.values():
-                if datetime.strptime(weather_conditions_item["datetime"], "%Y-%m-%d %H:%M:%S") == nearest_datetime:
-                    # Определение класса опасности
-                    fire_item["weather_hazard_class"] = ""
-                    if float(weather_conditions_item["kp"]) <= 300:
-                        fire_item["weather_hazard_class"] = "I"
-                    if 301 <= float(weather_conditions_item["kp"]) <= 1000:
-                        fire_item["weather_hazard_class"] = "II"
-                    if 1001 <= float(weather_conditions_item["kp"]) <= 4000:
-                        fire_item["weather_hazard_class"] = "III"
-                    if 4001 <= float(weather_conditions_item["kp"]) <= 10000:
-                        fire_item["weather_hazard_class"] = "IV"
-                    if float(weather_conditions_item["kp"]) > 10000:
-                        fire_item["weather_hazard_class"] = "V"
-                    print("Класс опасности: " + fire_item["weather_hazard_class"])
+        weather_conditions_series = get_weather_conditions_series(weather_station_id)
+        if weather_conditions_series is not None and len(weather_conditions_series.times) != 0:
+            # Определение строк с погодными условиями по ближайшей дате и времени с пожарами
+            rows = weather_conditions_series.get_nearest(get_datetimes(fire_item["dt"] for fire_item in fire_items))
+            # Определение класса опасности
+            hazard_classes = get_weather_hazard_classes(weather_conditions_series.get_values("kp", rows))
+            for fire_item, hazard_class in zip(fire_items, hazard_classes):
+                fire_item["weather_hazard_class"] = hazard_class
         else:
             print("Класс опасности не определен!")
-        print(str(fire_item["new_fire_id"]) + ": " + str(datetime.now() - start_time))
+        print(str(weather_station_id) + ": " + str(datetime.now() - start_time))
     print("Full time: " + str(datetime.now() - start_full_time))
 
     return fires_dict
@@ -415,87 +284,21 @@ def determine_forest_types(fires_dict, forest_districts_dict, forest_types_dict)
     start_full_time = datetime.now()
     defined_type_number = 0
     fire_number = 0
-    for fire_item in fires_dict.values():
+    # Типы лесов для всех лесных кварталов (определяются один раз и сохраняются)
+    district_forest_types = get_forest_district_forest_types(forest_districts_dict, forest_types_dict)
+    # Определение пар пересекающихся пожаров и лесных кварталов (вычисляется один раз для пары слоев)
+    fire_district_join = get_spatial_join(get_geometry_layer(fires_dict, "poly"),
+                                          get_geometry_layer(forest_districts_dict, "geom"))
+    for fire_key, fire_item in fires_dict.items():
         start_time = datetime.now()
         fire_number += 1
-        # Получение полигона пожара
-        fire_polygon = shapely.wkb.loads(fire_item["poly"], hex=True)
-        forest_districts = ""
         forest_zones = []
         forest_seed_zoning_zones = []
-        for forest_district_item in forest_districts_dict.values():
-            try:
-                # Получение полигона лесного квартала
-                forest_district_polygon = shapely.wkb.loads(forest_district_item["geom"], hex=True)
-                # Если есть пересечение полигона пожара с полигоном лесного квартала
-                if fire_polygon.intersects(forest_district_polygon):
-                    fd_municipality = forest_district_item["name_in"]
-                    fd_forest_plot = forest_district_item["uch_l_ru"]
-                    fd_dacha = forest_district_item["dacha_ru"]
-                    fd_kv = forest_district_item["kv"]
-
-                    # Формирование строки с лесными кварталами затронутых пожарами
-                    if forest_districts == "":
-                        forest_districts = str([fd_municipality, fd_forest_plot, fd_dacha, fd_kv])
-                    else:
-                        forest_districts += ", " + str([fd_municipality, fd_forest_plot, fd_dacha, fd_kv])
-
-                    if str(fd_municipality) != "nan":
-                        fd_municipality = re.sub(r"[-']", "", fd_municipality)
-                        fd_municipality = fd_municipality.lower()
-                    if str(fd_forest_plot) != "nan":
-                        fd_forest_plot = re.sub(r"[-']", "", fd_forest_plot)
-                        fd_forest_plot = fd_forest_plot.lower()
-                    if str(fd_dacha) != "nan":
-                        fd_dacha = re.sub(r"[-']", "", fd_dacha)
-                        fd_dacha = fd_dacha.lower()
-
-                    if str(fd_municipality) != "nan" and str(fd_forest_plot) != "nan" and str(fd_dacha) != "nan" and \
-                            str(fd_kv) != "nan":
-                        # Обход данных по типам лесов
-                        for forest_types_item in forest_types_dict.values():
-                            fhc_municipality = forest_types_item["name_in"]
-                            fhc_forest_plot = forest_types_item["uch_l_ru"]
-                            fhc_dacha = forest_types_item["dacha_ru"]
-
-                            if str(fhc_municipality) != "nan":
-                                fhc_municipality = forest_types_item["name_in"]
-                                fhc_municipality = re.sub(r"[-']", "", fhc_municipality)
-                                fhc_municipality = fhc_municipality.lower()
-
-                            if str(fhc_forest_plot) != "nan":
-                                fhc_forest_plot = forest_types_item["uch_l_ru"]
-                                fhc_forest_plot = re.sub(r"[-']", "", fhc_forest_plot)
-                                fhc_forest_plot = fhc_forest_plot.lower()
-
-                            if str(fhc_dacha) != "nan":
-                                fhc_dacha = forest_types_item["dacha_ru"]
-                                fhc_dacha = re.sub(r"[-']", "", fhc_dacha)
-                                fhc_dacha = fhc_dacha.lower()
-
-                            if str(fhc_municipality) != "nan" and str(fhc_forest_plot) != "nan" and \
-                                    str(fhc_dacha) != "nan":
-                                # Вычисление расстояния Левенштейна
-                                levenshtein_distance_for_municipality = distance(fhc_municipality, fd_municipality)
-                                # Вычисление расстояния Левенштейна
-                                levenshtein_distance_for_forest_plot = distance(fhc_forest_plot, fd_forest_plot)
-                                # Вычисление расстояния Левенштейна
-                                levenshtein_distance_for_dacha = distance(fhc_dacha, fd_dacha)
-                                total_levenshtein_distance = levenshtein_distance_for_municipality + \
-                                                             levenshtein_distance_for_forest_plot + \
-                                                             levenshtein_distance_for_dacha
-                                if total_levenshtein_distance < 4:
-                                    for forest_type_number in forest_types_item["kv"]:
-                                        if str(fd_kv) and str(forest_type_number) and str(forest_type_number) != "nan":
-                                            if int(forest_type_number) == int(fd_kv):
-                                                # Формирование списка определенных типов лесов
-                                                forest_zones.append(str(forest_types_item["forest_zone"]))
-                                                forest_seed_zoning_zones.append(str(
-                                                    forest_types_item["forest_seed_zoning_zone"]))
-            except WKBReadingError:
-                print("Не удалось создать геометрию из-за ошибок при чтении.")
-            except UnicodeEncodeError:
-                print("Проблема с кодировкой в строке.")
+        # Обход лесных кварталов, пересекающихся с полигоном пожара
+        for forest_district_key in fire_district_join.get_right_keys(fire_key):
+            _, district_forest_zones, district_forest_seed_zoning_zones = district_forest_types[forest_district_key]
+            forest_zones.extend(district_forest_zones)
+            forest_seed_zoning_zones.extend(district_forest_seed_zoning_zones)
 
         # Формирование данных по типам лесов
         if forest_zones:
@@ -526,29 +329,15 @@ def determine_snowiness(fires_dict, snowiness_dict):
     :return: дополненный словарь с данными по пожарам
     """
     start_full_time = datetime.now()
-    for fire_item in fires_dict.values():
+    # Снежность зим для всех пожаров по номеру метеостанции и году пожара
+    fire_years = get_datetimes(get_field_values(fires_dict, "dt")).astype("datetime64[Y]").astype(np.int64) + 1970
+    fire_snowiness = SnowinessIndex(snowiness_dict).get_fire_snowiness(
+        get_field_values(fires_dict, "weather_station_id"), fire_years)
+    for fire_item, snowiness in zip(fires_dict.values(), fire_snowiness.tolist()):
         start_time = datetime.now()
-        # Получение даты и времени пожара
-        fire_datetime = datetime.strptime(fire_item["dt"], "%d.%m.%Y %H:%M")
-        # Обход данных по снегу
-        for snowiness_item in snowiness_dict.values():
-            # Если сходятся номера метеостанций
-            if int(fire_item["weather_station_id"]) == int(snowiness_item["station_id"]):
-                # Получение даты и времени окончания зимы
-                end_datetime = datetime.strptime(snowiness_item["end"], "%Y-%m-%d")
-                # Если дата и время пожара попадает за определенный год
-                if fire_datetime.year == end_datetime.year:
-                    # Определение снежности зимы в зависимости от процентов
-                    fire_item["snowiness"] = ""
-                    if float(snowiness_item["percent"]) < -25:
-                        fire_item["snowiness"] = "малоснежная"
-                    if -25 <= float(snowiness_item["percent"]) <= 25:
-                        fire_item["snowiness"] = "норма"
-                    if float(snowiness_item["percent"]) > 25:
-                        fire_item["snowiness"] = "многоснежная"
-                    if 90 <= float(snowiness_item["percent"]) <= 100:
-                        fire_item["snowiness"] = "норма"
-                    print("Снежность зимы: " + fire_item["snowiness"])
+        if str(snowiness) != "nan":
+            fire_item["snowiness"] = snowiness
+            print("Снежность зимы: " + fire_item["snowiness"])
         print(str(fire_item["new_fire_id"]) + ": " + str(datetime.now() - start_time))
     print("Full time: " + str(datetime.now() - start_full_time))
 
@@ -563,36 +352,19 @@ def determine_dry_thunderstorm(fires_dict):
     """
     start_full_time = datetime.now()
     for fire_item in fires_dict.values():
-        start_time = datetime.now()
-        weather_dict = dict()
-        # Получение списка csv-файлов с информацией по метеостанциям (погоде)
-        weather_file_list = gp.get_csv_file_list(gp.WEATHER_DIR_NAME)
-        # Обход списка csv-файлов с информацией по метеостанциям (погоде)
-        for weather_file_name in weather_file_list:
-            # Если csv-файл относится к искомой метеостанции
-            if weather_file_name.find(str(fire_item["weather_station_id"])) != -1:
-                # Получение данных по метеостанции (погоде)
-                weather_csv_data = gp.get_csv_data(weather_file_name, gp.WEATHER_DIR_NAME)
-                weather_dict = gp.get_weather_dict(weather_csv_data)
         fire_item["thunderstorm"] = ""
-        # Получение даты и времени пожара
-        fire_datetime = datetime.strptime(fire_item["dt"], "%d.%m.%Y %H:%M")
-        # Обход по данным метеостанции (погоде)
-        for weather_item in weather_dict.values():
-            # Получение даты и времени замера погоды
-            weather_datetime = datetime.strptime(weather_item["datetime"], "%d.%m.%Y %H:%M")
-            # Если дата пожара совпадает с датой замера погоды
-            if fire_datetime.date() == weather_datetime.date():
-                # Объединение условий погоды в одну строку
-                weather_string = str(weather_item["WW"]).lower() + str(weather_item["W1"]).lower() + \
-                                 str(weather_item["W2"]).lower()
-                # Поиск слова "гроза" без частей "дожд" и "ливень" в строке
-                if weather_string.find("гроза") != -1 and weather_string.find("дожд") == -1 and \
-                        weather_string.find("ливень") == -1:
-                    # Формирование значения "сухая гроза" если нет осадков
-                    if str(weather_item["RRR"]).lower().find("осадков нет") != -1 or str(weather_item["RRR"]) == "nan":
-                        fire_item["thunderstorm"] = "сухая гроза"
-        print(str(fire_item["new_fire_id"]) + ": " + str(datetime.now() - start_time))
+    # Обход пожаров, сгруппированных по метеостанциям
+    for weather_station_id, fire_items in group_by_station(fires_dict.values()).items():
+        start_time = datetime.now()
+        # Получение дат пожаров
+        fire_dates = get_datetimes(fire_item["dt"] for fire_item in fire_items).astype("datetime64[D]")
+        # Признаки сухой грозы за даты пожаров (по суточным характеристикам погоды метеостанции)
+        thunderstorms = get_daily_weather_values(weather_station_id, "thunderstorm", fire_dates)
+        if thunderstorms is not None:
+            for fire_item, thunderstorm in zip(fire_items, thunderstorms.tolist()):
+                if thunderstorm:
+                    fire_item["thunderstorm"] = "сухая гроза"
+        print(str(weather_station_id) + ": " + str(datetime.now() - start_time))
     print("Full time: " + str(datetime.now() - start_full_time))
 
     return fires_dict
@@ -601,40 +373,33 @@ def determine_dry_thunderstorm(fires_dict):
 def identify_fire(fires_dict):
     """
     Идентификация пожаров на основе пересечения их полигонов.
+    Пожары, полигоны которых пересекаются непосредственно или через цепочку других пожаров, получают общий
+    идентификатор. Если у одного из пожаров группы уже есть new_fire_id, он сохраняется для всей группы,
+    иначе группе назначается новый идентификатор (по порядку появления первого пожара группы).
     :param fires_dict: словарь с данными по пожарам (со старыми fire_id)
     :return: новый словарь с данными по пожарам (с новыми new_fire_id)
     """
     start_full_time = datetime.now()
+    fire_keys = list(fires_dict.keys())
+    # Определение групп пересекающихся пожаров
+    components = get_intersection_components(get_geometry_layer(fires_dict, "poly"), fire_keys)
+    # Определение уже назначенных идентификаторов групп
+    component_ids = dict()
+    for fire_key, component in zip(fire_keys, components.tolist()):
+        new_fire_id = fires_dict[fire_key]["new_fire_id"]
+        if component not in component_ids and not pd.isna(new_fire_id) and new_fire_id != "":
+            component_ids[component] = new_fire_id
+    used_ids = set(component_ids.values())
+    # Назначение идентификаторов пожарам
     index = 1
-    for current_key, current_item in fires_dict.items():
-        start_time = datetime.now()
-        shape1 = shapely.wkb.loads(current_item["poly"], hex=True)
-        intersection = list()
-        for key, item in fires_dict.items():
-            if key > current_key:
-                shape2 = shapely.wkb.loads(item["poly"], hex=True)
-                if shape1.intersects(shape2):
-                    if current_item["new_fire_id"] == "":
-                        intersection.append(key)
-                    if current_item["new_fire_id"] != "" and item["new_fire_id"] == "":
-                        item["new_fire_id"] = current_item["new_fire_id"]
-        number = index
-        for key, item in fires_dict.items():
-            if key > current_key:
-                for value in intersection:
-                    if key == value and item["new_fire_id"] != "":
-                        if number != index and number != item["new_fire_id"]:
-                            print("Обнаружены разные индексы")
-                        number = item["new_fire_id"]
-        for key, item in fires_dict.items():
-            if key > current_key:
-                for value in intersection:
-                    if key == value:
-                        item["new_fire_id"] = number
-        if current_item["new_fire_id"] == "":
-            current_item["new_fire_id"] = number
-            index += 1
-        print(str(current_item["new_fire_id"]) + ": " + str(datetime.now() - start_time))
+    for fire_key, component in zip(fire_keys, components.tolist()):
+        if component not in component_ids:
+            while index in used_ids:
+                index += 1
+            component_ids[component] = index
+            used_ids.add(index)
+        fires_dict[fire_key]["new_fire_id"] = component_ids[component]
+    print("Fires: " + str(len(fire_keys)) + ", identified fires: " + str(len(component_ids)))
     print("***************************************************")
     print("Full time: " + str(datetime.now() - start_full_time))
 
@@ -651,11 +416,17 @@ def delete_fire_by_technogenic_object(fires_dict, not_fires_dict):
     start_full_time = datetime.now()
     # Вычисление пожаров, полигоны которых пересекаются с полигонами не пожаров
     intersection = list()
+    fires_layer = get_geometry_layer(fires_dict, "poly")
+    not_fires_layer = get_geometry_layer(not_fires_dict, "WKB")
     for fire_key, fire_item in fires_dict.items():
         start_time = datetime.now()
-        shape1 = shapely.wkb.loads(fire_item["poly"], hex=True)
+        shape1 = fires_layer.geometry(fire_key)
+        if shape1 is None:
+            continue
         for not_fire_key, not_fire_item in not_fires_dict.items():
-            shape2 = shapely.wkb.loads(not_fire_item["WKB"], hex=True)
+            shape2 = not_fires_layer.geometry(not_fire_key)
+            if shape2 is None:
+                continue
             if shape1.intersects(shape2):
                 for key, item in fires_dict.items():
                     if item["new_fire_id"] == fire_item["new_fire_id"]:
@@ -682,12 +453,18 @@ def delete_fire_by_locality(fires_dict, locality_dict):
     start_full_time = datetime.now()
     # Вычисление пожаров, полигоны которых пересекаются с полигонами населенных пунктов
     intersection = list()
+    fires_layer = get_geometry_layer(fires_dict, "geometry", "wkt")
+    locality_layer = get_geometry_layer(locality_dict, "poly_wkt", "wkt")
     for fire_key, fire_item in fires_dict.items():
         start_time = datetime.now()
-        shape1 = shapely.wkt.loads(fire_item["geometry"])
+        shape1 = fires_layer.geometry(fire_key)
+        if shape1 is None:
+            continue
         for locality_key, locality_item in locality_dict.items():
             if int(locality_item["locality"]) == 1:
-                shape2 = shapely.wkt.loads(locality_item["poly_wkt"])
+                shape2 = locality_layer.geometry(locality_key)
+                if shape2 is None:
+                    continue
                 if shape1.intersects(shape2):
                     for key, item in fires_dict.items():
                         if item["new_fire_id"] == fire_item["new_fire_id"]:
@@ -714,21 +491,12 @@ def delete_fire_by_forest_district(fires_dict, forest_districts_dict):
     start_full_time = datetime.now()
     # Вычисление пожаров не пересекающихся с лесными кварталами
     not_intersection = list()
+    # Определение пар пересекающихся пожаров и лесных кварталов (вычисляется один раз для пары слоев)
+    fire_district_join = get_spatial_join(get_geometry_layer(fires_dict, "poly"),
+                                          get_geometry_layer(forest_districts_dict, "geom"))
     for fire_key, fire_item in fires_dict.items():
         start_time = datetime.now()
-        shape1 = shapely.wkb.loads(fire_item["poly"], hex=True)
-        intersection = False
-        for forest_district_key, forest_district_item in forest_districts_dict.items():
-            try:
-                shape2 = shapely.wkb.loads(forest_district_item["geom"], hex=True)
-                if shape1.intersects(shape2):
-                    intersection = True
-                    break
-            except WKBReadingError:
-                print("Не удалось создать геометрию из-за ошибок при чтении.")
-            except UnicodeEncodeError:
-                print("Проблема с кодировкой в строке: " + str(forest_district_key))
-        if not intersection:
+        if not fire_district_join.has_matches(fire_key):
             for key, item in fires_dict.items():
                 if item["new_fire_id"] == fire_item["new_fire_id"]:
                     if key not in not_intersection:
@@ -770,31 +538,25 @@ def delete_fire(fires_dict):
 def delete_winter_fires(fires_dict):
     """
     Удаление пожаров не входящих в пожароопасный период (зимний период).
+    Зимние пожары, пересекающиеся с пожарами пожароопасного периода, сохраняются.
     :param fires_dict: словарь с данными по пожарам
     :return: новый словарь с данными по пожарам
     """
     start_full_time = datetime.now()
-    deleted_fires = []
-    for current_key, current_item in fires_dict.items():
-        start_time = datetime.now()
-        current_date_str = current_item["dt"].split(" ")[0]
-        current_date_obj = datetime.strptime(current_date_str, "%d.%m.%Y")
-        if current_date_obj < datetime.strptime("01.04.2019", "%d.%m.%Y"):
-            exist_intersection = False
-            for key, item in fires_dict.items():
-                date_str = item["dt"].split(" ")[0]
-                date_obj = datetime.strptime(date_str, "%d.%m.%Y")
-                if date_obj >= datetime.strptime("01.04.2019", "%d.%m.%Y"):
-                    shape1 = shapely.wkt.loads(current_item["geometry"])
-                    shape2 = shapely.wkt.loads(item["geometry"])
-                    if shape1.intersects(shape2):
-                        exist_intersection = True
-            if not exist_intersection:
-                deleted_fires.append(current_key)
-            print(str(current_item["new_fire_id"]) + ": " + str(datetime.now() - start_time))
+    fire_keys = list(fires_dict.keys())
+    # Построение пространственно-временного индекса по пожарам
+    fires_index = SpatioTemporalIndex(get_geometry_layer(fires_dict, "geometry", "wkt"),
+                                      get_field_values(fires_dict, "dt"), fire_keys)
+    start_day = get_day(datetime.strptime("01.04.2019", "%d.%m.%Y"))
+    # Поиск пожаров пожароопасного периода, пересекающихся с зимними пожарами
+    winter_positions = np.flatnonzero(fires_index.days < start_day)
+    input_indices, _ = fires_index.query(fires_index.geometries[winter_positions], start_day)
+    intersection = set(winter_positions[input_indices].tolist())
+    deleted_fires = [fire_keys[position] for position in winter_positions.tolist() if position not in intersection]
     # Удаление пожаров
     for key in deleted_fires:
         fires_dict.pop(key)
+    print("Winter fires: " + str(len(winter_positions)) + ", deleted fires: " + str(len(deleted_fires)))
     print("***************************************************")
     print("Full time: " + str(datetime.now() - start_full_time))
 
@@ -802,31 +564,39 @@ def delete_winter_fires(fires_dict):
 
 
 def identify_fire_by_dates(fires_dict):
+    """
+    Идентификация пожаров на основе пересечения их полигонов с учетом дат.
+    Для каждого пожара просматриваются следующие за ним пожары до первого пожара, отстоящего от него на 2 дня
+    или не менее чем на 10 дней; пересекающиеся с ним пожары получают его идентификатор.
+    :param fires_dict: словарь с данными по пожарам
+    :return: новый словарь с данными по пожарам (с новыми new_fire_id)
+    """
     start_full_time = datetime.now()
     index = 1
-    for current_key, current_item in fires_dict.items():
-        start_time = datetime.now()
-        for key, item in fires_dict.items():
-            if key > current_key:
-                current_date_str = current_item["dt"].split(" ")[0]
-                current_date_obj = datetime.strptime(current_date_str, "%d.%m.%Y")
-                date_str = item["dt"].split(" ")[0]
-                date_obj = datetime.strptime(date_str, "%d.%m.%Y")
-                days = abs((date_obj - current_date_obj).days)
-                if days <= 1 or (2 < days < 10):
-                    shape1 = shapely.wkb.loads(current_item["poly"], hex=True)
-                    shape2 = shapely.wkb.loads(item["poly"], hex=True)
-                    if shape1.intersects(shape2):
-                        if current_item["new_fire_id"] == "":
-                            item["new_fire_id"] = index
-                        else:
-                            item["new_fire_id"] = current_item["new_fire_id"]
-                else:
-                    break
+    fire_keys = list(fires_dict.keys())
+    # Построение пространственно-временного индекса по пожарам
+    fires_index = SpatioTemporalIndex(get_geometry_layer(fires_dict, "poly"),
+                                      get_field_values(fires_dict, "dt"), fire_keys)
+    for current_position, current_key in enumerate(fire_keys):
+        current_item = fires_dict[current_key]
+        day = int(fires_index.days[current_position])
+        # Определение границы просмотра следующих пожаров
+        stop_position = min(fires_index.next_position_outside(current_position, day - 9, day + 9),
+                            fires_index.next_position_on_day(current_position, day - 2),
+                            fires_index.next_position_on_day(current_position, day + 2))
+        # Поиск пересекающихся пожаров в пределах 9 дней до и после
+        _, positions = fires_index.query(fires_index.geometries[[current_position]], day - 9, day + 9)
+        positions = np.sort(positions[(positions > current_position) & (positions < stop_position)])
+        for position in positions.tolist():
+            item = fires_dict[fire_keys[position]]
+            if current_item["new_fire_id"] == "":
+                item["new_fire_id"] = index
+            else:
+                item["new_fire_id"] = current_item["new_fire_id"]
         if current_item["new_fire_id"] == "":
             current_item["new_fire_id"] = index
             index += 1
-        print(str(current_item["new_fire_id"]) + ": " + str(datetime.now() - start_time))
+    print("Fires: " + str(len(fire_keys)) + ", identified fires: " + str(index - 1))
     print("***************************************************")
     print("Full time: " + str(datetime.now() - start_full_time))
 
@@ -834,17 +604,14 @@ def identify_fire_by_dates(fires_dict):
 
 
 def define_gaps_in_days(fires_dict):
-    for key1, item1 in fires_dict.items():
-        for key2, item2 in fires_dict.items():
-            if key2 > key1:
-                date1_str = item1["dt"].split(" ")[0]
-                date1_obj = datetime.strptime(date1_str, "%d.%m.%Y")
-                date2_str = item2["dt"].split(" ")[0]
-                date2_obj = datetime.strptime(date2_str, "%d.%m.%Y")
-                days = abs((date2_obj - date1_obj).days)
-                if days > 2:
-                    print("Days: " + str(days) + " Dates: " + item1["dt"] + " - " + item2["dt"])
-                break
+    """
+    Вывод разрывов более чем в 2 дня между датами соседних пожаров.
+    :param fires_dict: словарь с данными по пожарам
+    """
+    dates = get_field_values(fires_dict, "dt")
+    days = np.abs(np.diff(get_days(dates)))
+    for position in np.flatnonzero(days > 2).tolist():
+        print("Days: " + str(days[position]) + " Dates: " + dates[position] + " - " + dates[position + 1])
 
 
 def get_polygon_intersection(fires_dict):
@@ -865,7 +632,7 @@ def union_polygons(fires_dict):
             shape_area = get_area(shape)
             print("Geodesic area: {:.3f} km^2".format(shape_area))
             polygons.append(shape)
-    combined_polygon = cascaded_union(polygons)
+    combined_polygon = unary_union(polygons)
     combined_area = get_area(combined_polygon)
     print("Geodesic combined area: {:.3f} km^2".format(combined_area))
 
@@ -892,7 +659,7 @@ def testing(file_data):
     print("Geodesic area 2: {:.3f} km^2".format(area2))
 
     polygons = [shape1, shape2]
-    combined_polygon = cascaded_union(polygons)
+    combined_polygon = unary_union(polygons)
     combined_area = get_area(combined_polygon)
     print("Geodesic combined area: {:.3f} km^2".format(combined_area))
 
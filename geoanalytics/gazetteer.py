@@ -0,0 +1,125 @@
+import re
+from Levenshtein._levenshtein import distance
+
+
+# Символы, удаляемые из названий при сравнении
+NAME_SEPARATOR_PATTERN = re.compile(r"[-']")
+# Максимальное суммарное расстояние Левенштейна между тройками названий (лесничество, участок, дача)
+MAX_TOTAL_DISTANCE = 3
+
+
+def normalize_name(value):
+    """
+    Нормализация названия (лесничества, участкового лесничества, дачи) для сравнения:
+    удаление дефисов и апострофов, приведение к нижнему регистру.
+    :param value: название
+    :return: нормализованное название (None, если название не задано)
+    """
+    if str(value) == "nan":
+        return None
+
+    return NAME_SEPARATOR_PATTERN.sub("", value).lower()
+
+
+def get_total_distance(names1, names2):
+    """
+    Вычисление суммарного расстояния Левенштейна между тройками названий.
+    :param names1: первая тройка нормализованных названий
+    :param names2: вторая тройка нормализованных названий
+    :return: сумма расстояний Левенштейна по названиям
+    """
+    return distance(names1[0], names2[0]) + distance(names1[1], names2[1]) + distance(names1[2], names2[2])
+
+
+class NameGazetteer:
+    """
+    Указатель справочника (классов опасности, типов лесов) по нормализованным тройкам названий
+    (лесничество, участковое лесничество, дача).
+    Названия нормализуются один раз при построении. Различные тройки хранятся в BK-дереве по суммарному расстоянию
+    Левенштейна (сумма метрик — метрика), поэтому при нечетком поиске сравниваются только тройки из допустимых
+    ветвей дерева. Результаты поиска запоминаются по искомой тройке (хэш-таблица), поэтому для повторяющихся
+    троек (все кварталы одной дачи) поиск по дереву выполняется один раз.
+    """
+
+    def __init__(self, items_dict, fields):
+        """
+        :param items_dict: словарь справочника
+        :param fields: названия полей с названиями лесничества, участкового лесничества и дачи
+        """
+        self.keys = list(items_dict.keys())
+        self._names = [set() for _ in fields]
+        # Порядковые номера записей справочника по тройкам названий
+        self._groups = dict()
+        for position, item in enumerate(items_dict.values()):
+            names = tuple(normalize_name(item[field]) for field in fields)
+            for field_names, name in zip(self._names, names):
+                if name is not None:
+                    field_names.add(name)
+            # Записи с незаданными названиями не участвуют в поиске
+            if None not in names:
+                self._groups.setdefault(names, []).append(position)
+        self._tree = None
+        for names in self._groups:
+            self._add(names)
+        self._results = dict()
+
+    def __len__(self):
+        return len(self._groups)
+
+    def _add(self, names):
+        """
+        Добавление тройки названий в BK-дерево.
+        :param names: тройка нормализованных названий
+        """
+        if self._tree is None:
+            self._tree = (names, dict())
+            return
+        node = self._tree
+        while True:
+            node_distance = get_total_distance(names, node[0])
+            child = node[1].get(node_distance)
+            if child is None:
+                node[1][node_distance] = (names, dict())
+                return
+            node = child
+
+    def contains(self, field_index, name):
+        """
+        Проверка наличия названия в справочнике (точное совпадение).
+        :param field_index: номер названия в тройке (0 — лесничество, 1 — участковое лесничество, 2 — дача)
+        :param name: нормализованное название
+        :return: True, если название есть в справочнике
+        """
+        return name in self._names[field_index]
+
+    def search(self, municipality, forest_plot, dacha, max_distance=MAX_TOTAL_DISTANCE):
+        """
+        Поиск записей справочника, суммарное расстояние Левенштейна названий которых до заданных
+        не превышает max_distance.
+        Точное совпадение тройки не завершает поиск: в результат, как и при переборе справочника, входят
+        все записи в пределах max_distance (например, с опечатками в названиях), поэтому отдельная проверка
+        точного совпадения по хэш-таблице не сокращала бы обход дерева.
+        :param municipality: нормализованное название лесничества
+        :param forest_plot: нормализованное название участкового лесничества
+        :param dacha: нормализованное название дачи
+        :param max_distance: максимальное суммарное расстояние Левенштейна
+        :return: список ключей найденных записей в порядке записей справочника
+        """
+        names = (municipality, forest_plot, dacha)
+        result = self._results.get((names, max_distance))
+        if result is None:
+            positions = []
+            nodes = [] if self._tree is None else [self._tree]
+            while nodes:
+                node_names, children = nodes.pop()
+                node_distance = get_total_distance(names, node_names)
+                if node_distance <= max_distance:
+                    positions.extend(self._groups[node_names])
+                # По неравенству треугольника подходящие тройки находятся только в этих ветвях
+                for child_distance, child in children.items():
+                    if node_distance - max_distance <= child_distance <= node_distance + max_distance:
+                        nodes.append(child)
+            result = [self.keys[position] for position in sorted(positions)]
+            self._results[(names, max_distance)] = result
+
+        return result
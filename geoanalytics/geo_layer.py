@@ -0,0 +1,311 @@
+import os
+import itertools
+import weakref
+import numpy as np
+import pandas as pd
+import shapely
+from collections import OrderedDict
+from pathlib import Path
+
+from geoanalytics.geo_utilitys import METRIC_CRS, reproject_geometries
+from geoanalytics.records import get_field_values
+
+
+# Ограничение памяти под декодированные геометрии (в байтах)
+GEOMETRY_CACHE_SIZE = 512 * 1024 * 1024
+# Количество геометрий в одном блоке кэша
+GEOMETRY_BLOCK_SIZE = 1024
+
+
+class GeometryCache:
+    """
+    Кэш декодированных геометрий, ограниченный по памяти.
+    Геометрии хранятся блоками; при превышении ограничения вытесняются давно не использованные блоки.
+    """
+
+    def __init__(self, max_bytes=GEOMETRY_CACHE_SIZE):
+        """
+        :param max_bytes: ограничение памяти под геометрии (в байтах)
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._blocks = OrderedDict()
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def get(self, key):
+        """
+        Получение блока геометрий из кэша.
+        :param key: ключ блока
+        :return: массив геометрий или None, если блока нет в кэше
+        """
+        block = self._blocks.get(key)
+        if block is None:
+            return None
+        self._blocks.move_to_end(key)
+
+        return block[0]
+
+    def put(self, key, geometries, size):
+        """
+        Помещение блока геометрий в кэш с вытеснением давно не использованных блоков.
+        Блок, превышающий ограничение памяти целиком, в кэш не помещается.
+        :param key: ключ блока
+        :param geometries: массив геометрий
+        :param size: оценка занимаемой блоком памяти (в байтах)
+        """
+        if size > self.max_bytes:
+            return
+        self.discard(key)
+        self._blocks[key] = (geometries, size)
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._blocks.popitem(last=False)
+            self.current_bytes -= evicted_size
+
+    def discard(self, key):
+        """
+        Удаление блока геометрий из кэша.
+        :param key: ключ блока
+        """
+        block = self._blocks.pop(key, None)
+        if block is not None:
+            self.current_bytes -= block[1]
+
+    def discard_layer(self, layer_id):
+        """
+        Удаление из кэша всех блоков слоя.
+        :param layer_id: идентификатор слоя
+        """
+        for key in [key for key in self._blocks if key[0] == layer_id]:
+            self.discard(key)
+
+    def clear(self):
+        self._blocks.clear()
+        self.current_bytes = 0
+
+
+# Общий кэш геометрий для всех слоев
+GEOMETRY_CACHE = GeometryCache()
+
+
+class GeometryLayer:
+    """
+    Слой географических объектов с геометриями, декодируемыми из WKB (WKT) один раз.
+    Декодированные геометрии хранятся в общем кэше блоками, поэтому слой, не помещающийся в память целиком,
+    декодируется по частям по мере обращения.
+    Для слоя строится (один раз) его копия в метрической системе координат, которая для слоев из csv-файлов
+    сохраняется рядом с исходным файлом и при последующих запусках читается без перепроецирования.
+    """
+
+    _layer_ids = itertools.count()
+
+    def __init__(self, keys, values, geom_format="wkb", name=None, source=None, cache=None):
+        """
+        :param keys: ключи объектов слоя (ключи словаря с данными)
+        :param values: геометрии объектов в WKB (hex) или WKT
+        :param geom_format: формат геометрий ("wkb" или "wkt")
+        :param name: название слоя
+        :param source: путь к исходному csv-файлу слоя
+        :param cache: кэш геометрий (по умолчанию общий кэш)
+        """
+        self.id = next(GeometryLayer._layer_ids)
+        self.name = name
+        self.source = source
+        self.geom_format = geom_format
+        self._projected = None
+        self.keys = list(keys)
+        self._positions = {key: position for position, key in enumerate(self.keys)}
+        values = np.asarray(values, dtype=object)
+        self._values = np.where(pd.isna(values), None, values)
+        self._cache = GEOMETRY_CACHE if cache is None else cache
+        weakref.finalize(self, self._cache.discard_layer, self.id)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def __getstate__(self):
+        # Кэш геометрий не передается в другой процесс (геометрии декодируются в нем заново)
+        state = self.__dict__.copy()
+        del state["_cache"]
+
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.id = next(GeometryLayer._layer_ids)
+        self._cache = GEOMETRY_CACHE
+        weakref.finalize(self, self._cache.discard_layer, self.id)
+
+    def position(self, key):
+        """
+        Получение порядкового номера объекта в слое.
+        :param key: ключ объекта
+        :return: порядковый номер объекта
+        """
+        return self._positions[key]
+
+    def _decode(self, values):
+        """
+        Декодирование геометрий из WKB (WKT).
+        :param values: массив геометрий в WKB (hex) или WKT
+        :return: массив геометрий (None для геометрий, которые не удалось прочитать)
+        """
+        if self.geom_format == "wkt":
+            geometries = shapely.from_wkt(values, on_invalid="ignore")
+        else:
+            geometries = shapely.from_wkb(values, on_invalid="ignore")
+        for _ in range(int(np.count_nonzero(pd.isna(geometries) & ~pd.isna(values)))):
+            print("Не удалось создать геометрию из-за ошибок при чтении.")
+
+        return geometries
+
+    def _get_block(self, block_number):
+        """
+        Получение блока декодированных геометрий (из кэша или с декодированием).
+        :param block_number: номер блока
+        :return: массив геометрий блока
+        """
+        key = (self.id, block_number)
+        geometries = self._cache.get(key)
+        if geometries is None:
+            start = block_number * GEOMETRY_BLOCK_SIZE
+            geometries = self._decode(self._values[start:start + GEOMETRY_BLOCK_SIZE])
+            # Оценка занимаемой памяти по числу координат
+            size = int(shapely.get_num_coordinates(geometries).sum()) * 16 + len(geometries) * 64
+            self._cache.put(key, geometries, size)
+
+        return geometries
+
+    def geometry(self, key):
+        """
+        Получение геометрии объекта слоя.
+        Если блока с объектом нет в кэше, декодируется только геометрия объекта (без вытеснения блоков из кэша).
+        :param key: ключ объекта
+        :return: геометрия объекта (None, если геометрию не удалось прочитать)
+        """
+        position = self._positions[key]
+        geometries = self._cache.get((self.id, position // GEOMETRY_BLOCK_SIZE))
+        if geometries is None:
+            return self._decode(self._values[position:position + 1])[0]
+
+        return geometries[position % GEOMETRY_BLOCK_SIZE]
+
+    def geometries(self, keys=None):
+        """
+        Получение геометрий слоя.
+        Декодируются (или берутся из кэша) только блоки, содержащие запрошенные объекты, по одному блоку за раз.
+        :param keys: ключи объектов (по умолчанию все объекты слоя)
+        :return: массив геометрий в порядке ключей
+        """
+        if keys is None:
+            positions = np.arange(len(self.keys), dtype=np.int64)
+        else:
+            positions = np.array([self._positions[key] for key in keys], dtype=np.int64)
+        geometries = np.empty(len(positions), dtype=object)
+        # Запрошенные объекты, сгруппированные по блокам
+        order = np.argsort(positions, kind="stable")
+        block_numbers = positions[order] // GEOMETRY_BLOCK_SIZE
+        bounds = np.flatnonzero(np.diff(block_numbers)) + 1
+        for rows in np.split(order, bounds) if len(order) else []:
+            block = self._get_block(int(positions[rows[0]] // GEOMETRY_BLOCK_SIZE))
+            geometries[rows] = block[positions[rows] % GEOMETRY_BLOCK_SIZE]
+
+        return geometries
+
+    def get_projected_file(self):
+        """
+        Получение пути к csv-файлу со слоем в метрической системе координат.
+        :return: путь к csv-файлу (None, если слой получен не из csv-файла)
+        """
+        if self.source is None:
+            return None
+        source = Path(self.source)
+        crs_name = METRIC_CRS.replace(":", "").lower()
+
+        return source.with_name(source.stem + "_" + str(self.name) + "_" + crs_name + source.suffix)
+
+    def _read_projected(self, projected_file):
+        """
+        Чтение сохраненного слоя в метрической системе координат.
+        :param projected_file: путь к csv-файлу со слоем в метрической системе координат
+        :return: геометрии в WKB (hex) или None, если файл отсутствует или устарел
+        """
+        if projected_file is None or not projected_file.exists() or \
+                projected_file.stat().st_mtime < Path(self.source).stat().st_mtime:
+            return None
+        projected_data = pd.read_csv(projected_file, sep=";", header=0, index_col=False, dtype=str,
+                                     keep_default_na=False)
+        if list(projected_data["id"]) != [str(key) for key in self.keys]:
+            return None
+
+        values = projected_data["geom"].to_numpy(dtype=object)
+
+        return np.where(values == "", None, values)
+
+    def projected(self):
+        """
+        Получение слоя в метрической системе координат (перепроецирование выполняется один раз).
+        :return: слой геометрий в метрах
+        """
+        if self._projected is None:
+            projected_file = self.get_projected_file()
+            values = self._read_projected(projected_file)
+            if values is None:
+                # Перепроецирование всех геометрий слоя за один проход
+                values = shapely.to_wkb(reproject_geometries(self.geometries()), hex=True)
+                if projected_file is not None:
+                    # Файл записывается под временным именем и переименовывается (параллельные процессы
+                    # не читают его частично)
+                    temporary_file = projected_file.with_name(projected_file.name + "." + str(os.getpid()) + ".tmp")
+                    pd.DataFrame({"id": self.keys, "geom": values}).to_csv(temporary_file, sep=";", index=False)
+                    os.replace(temporary_file, projected_file)
+            self._projected = GeometryLayer(self.keys, values, "wkb", self.name, cache=self._cache)
+
+        return self._projected
+
+
+class GeometryDict(dict):
+    """
+    Словарь с данными по географическим объектам, к которому привязаны слои с декодированными геометриями.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.layers = dict()
+
+
+def add_geometry_layer(geom_dict, geom_field, geom_format="wkb", source=None):
+    """
+    Построение слоя геометрий по полю словаря и привязка его к словарю.
+    :param geom_dict: словарь с данными по географическим объектам (GeometryDict или RecordDict)
+    :param geom_field: название поля с геометрией
+    :param geom_format: формат геометрий ("wkb" или "wkt")
+    :param source: путь к исходному csv-файлу слоя
+    :return: слой геометрий
+    """
+    layer = GeometryLayer(geom_dict.keys(), get_field_values(geom_dict, geom_field), geom_format, geom_field, source)
+    layers = getattr(geom_dict, "layers", None)
+    if layers is not None:
+        layers[geom_field] = layer
+
+    return layer
+
+
+def get_geometry_layer(geom_dict, geom_field, geom_format="wkb"):
+    """
+    Получение слоя геометрий, привязанного к словарю (при отсутствии слой строится).
+    :param geom_dict: словарь с данными по географическим объектам
+    :param geom_field: название поля с геометрией
+    :param geom_format: формат геометрий ("wkb" или "wkt")
+    :return: слой геометрий
+    """
+    layers = getattr(geom_dict, "layers", None)
+    if layers is not None and geom_field in layers:
+        return layers[geom_field]
+
+    return add_geometry_layer(geom_dict, geom_field, geom_format)
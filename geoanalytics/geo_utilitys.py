@@ -1,19 +1,25 @@
+import numpy as np
 import pyproj
 import shapely
-import shapely.wkb
+from functools import lru_cache
 from pyproj import Geod
 from shapely import ops
-from shapely.errors import WKBReadingError
 
 
-def nearest(items, pivot):
+# Исходная (географическая) и метрическая системы координат
+GEOGRAPHIC_CRS = "EPSG:4326"
+METRIC_CRS = "EPSG:3857"
+
+
+@lru_cache(maxsize=None)
+def get_transformer(source_crs=GEOGRAPHIC_CRS, target_crs=METRIC_CRS):
     """
-    Определение ближайшего элемента из items к элементу pivot.
-    :param items: список элементов (например, datetime)
-    :param pivot: элемент с которым сравнивается список
-    :return: ближайший элемент из items к элементу pivot
+    Получение преобразователя координат (создается один раз для каждой пары систем координат).
+    :param source_crs: исходная система координат
+    :param target_crs: целевая система координат
+    :return: преобразователь координат
     """
-    return min(items, key=lambda x: abs(x - pivot))
+    return pyproj.Transformer.from_crs(pyproj.CRS(source_crs), pyproj.CRS(target_crs), always_xy=True)
 
 
 def reproject(geom):
@@ -22,11 +28,22 @@ def reproject(geom):
     :param geom: геометрическая фигура в радианах
     :return: геометрическая фигура в метрах
     """
-    wgs84 = pyproj.CRS("EPSG:4326")
-    utm = pyproj.CRS("EPSG:3857")
-    project = pyproj.Transformer.from_crs(wgs84, utm, always_xy=True).transform
+    return ops.transform(get_transformer().transform, geom)
+
+
+def reproject_geometries(geometries):
+    """
+    Препроекция массива геометрических фигур в геодезические величины за один вызов преобразователя.
+    :param geometries: массив геометрических фигур в радианах
+    :return: массив геометрических фигур в метрах
+    """
+    transformer = get_transformer()
 
-    return ops.transform(project, geom)
+    def transform_coordinates(coordinates):
+        x, y = transformer.transform(coordinates[:, 0], coordinates[:, 1])
+        return np.column_stack((x, y))
+
+    return shapely.transform(np.asarray(geometries, dtype=object), transform_coordinates)
 
 
 def get_area(polygon):
@@ -56,22 +73,3 @@ def get_distance(fires_shape, second_shape):
 
     return distance_in_kilometers
 
-
-def get_min_distance(polygon, geom_dict):
-    """
-    Получение минимального расстояния от полигона до некоторого географическим объекта.
-    :param polygon: полигон
-    :param geom_dict: словарь с географическим объектом в WKB
-    :return: минимальное расстояния от полигона до географического объекта
-    """
-    min_distance = 99999
-    for geom_item in geom_dict.values():
-        try:
-            geom_polygon = shapely.wkb.loads(geom_item["geom"], hex=True)
-            current_distance = get_distance(polygon, geom_polygon)
-            if min_distance > current_distance:
-                min_distance = current_distance
-        except WKBReadingError:
-            print("Не удалось создать геометрию из-за ошибок при чтении.")
-
-    return "{:.3f}".format(min_distance)
@@ -0,0 +1,84 @@
+import os
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from geoanalytics.geo_layer import GeometryDict
+
+
+# Количество частей, на которые делятся пожары для одного процесса-исполнителя
+SHARDS_PER_WORKER = 4
+
+# Справочные данные процесса-исполнителя (передаются один раз при запуске процесса)
+_worker_references = dict()
+
+
+def _init_worker(references):
+    """
+    Инициализация процесса-исполнителя справочными данными.
+    :param references: словарь справочных данных (аргументы этапа обработки по названиям)
+    """
+    global _worker_references
+    _worker_references = references
+
+
+def _process_shard(stage, shard):
+    """
+    Обработка части пожаров в процессе-исполнителе.
+    :param stage: этап обработки (функция fp.determine_*)
+    :param shard: словарь с данными по части пожаров
+    :return: словарь с результатами обработки части пожаров
+    """
+    result = stage(GeometryDict(shard), **_worker_references)
+
+    return {key: dict(item) for key, item in result.items()}
+
+
+def get_shards(keys, shard_number):
+    """
+    Разделение ключей пожаров на части (с сохранением порядка пожаров).
+    :param keys: список ключей пожаров
+    :param shard_number: количество частей
+    :return: список частей (списков ключей)
+    """
+    shard_size = max(1, -(-len(keys) // shard_number))
+
+    return [keys[start:start + shard_size] for start in range(0, len(keys), shard_size)]
+
+
+def process_fires_in_parallel(fires_dict, stage, references=None, workers=None, shard_number=None, on_result=None):
+    """
+    Параллельное выполнение этапа обработки, обрабатывающего каждый пожар независимо от остальных (fp.determine_*).
+    Пожары делятся на части, которые обрабатываются пулом процессов. Справочные данные (дороги, лесные кварталы,
+    классы опасности и т.д.) передаются каждому процессу один раз при его запуске, а не с каждой частью;
+    хранилище данных метеостанций процессы открывают сами (общие файлы этапа — слои в метрической системе
+    координат и хранилище — подготавливаются до запуска процессов, см. Pipeline.prepare_stage).
+    Результаты записываются в словарь с данными по пожарам в порядке пожаров, поэтому не зависят от порядка
+    завершения частей.
+    :param fires_dict: словарь с данными по пожарам
+    :param stage: этап обработки (функция, первым аргументом принимающая словарь с данными по пожарам)
+    :param references: словарь справочных данных (остальные аргументы этапа по названиям)
+    :param workers: количество процессов (по умолчанию по числу процессоров)
+    :param shard_number: количество частей (по умолчанию SHARDS_PER_WORKER частей на процесс)
+    :param on_result: функция, вызываемая с результатами каждой части до их записи в словарь с данными по пожарам
+    :return: дополненный словарь с данными по пожарам
+    """
+    start_full_time = datetime.now()
+    references = dict() if references is None else references
+    workers = os.cpu_count() if workers is None else workers
+    shard_number = workers * SHARDS_PER_WORKER if shard_number is None else shard_number
+    shards = get_shards(list(fires_dict.keys()), shard_number)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(references,)) as executor:
+        results = executor.map(_process_shard, [stage] * len(shards),
+                               [{key: dict(fires_dict[key]) for key in shard} for shard in shards])
+        # Объединение результатов в порядке частей (пожаров)
+        for shard_index, result in enumerate(results):
+            if on_result is not None:
+                on_result(result)
+            for key, item in result.items():
+                fires_dict[key].update(item)
+            print("Часть " + str(shard_index + 1) + " из " + str(len(shards)) + " (пожаров: " +
+                  str(len(result)) + ")")
+    print("***************************************************")
+    print("Full time: " + str(datetime.now() - start_full_time))
+
+    return fires_dict
@@ -0,0 +1,367 @@
+from datetime import datetime
+from functools import partial
+
+import geoanalytics.preprocess as gp
+import geoanalytics.fire_processor as fp
+import geoanalytics.forest_district_processor as fdp
+import geoanalytics.parallel as gpp
+import geoanalytics.checkpoint as gck
+import geoanalytics.result_cache as grc
+import geoanalytics.weather_store as gws
+
+
+# Количество пожаров в одной части при потоковой обработке файла с пожарами
+FIRE_CHUNK_SIZE = 10000
+# Название выходного npz-файла с календарем классов пожарной опасности по условиям погоды для лесных кварталов
+HAZARD_CALENDAR_FILE_NAME = "weather_hazard_classes.npz"
+
+
+def process_fires_in_chunks(stages, chunk_size=FIRE_CHUNK_SIZE, fires_csv_file=gp.FIRE_CSV_FILE,
+                            output_file_name=gp.OUTPUT_FILE_NAME):
+    """
+    Потоковая обработка пожаров: файл с пожарами читается частями, каждая часть проходит через заданные этапы
+    обработки и сразу дописывается в выходной csv-файл, поэтому в памяти находится только одна часть,
+    а при сбое сохраняются результаты по уже обработанным частям.
+    Подходит для этапов, обрабатывающих каждый пожар независимо от остальных (fp.determine_*).
+    :param stages: список этапов обработки (функций, принимающих и возвращающих словарь с данными по пожарам)
+    :param chunk_size: количество пожаров в одной части
+    :param fires_csv_file: название csv-файла с пожарами
+    :param output_file_name: название выходного csv-файла
+    :return: количество обработанных пожаров
+    """
+    start_full_time = datetime.now()
+    columns = None
+    fire_number = 0
+    for chunk_index, fires_csv_data in enumerate(gp.get_csv_chunks(fires_csv_file, chunk_size)):
+        start_time = datetime.now()
+        # Идентификаторы пожаров продолжают нумерацию предыдущих частей
+        fires_dict = gp.get_fires_dict(fires_csv_data, fire_number + 1)
+        for stage in stages:
+            fires_dict = stage(fires_dict)
+        columns = gp.append_csv_file(fires_dict, output_file_name, columns)
+        fire_number += len(fires_csv_data)
+        print("Часть " + str(chunk_index + 1) + " (пожаров: " + str(len(fires_dict)) + "): " +
+              str(datetime.now() - start_time))
+    print("***************************************************")
+    print("Full time: " + str(datetime.now() - start_full_time))
+
+    return fire_number
+
+
+class Stage:
+    """
+    Этап обработки: функция обработки данных и объявленные для нее входные слои.
+    """
+
+    def __init__(self, name, function, target="fires", layers=None, options=(), after=(), per_fire=False,
+                 inputs=None, outputs=(), directories=(), projected=()):
+        """
+        :param name: название этапа
+        :param function: функция обработки (первый аргумент — словарь с обрабатываемыми данными)
+        :param target: название обрабатываемого слоя
+        :param layers: словарь справочных слоев (название аргумента функции: название слоя)
+        :param options: названия аргументов функции, задаваемых параметрами запуска (например, target_date)
+        :param after: названия этапов, которые должны выполняться перед данным этапом
+        :param per_fire: этап обрабатывает каждый пожар независимо (возможна обработка по частям и параллельно)
+        :param inputs: названия полей пожара, от которых зависят результаты этапа (None — результаты не кэшируются)
+        :param outputs: названия полей пожара, записываемых этапом (сохраняются в кэше результатов)
+        :param directories: каталоги с csv-файлами метеостанций, от которых зависят результаты этапа
+        :param projected: названия аргументов функции со справочными слоями, используемыми в метрической системе
+        координат
+        """
+        self.name = name
+        self.function = function
+        self.target = target
+        self.layers = dict() if layers is None else layers
+        self.options = options
+        self.after = after
+        self.per_fire = per_fire
+        self.inputs = inputs
+        self.outputs = outputs
+        self.directories = directories
+        self.projected = projected
+
+
+# Слои данных: название слоя — (название csv-файла, функция получения словаря)
+LAYERS = {
+    "fires": (gp.FIRE_CSV_FILE, gp.get_fires_dict),
+    "not_fires": (gp.NOT_FIRES_CSV_FILE, gp.get_not_fires_dict),
+    "localities": (gp.LOCALITIES_CSV_FILE, gp.get_locality_dict),
+    "forest_districts": (gp.FOREST_DISTRICTS_CSV_FILE, gp.get_forest_districts_dict),
+    "forest_districts_processed": (gp.FOREST_DISTRICTS_PROCESSED_CSV_FILE, gp.get_forest_districts_processed_dict),
+    "population_density": (gp.POPULATION_DENSITY_CSV_FILE, gp.get_population_density_dict),
+    "forestry": (gp.FORESTRY_CSV_FILE, gp.get_forestry_dict),
+    "car_roads": (gp.CAR_ROADS_CSV_FILE, gp.get_car_roads_dict),
+    "railways": (gp.RAILWAYS_CSV_FILE, gp.get_railways_dict),
+    "rivers": (gp.RIVERS_CSV_FILE, gp.get_rivers_dict),
+    "lakes": (gp.LAKES_CSV_FILE, gp.get_lakes_dict),
+    "weather_stations": (gp.WEATHER_STATIONS_CSV_FILE, gp.get_weather_stations_dict),
+    "forest_hazard_classes": (gp.FOREST_HAZARD_CLASSES_CSV_FILE, gp.get_forest_hazard_classes_dict),
+    "forest_types": (gp.FOREST_TYPES_PROCESSED_CSV_FILE, gp.get_forest_types_dict),
+    "snowiness": (gp.SNOWINESS_CSV_FILE, gp.get_snowiness_dict),
+    "loc": (gp.DATA_2020_V2, gp.get_loc_dict)
+}
+
+# Этапы обработки (в порядке выполнения по умолчанию)
+STAGES = {stage.name: stage for stage in [
+    # Этапы для пожаров
+    Stage("identify", fp.identify_fire),
+    Stage("filter-technogenic", fp.delete_fire_by_technogenic_object, layers={"not_fires_dict": "not_fires"},
+          after=("identify",)),
+    Stage("filter-localities", fp.delete_fire_by_locality, layers={"locality_dict": "localities"},
+          after=("identify",)),
+    Stage("filter-forest-districts", fp.delete_fire_by_forest_district,
+          layers={"forest_districts_dict": "forest_districts"}, after=("identify",)),
+    Stage("filter-duplicates", fp.delete_fire, after=("identify",)),
+    Stage("filter-winter", fp.delete_winter_fires),
+    Stage("identify-by-dates", fp.identify_fire_by_dates, after=("filter-winter",)),
+    Stage("population-density", fp.determine_average_population_density,
+          layers={"population_density_dict": "population_density"}, per_fire=True, inputs=("poly",),
+          outputs=("average_population_density", "municipalities")),
+    Stage("forestry", fp.determine_intersection_with_forestry, layers={"forestry_dict": "forestry"}, per_fire=True,
+          inputs=("poly",), outputs=("forestry",)),
+    Stage("distances", fp.determine_area_and_distances,
+          layers={"car_roads_dict": "car_roads", "railways_dict": "railways", "rivers_dict": "rivers",
+                  "lakes_dict": "lakes"}, per_fire=True, inputs=("poly",),
+          outputs=("area", "distance_to_car_road", "distance_to_railway", "distance_to_river", "distance_to_lake"),
+          projected=("car_roads_dict", "railways_dict", "rivers_dict", "lakes_dict")),
+    Stage("weather-stations", fp.determine_nearest_weather_station_to_fire,
+          layers={"weather_stations_dict": "weather_stations"}, per_fire=True, inputs=("lat", "lon"),
+          outputs=("weather_station_id", "weather_station_name"), directories=(gp.WEATHER_DIR_NAME, gp.WEATHER_CONDITIONS_DIR_NAME)),
+    Stage("weather", fp.determine_weather_characteristics, after=("weather-stations",), per_fire=True,
+          inputs=("dt", "weather_station_id"), outputs=("RRR", "Ff", "U", "T", "Td", "DD", "WW", "W1", "W2", "Po"),
+          directories=(gp.WEATHER_DIR_NAME,)),
+    Stage("hazard-weather", fp.determine_hazard_classes_by_weather, after=("weather-stations",), per_fire=True,
+          inputs=("dt", "weather_station_id"), outputs=("weather_hazard_class",), directories=(gp.WEATHER_CONDITIONS_DIR_NAME,)),
+    Stage("hazard", fp.determine_hazard_classes_by_forest_districts,
+          layers={"forest_districts_dict": "forest_districts", "forest_hazard_classes_dict": "forest_hazard_classes"},
+          per_fire=True, inputs=("poly",), outputs=("kv", "forest_hazard_classes", "flag")),
+    Stage("forest-types", fp.determine_forest_types,
+          layers={"forest_districts_dict": "forest_districts", "forest_types_dict": "forest_types"}, per_fire=True,
+          inputs=("poly",), outputs=("forest_zone", "forest_seed_zoning_zones")),
+    Stage("snowiness", fp.determine_snowiness, layers={"snowiness_dict": "snowiness"},
+          after=("weather-stations",), per_fire=True, inputs=("dt", "weather_station_id"), outputs=("snowiness",)),
+    Stage("thunderstorm", fp.determine_dry_thunderstorm, after=("weather-stations",), per_fire=True,
+          inputs=("dt", "weather_station_id"), outputs=("thunderstorm",), directories=(gp.WEATHER_DIR_NAME,)),
+    Stage("loc", fp.determine_loc, layers={"loc_dict": "loc"}, per_fire=True),
+    # Этапы для лесных кварталов
+    Stage("district-hazard-classes", fdp.determine_hazard_classes_for_forest_districts, target="forest_districts",
+          layers={"forest_hazard_classes_dict": "forest_hazard_classes"}),
+    Stage("district-attributes", fdp.determine_attributes_for_forest_districts, target="forest_districts",
+          layers={"forest_hazard_classes_dict": "forest_hazard_classes", "forest_types_dict": "forest_types"}),
+    Stage("district-weather-stations", fdp.determine_nearest_weather_station_to_forest_district,
+          target="forest_districts_processed", layers={"weather_stations_dict": "weather_stations"}),
+    Stage("district-weather", fdp.determine_weather_characteristics_for_forest_district,
+          target="forest_districts_processed", options=("target_date",), after=("district-weather-stations",)),
+    Stage("district-hazard-weather", fdp.determine_hazard_classes_by_weather_for_forest_district,
+          target="forest_districts_processed", options=("target_date",), after=("district-weather-stations",)),
+    Stage("district-snowiness", fdp.determine_snowiness_for_forest_district, target="forest_districts_processed",
+          layers={"snowiness_dict": "snowiness"}, options=("target_year",), after=("district-weather-stations",)),
+    Stage("district-forest-types", fdp.determine_forest_types_for_forest_district,
+          target="forest_districts_processed", layers={"forest_types_dict": "forest_types"}),
+    Stage("district-thunderstorm", fdp.determine_dry_thunderstorm_for_forest_district,
+          target="forest_districts_processed", options=("target_date",), after=("district-weather-stations",))
+]}
+
+
+def get_stage_order(stage_names, with_dependencies=False):
+    """
+    Упорядочивание этапов по зависимостям (при равенстве — в порядке объявления этапов).
+    :param stage_names: названия выбранных этапов
+    :param with_dependencies: добавлять невыбранные этапы, от которых зависят выбранные
+    :return: список этапов в порядке выполнения
+    """
+    for name in stage_names:
+        if name not in STAGES:
+            raise ValueError("Неизвестный этап: " + name)
+    selected = set(stage_names)
+    if with_dependencies:
+        names = list(stage_names)
+        while names:
+            for dependency in STAGES[names.pop()].after:
+                if dependency not in selected:
+                    selected.add(dependency)
+                    names.append(dependency)
+    order = []
+    done = set()
+    # Выбор первого в порядке объявления этапа, все выбранные зависимости которого уже выполнены
+    while len(order) < len(selected):
+        for stage in STAGES.values():
+            if stage.name in selected and stage.name not in done and \
+                    all(name in done or name not in selected for name in stage.after):
+                order.append(stage)
+                done.add(stage.name)
+                break
+
+    return order
+
+
+class Pipeline:
+    """
+    Запуск этапов обработки: каждый слой данных загружается один раз и используется всеми этапами.
+    """
+
+    def __init__(self, target_date=None, chunk_size=None, workers=None, checkpoint_interval=None, resume=False,
+                 cache=False):
+        """
+        :param target_date: целевая дата для этапов по лесным кварталам
+        :param chunk_size: количество пожаров в одной части (потоковая обработка файла с пожарами)
+        :param workers: количество процессов для параллельного выполнения этапов по пожарам
+        :param checkpoint_interval: количество пожаров, после обработки которых результаты этапа по пожарам
+        сохраняются в контрольную точку (None — без контрольных точек)
+        :param resume: продолжить обработку с контрольных точек предыдущего запуска
+        :param cache: использовать кэш результатов этапов по пожарам (повторно обрабатываются только новые
+        и измененные пожары)
+        """
+        self.options = dict()
+        if target_date is not None:
+            self.options["target_date"] = target_date
+            self.options["target_year"] = target_date.year
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.checkpoint_interval = checkpoint_interval
+        self.resume = resume
+        self.cache = cache
+        self.output_file_name = gp.OUTPUT_FILE_NAME
+        self._layers = dict()
+
+    def get_layer(self, name):
+        """
+        Получение слоя данных (загружается при первом обращении).
+        :param name: название слоя
+        :return: словарь с данными слоя
+        """
+        if name not in self._layers:
+            csv_file_name, loader = LAYERS[name]
+            print("Загрузка слоя: " + name)
+            self._layers[name] = loader(gp.get_csv_data(csv_file_name))
+
+        return self._layers[name]
+
+    def get_arguments(self, stage):
+        """
+        Получение аргументов функции этапа (кроме обрабатываемого словаря).
+        :param stage: этап обработки
+        :return: словарь аргументов по названиям
+        """
+        arguments = {argument: self.get_layer(layer) for argument, layer in stage.layers.items()}
+        for option in stage.options:
+            arguments[option] = self.options[option]
+
+        return arguments
+
+    def get_cache_file(self, stage):
+        """
+        Получение пути к файлу кэша результатов этапа (для текущих версий справочных слоев и данных метеостанций).
+        :param stage: этап обработки
+        :return: путь к файлу кэша
+        """
+        layer_versions = {layer: grc.get_layer_version(LAYERS[layer][0]) for layer in stage.layers.values()}
+        directory_versions = {subdir: grc.get_directory_version(subdir) for subdir in stage.directories}
+
+        return grc.get_cache_file(stage.name, grc.get_stage_version(stage.name, layer_versions, directory_versions))
+
+    def prepare_stage(self, stage, target_dict, arguments):
+        """
+        Подготовка общих файлов этапа до запуска процессов-исполнителей: перепроецирование справочных слоев
+        и загрузка в хранилище csv-файлов метеостанций пожаров. Иначе процессы одновременно записывают
+        одни и те же файлы (слоев в метрической системе координат и хранилища).
+        :param stage: этап обработки
+        :param target_dict: обрабатываемый словарь
+        :param arguments: словарь аргументов функции этапа по названиям
+        """
+        for argument in stage.projected:
+            for layer in arguments[argument].layers.values():
+                layer.projected()
+        if len(stage.directories) != 0 and "weather_station_id" in (stage.inputs or ()):
+            station_ids = sorted(gws.group_by_station(target_dict.values()))
+            for subdir in stage.directories:
+                store = gws.get_station_store(subdir)
+                for station_id in station_ids:
+                    store.update_once(station_id)
+
+    def run_stage(self, stage, target_dict):
+        """
+        Выполнение этапа обработки.
+        :param stage: этап обработки
+        :param target_dict: обрабатываемый словарь
+        :return: обработанный словарь
+        """
+        print("Этап: " + stage.name)
+        arguments = self.get_arguments(stage)
+        if self.workers is not None and stage.per_fire:
+            self.prepare_stage(stage, target_dict, arguments)
+        if self.cache and stage.per_fire and stage.inputs is not None:
+            cache_file = self.get_cache_file(stage)
+            checkpoint_interval = gck.CHECKPOINT_INTERVAL if self.checkpoint_interval is None \
+                else self.checkpoint_interval
+            return gck.process_fires_with_checkpoints(target_dict, stage.function, cache_file, arguments,
+                                                      self.workers, checkpoint_interval=checkpoint_interval,
+                                                      get_key=partial(grc.get_input_hash, fields=stage.inputs),
+                                                      outputs=stage.outputs)
+        if self.checkpoint_interval is not None and stage.per_fire:
+            checkpoint_file = gck.get_checkpoint_file(stage.name, self.output_file_name)
+            return gck.process_fires_with_checkpoints(target_dict, stage.function, checkpoint_file, arguments,
+                                                      self.workers, checkpoint_interval=self.checkpoint_interval)
+        if self.workers is not None and stage.per_fire:
+            return gpp.process_fires_in_parallel(target_dict, stage.function, arguments, self.workers)
+
+        return stage.function(target_dict, **arguments)
+
+    def run(self, stage_names, output_file_name=gp.OUTPUT_FILE_NAME, with_dependencies=False):
+        """
+        Выполнение этапов обработки в порядке зависимостей и сохранение результата в csv-файл.
+        :param stage_names: названия этапов
+        :param output_file_name: название выходного csv-файла
+        :param with_dependencies: добавлять невыбранные этапы, от которых зависят выбранные
+        :return: обработанный словарь (None при потоковой обработке)
+        """
+        start_full_time = datetime.now()
+        stages = get_stage_order(stage_names, with_dependencies)
+        targets = {stage.target for stage in stages}
+        if len(targets) != 1:
+            print("Этапы для разных слоев (пожаров и лесных кварталов) запускаются отдельно!")
+            return None
+        target = targets.pop()
+        print("Этапы: " + ", ".join(stage.name for stage in stages))
+        self.output_file_name = output_file_name
+        if self.checkpoint_interval is not None and not self.resume:
+            # Без продолжения обработки контрольные точки предыдущего запуска удаляются
+            for stage in stages:
+                if stage.per_fire:
+                    gck.remove_checkpoint(gck.get_checkpoint_file(stage.name, output_file_name))
+        result = None
+        if self.chunk_size is not None:
+            if target != "fires" or not all(stage.per_fire for stage in stages):
+                print("Обработка по частям возможна только для этапов, обрабатывающих каждый пожар независимо!")
+                return None
+            # Справочные слои загружаются до обработки первой части
+            for stage in stages:
+                self.get_arguments(stage)
+            process_fires_in_chunks([partial(self.run_stage, stage) for stage in stages], self.chunk_size,
+                                    LAYERS[target][0], output_file_name)
+        else:
+            result = self.get_layer(target)
+            for stage in stages:
+                result = self.run_stage(stage, result)
+            gp.save_new_csv_file(result, output_file_name)
+        print("***************************************************")
+        print("Full time: " + str(datetime.now() - start_full_time))
+
+        return result
+
+    def run_hazard_calendar(self, start_date, end_date, output_file_name=HAZARD_CALENDAR_FILE_NAME):
+        """
+        Построение календаря классов пожарной опасности по условиям погоды для всех лесных кварталов за период
+        и сохранение его в npz-файл.
+        :param start_date: первый день периода
+        :param end_date: последний день периода
+        :param output_file_name: название выходного npz-файла
+        :return: дни периода и матрица кодов классов (лесные кварталы × дни)
+        """
+        forest_districts_processed_dict = self.get_layer("forest_districts_processed")
+        dates, codes = fdp.determine_hazard_class_calendar_for_forest_districts(forest_districts_processed_dict,
+                                                                                start_date, end_date)
+        fdp.save_hazard_class_calendar(forest_districts_processed_dict, dates, codes, output_file_name)
+
+        return dates, codes
@@ -1,9 +1,11 @@
-import os
-import math
-import fnmatch
+import codecs
+import importlib.util
 import pandas as pd
 from pathlib import Path
 
+from geoanalytics.geo_layer import add_geometry_layer
+from geoanalytics.records import get_csv_records
+
 
 # Каталоги с исходными данными
 DATA_DIR_NAME = "data"
@@ -31,24 +33,176 @@ OUTPUT_FILE_NAME = "data.csv"
 DATA_2019_V2 = "data-2019-v2.csv"
 DATA_2020_V2 = "data-2020-v2.csv"
 
+# Разделитель столбцов в csv-файлах
+CSV_SEPARATOR = ";"
+# Движок чтения csv-файлов: многопоточный pyarrow (если установлен) или однопоточный "c"
+CSV_ENGINE = "pyarrow" if importlib.util.find_spec("pyarrow") is not None else "c"
+# Кодировка выгрузок погоды с пометкой ".ansi." в названии, не читаемых в utf-8
+ANSI_ENCODING = "cp1251"
+# Размер начала csv-файла, по которому определяется кодировка (в байтах)
+CSV_ENCODING_SAMPLE_SIZE = 64 * 1024
+# Схемы чтения csv-файлов (по названию файла или каталога с csv-файлами метеостанций):
+# отбираемые столбцы (названия или номера столбцов; при номерах сохраняются номера столбцов файла, а
+# неотобранные столбцы остаются пустыми) и типы столбцов (текстовые столбцы не разбираются как числа и даты)
+CSV_SCHEMAS = {
+    FIRE_CSV_FILE: {
+        "columns": ["fire_id", "new_fire_id", "dt", "since", "lat", "lon", "poly", "geometry", "municipalities",
+                    "average_population_density", "forestry", "kv", "forest_hazard_classes", "flag", "forest_zone",
+                    "forest_seed_zoning_zones", "weather_hazard_class", "snowiness", "snowiness-uncertainty",
+                    "thunderstorm", "distance_to_car_road", "distance_to_lake", "area", "distance_to_railway",
+                    "distance_to_river", "weather_station_id", "weather_station_name", "RRR", "Ff", "U", "T", "Td",
+                    "DD", "WW", "W1", "W2", "Po"],
+        "dtypes": {"dt": str, "poly": str, "geometry": str},
+    },
+    NOT_FIRES_CSV_FILE: {"columns": ["id", "WKT", "WKB"], "dtypes": {"WKT": str, "WKB": str}},
+    LOCALITIES_CSV_FILE: {
+        "columns": ["name", "type", "name_MO", "code", "distance", "ado", "id", "query", "address", "geometry",
+                    "poly_wkt", "poly", "valid", "locality"],
+        "dtypes": {"name": str, "geometry": str, "poly_wkt": str, "poly": str},
+    },
+    CAR_ROADS_CSV_FILE: {"columns": ["id", "type", "geom"], "dtypes": {"geom": str}},
+    RAILWAYS_CSV_FILE: {"columns": ["id", "geom"], "dtypes": {"geom": str}},
+    RIVERS_CSV_FILE: {"columns": ["id", "name", "geom"], "dtypes": {"name": str, "geom": str}},
+    LAKES_CSV_FILE: {"columns": ["id", "name", "geom"], "dtypes": {"name": str, "geom": str}},
+    POPULATION_DENSITY_CSV_FILE: {"columns": ["id", "name", "population_density_2016", "geom"],
+                                  "dtypes": {"name": str, "geom": str}},
+    FORESTRY_CSV_FILE: {"columns": ["id", "oblname", "frname", "geom"],
+                        "dtypes": {"oblname": str, "frname": str, "geom": str}},
+    WEATHER_STATIONS_CSV_FILE: {"columns": ["id", "sinopticheski_in", "imya_stancii", "shirota", "dolgota"],
+                                "dtypes": {"imya_stancii": str}},
+    FOREST_DISTRICTS_CSV_FILE: {"columns": [0, 4, 5, 11, 20], "dtypes": {0: str, 4: str, 5: str, 20: str}},
+    FOREST_TYPES_PROCESSED_CSV_FILE: {"columns": [0, 2, 3, 4, 5, 6], "dtypes": {0: str, 2: str, 3: str}},
+    FOREST_HAZARD_CLASSES_CSV_FILE: {"columns": [0, 1, 2, 3, 4], "dtypes": {0: str, 1: str, 2: str}},
+    SNOWINESS_CSV_FILE: {"columns": [0, 2, 3, 17], "dtypes": {2: str, 3: str}},
+    DATA_2020_V2: {"columns": ["name", "ado", "distance", "name_MO"], "dtypes": {"name": str, "name_MO": str}},
+    WEATHER_DIR_NAME: {"columns": [0, "RRR", "Ff", "U", "T", "Td", "DD", "WW", "W1", "W2", "Po", "Tn", "Tx"],
+                       "dtypes": {0: str, "RRR": str, "DD": str, "WW": str, "W1": str, "W2": str}},
+    WEATHER_CONDITIONS_DIR_NAME: {"columns": [3, 10], "dtypes": {3: str}},
+}
+
+
+def get_csv_file(csv_file_name, subdir=None):
+    """
+    Получение полного пути к csv-файлу электронной таблицы.
+    :param csv_file_name: название csv-файла электронной таблицы с расширением
+    :param subdir: название дополнительного каталога
+    :return: путь к csv-файлу
+    """
+    if subdir is None:
+        return Path(Path.cwd().parent, DATA_DIR_NAME, csv_file_name)
+
+    return Path(Path.cwd().parent, DATA_DIR_NAME, subdir, csv_file_name)
+
+
+def get_fallback_encoding(csv_file):
+    """
+    Определение кодировки csv-файла, не читаемого в utf-8: выгрузки погоды с пометкой ".ansi." в названии
+    читаются в ANSI_ENCODING, в остальных файлах ошибочные байты заменяются.
+    :param csv_file: путь к csv-файлу
+    :return: кодировка и способ обработки ошибок декодирования
+    """
+    if ".ansi." in Path(csv_file).name:
+        return ANSI_ENCODING, "strict"
+
+    return "utf-8", "replace"
+
+
+def get_csv_encoding(csv_file):
+    """
+    Определение кодировки csv-файла по его началу (CSV_ENCODING_SAMPLE_SIZE байтов): файлы читаются в utf-8,
+    файлы с ошибочными для utf-8 байтами — в кодировке get_fallback_encoding.
+    Ошибочные байты после начала файла обнаруживаются при чтении (см. get_csv_data, get_csv_chunks).
+    :param csv_file: путь к csv-файлу
+    :return: кодировка и способ обработки ошибок декодирования
+    """
+    with open(csv_file, "rb") as file:
+        sample = file.read(CSV_ENCODING_SAMPLE_SIZE)
+    try:
+        # Символ, разрезанный концом начала файла, ошибкой не считается
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8", "strict"
+    except UnicodeDecodeError:
+        return get_fallback_encoding(csv_file)
+
+
+def get_csv_read_options(csv_file, schema=None):
+    """
+    Получение параметров чтения csv-файла (pd.read_csv) по схеме.
+    :param csv_file: путь к csv-файлу
+    :param schema: схема чтения (отбираемые столбцы и их типы) или None (все столбцы с определением типов)
+    :return: параметры чтения и заголовок файла (названия всех столбцов)
+    """
+    encoding, encoding_errors = get_csv_encoding(csv_file)
+    options = {"sep": CSV_SEPARATOR, "header": 0, "index_col": False, "encoding": encoding,
+               "encoding_errors": encoding_errors}
+    header = list(pd.read_csv(csv_file, nrows=0, **options).columns)
+    if schema is not None:
+        # Номера отбираемых столбцов (отсутствующие в файле столбцы пропускаются)
+        positions = [column if isinstance(column, int) else header.index(column) for column in schema["columns"]
+                     if (isinstance(column, int) and column < len(header)) or column in header]
+        dtypes = dict()
+        for column, dtype in schema["dtypes"].items():
+            position = column if isinstance(column, int) else header.index(column) if column in header else None
+            if position is not None and position in positions:
+                dtypes[header[position]] = dtype
+        options["usecols"] = sorted(positions)
+        options["dtype"] = dtypes
+
+    return options, header
+
+
+def read_csv_data(csv_file, options, header):
+    """
+    Чтение csv-файла многопоточным движком pyarrow (если он установлен и применим) или движком "c".
+    :param csv_file: путь к csv-файлу
+    :param options: параметры чтения (см. get_csv_read_options)
+    :param header: заголовок файла (названия всех столбцов)
+    :return: набор данных
+    """
+    # Многопоточный движок pyarrow не поддерживает замену ошибочных байтов, номера столбцов
+    # и повторяющиеся названия столбцов
+    if CSV_ENGINE == "pyarrow" and options["encoding_errors"] == "strict" and len(set(header)) == len(header):
+        arrow_options = {name: value for name, value in options.items() if name not in ["index_col", "encoding_errors"]}
+        if "usecols" in arrow_options:
+            arrow_options["usecols"] = [header[position] for position in arrow_options["usecols"]]
+        try:
+            return pd.read_csv(csv_file, engine="pyarrow", **arrow_options)
+        except ValueError as error:
+            # pyarrow сообщает об ошибочных для utf-8 байтах ошибкой разбора
+            if "utf" not in str(error).lower():
+                raise
+            raise UnicodeDecodeError(options["encoding"], b"", 0, 0, str(error))
+
+    return pd.read_csv(csv_file, engine="c", **options)
+
 
 def get_csv_data(csv_file_name, subdir=None):
     """
     Получение данных из csv-файла электронной таблицы.
+    Если для файла (или каталога) задана схема чтения, читаются только отобранные столбцы с заданными типами.
     :param csv_file_name: название csv-файла электронной таблицы с расширением
     :param subdir: название дополнительного каталога
     :return: набор данных
     """
     file_data = None
     # Формирование полного пути к csv-файлу электронной таблицы
-    if subdir is None:
-        csv_file = Path(Path.cwd().parent, DATA_DIR_NAME, csv_file_name)
-    else:
-        csv_file = Path(Path.cwd().parent, DATA_DIR_NAME, subdir, csv_file_name)
+    csv_file = get_csv_file(csv_file_name, subdir)
     # Если указанный csv-файл существует
     if csv_file.exists():
         try:
-            file_data = pd.DataFrame(pd.read_csv(csv_file, sep=";", header=0, index_col=False))
+            schema = CSV_SCHEMAS.get(csv_file_name if subdir is None else subdir)
+            options, header = get_csv_read_options(csv_file, schema)
+            try:
+                file_data = read_csv_data(csv_file, options, header)
+            except UnicodeDecodeError:
+                # Ошибочные для utf-8 байты после начала файла, по которому определена кодировка
+                options["encoding"], options["encoding_errors"] = get_fallback_encoding(csv_file)
+                file_data = read_csv_data(csv_file, options, header)
+            if schema is not None and any(isinstance(column, int) for column in schema["columns"]):
+                # Сохранение номеров столбцов файла (на них ссылаются функции получения словарей)
+                file_data = file_data.reindex(columns=header)
+            # Путь к исходному файлу (используется для сохранения производных данных рядом с ним)
+            file_data.attrs["source"] = str(csv_file)
         except pd.errors.EmptyDataError:
             print("Файл электронной таблицы пуст!")
     else:
@@ -57,79 +211,135 @@ def get_csv_data(csv_file_name, subdir=None):
     return file_data
 
 
-def get_csv_file_list(subdir):
+def get_csv_chunks(csv_file_name, chunk_size, subdir=None):
     """
-    Получение списка файлов из заданного каталога.
+    Получение данных из csv-файла электронной таблицы частями (без чтения всего файла в память).
+    :param csv_file_name: название csv-файла электронной таблицы с расширением
+    :param chunk_size: количество строк в одной части
     :param subdir: название дополнительного каталога
-    :return: список файлов с информацией по погоде
+    :return: генератор наборов данных (частей файла)
     """
-    return [f for f in os.listdir(Path(Path.cwd().parent, DATA_DIR_NAME, subdir)) if fnmatch.fnmatch(f, "*.csv")]
+    # Формирование полного пути к csv-файлу электронной таблицы
+    csv_file = get_csv_file(csv_file_name, subdir)
+    # Если указанный csv-файл существует
+    if csv_file.exists():
+        try:
+            # Чтение частями поддерживается только движком "c"
+            options, _ = get_csv_read_options(csv_file, CSV_SCHEMAS.get(csv_file_name if subdir is None else subdir))
+            row_number = 0
+            while True:
+                try:
+                    # При повторном чтении пропускаются уже полученные строки
+                    with pd.read_csv(csv_file, engine="c", chunksize=chunk_size, skiprows=range(1, row_number + 1),
+                                     **options) as reader:
+                        for file_data in reader:
+                            file_data.attrs["source"] = str(csv_file)
+                            row_number += len(file_data)
+                            yield file_data
+                    break
+                except UnicodeDecodeError:
+                    # Ошибочные для utf-8 байты после начала файла, по которому определена кодировка
+                    if (options["encoding"], options["encoding_errors"]) == get_fallback_encoding(csv_file):
+                        raise
+                    options["encoding"], options["encoding_errors"] = get_fallback_encoding(csv_file)
+        except pd.errors.EmptyDataError:
+            print("Файл электронной таблицы пуст!")
+    else:
+        print("Файла электронной таблицы не существует!")
 
 
-def save_new_csv_file(target_dict):
+def save_new_csv_file(target_dict, output_file_name=OUTPUT_FILE_NAME):
     """
     Сохранение целевого словаря в формате CSV.
     :param target_dict: целевой словарь
+    :param output_file_name: название выходного csv-файла
+    """
+    if hasattr(target_dict, "to_frame"):
+        # Словарь записей (RecordDict) преобразуется по столбцам без создания словарей записей
+        df = target_dict.to_frame()
+    else:
+        df = pd.DataFrame.from_dict(target_dict, orient="index")
+    df.to_csv(output_file_name, sep=";", index_label="id")
+
+
+def append_csv_file(target_dict, output_file_name=OUTPUT_FILE_NAME, columns=None):
+    """
+    Дописывание целевого словаря в конец csv-файла (для сохранения результатов по частям).
+    :param target_dict: целевой словарь
+    :param output_file_name: название выходного csv-файла
+    :param columns: список столбцов файла (None — файл создается заново с заголовком по столбцам словаря)
+    :return: список столбцов файла
     """
-    df = pd.DataFrame.from_dict(target_dict, orient="index")
-    df.to_csv(OUTPUT_FILE_NAME, sep=";", index_label="id")
+    if hasattr(target_dict, "to_frame"):
+        df = target_dict.to_frame()
+    else:
+        df = pd.DataFrame.from_dict(target_dict, orient="index")
+    if columns is None:
+        columns = list(df.columns)
+        df.to_csv(output_file_name, sep=";", index_label="id")
+    else:
+        # Столбцы всех частей приводятся к столбцам первой части
+        df.reindex(columns=columns).to_csv(output_file_name, sep=";", header=False, mode="a")
 
+    return columns
 
-def get_fires_dict(fires_csv_data):
+
+def get_fires_dict(fires_csv_data, start_id=1):
     """
     Получение словаря с необходимой информацией по пожарам из данных csv-файла электронной таблицы.
     :param fires_csv_data: данные csv-файла электронной таблицы по пажарам
+    :param start_id: идентификатор первого пожара (для чтения файла по частям)
     :return: словарь с информацией по пожарам
     """
-    result = dict()
-    result_id = 1
-    for index, row in fires_csv_data.iterrows():
-        item = dict()
-        item["fire_id"] = row["fire_id"]
-        # item["new_fire_id"] = ""  # Для обработки старого файла пожаров
-        item["new_fire_id"] = row["new_fire_id"]
-        item["dt"] = row["dt"]
-        item["since"] = row["since"]
-        item["lat"] = row["lat"]
-        item["lon"] = row["lon"]
-        item["poly"] = row["poly"]
-        item["geometry"] = row["geometry"]
+    result = get_csv_records(fires_csv_data, {
+        "fire_id": "fire_id",
+        # "new_fire_id": None,  # Для обработки старого файла пожаров
+        "new_fire_id": "new_fire_id",
+        "dt": "dt",
+        "since": "since",
+        "lat": "lat",
+        "lon": "lon",
+        "poly": "poly",
+        "geometry": "geometry",
         # Поля для получения расширенной информации по пожарам
-        item["municipalities"] = row["municipalities"]
-        item["average_population_density"] = row["average_population_density"]
-        item["forestry"] = row["forestry"]
-        item["kv"] = row["kv"]
-        item["forest_hazard_classes"] = row["forest_hazard_classes"]
-        item["flag"] = row["flag"]
-        item["forest_zone"] = row["forest_zone"]
-        item["forest_seed_zoning_zones"] = row["forest_seed_zoning_zones"]
-        item["weather_hazard_class"] = row["weather_hazard_class"]
-        item["snowiness"] = row["snowiness"]
-        item["snowiness-uncertainty"] = row["snowiness-uncertainty"]
-        item["thunderstorm"] = row["thunderstorm"]
-        item["distance_to_car_road"] = row["distance_to_car_road"]
-        item["distance_to_lake"] = row["distance_to_lake"]
-        item["area"] = row["area"]
-        item["distance_to_railway"] = row["distance_to_railway"]
-        # item["distance_to_river"] = row["distance_to_river"]  # Необходимо отключить, т.к. время подсчета очень большое
-        item["weather_station_id"] = row["weather_station_id"]
-        item["weather_station_name"] = row["weather_station_name"]
-        item["RRR"] = row["RRR"]
-        item["Ff"] = row["Ff"]
-        item["U"] = row["U"]
-        item["T"] = row["T"]
-        item["Td"] = row["Td"]
-        item["DD"] = row["DD"]
-        item["WW"] = row["WW"]
-        item["W1"] = row["W1"]
-        item["W2"] = row["W2"]
-        item["Po"] = row["Po"]
-        # item["name_locality"] = row["name_locality"]
-        # item["name_MO_locality"] = row["name_MO_locality"]
-        # item["municipalities_locality"] = row["municipalities_locality"]
-        # item["distance_to_locality"] = row["distance_to_locality"]
-        result[result_id] = item
-        result_id += 1
+        "municipalities": "municipalities",
+        "average_population_density": "average_population_density",
+        "forestry": "forestry",
+        "kv": "kv",
+        "forest_hazard_classes": "forest_hazard_classes",
+        "flag": "flag",
+        "forest_zone": "forest_zone",
+        "forest_seed_zoning_zones": "forest_seed_zoning_zones",
+        "weather_hazard_class": "weather_hazard_class",
+        "snowiness": "snowiness",
+        "snowiness-uncertainty": "snowiness-uncertainty",
+        "thunderstorm": "thunderstorm",
+        "distance_to_car_road": "distance_to_car_road",
+        "distance_to_lake": "distance_to_lake",
+        "area": "area",
+        "distance_to_railway": "distance_to_railway",
+        "distance_to_river": "distance_to_river" if "distance_to_river" in fires_csv_data.columns else None,
+        "weather_station_id": "weather_station_id",
+        "weather_station_name": "weather_station_name",
+        "RRR": "RRR",
+        "Ff": "Ff",
+        "U": "U",
+        "T": "T",
+        "Td": "Td",
+        "DD": "DD",
+        "WW": "WW",
+        "W1": "W1",
+        "W2": "W2",
+        "Po": "Po",
+        # "name_locality": "name_locality",
+        # "name_MO_locality": "name_MO_locality",
+        # "municipalities_locality": "municipalities_locality",
+        # "distance_to_locality": "distance_to_locality",
+    }, start_key=start_id)
+
+    # Построение слоев с геометриями
+    add_geometry_layer(result, "poly")
+    add_geometry_layer(result, "geometry", "wkt")
 
     return result
 
@@ -140,15 +350,14 @@ def get_not_fires_dict(not_fires_csv_data):
     :param not_fires_csv_data: данные csv-файла электронной таблицы по не пажарам
     :return: словарь с информацией по не пожарам
     """
-    result = dict()
-    result_id = 1
-    for index, row in not_fires_csv_data.iterrows():
-        item = dict()
-        item["id"] = row["id"]
-        item["WKT"] = row["WKT"]
-        item["WKB"] = row["WKB"]
-        result[result_id] = item
-        result_id += 1
+    result = get_csv_records(not_fires_csv_data, {
+        "id": "id",
+        "WKT": "WKT",
+        "WKB": "WKB",
+    })
+
+    # Построение слоев с геометриями
+    add_geometry_layer(result, "WKB")
 
     return result
 
@@ -159,26 +368,25 @@ def get_locality_dict(locality_csv_data):
     :param locality_csv_data: данные csv-файла электронной таблицы по населенным пунктам
     :return: словарь с информацией по населенным пунктам
     """
-    result = dict()
-    result_id = 1
-    for index, row in locality_csv_data.iterrows():
-        item = dict()
-        item["name"] = row["name"]
-        item["type"] = row["type"]
-        item["name_MO"] = row["name_MO"]
-        item["code"] = row["code"]
-        item["distance"] = row["distance"]
-        item["ado"] = row["ado"]
-        item["id"] = row["id"]
-        item["query"] = row["query"]
-        item["address"] = row["address"]
-        item["geometry"] = row["geometry"]
-        item["poly_wkt"] = row["poly_wkt"]
-        item["poly"] = row["poly"]
-        item["valid"] = row["valid"]
-        item["locality"] = row["locality"]
-        result[result_id] = item
-        result_id += 1
+    result = get_csv_records(locality_csv_data, {
+        "name": "name",
+        "type": "type",
+        "name_MO": "name_MO",
+        "code": "code",
+        "distance": "distance",
+        "ado": "ado",
+        "id": "id",
+        "query": "query",
+        "address": "address",
+        "geometry": "geometry",
+        "poly_wkt": "poly_wkt",
+        "poly": "poly",
+        "valid": "valid",
+        "locality": "locality",
+    })
+
+    # Построение слоев с геометриями
+    add_geometry_layer(result, "poly_wkt", "wkt")
 
     return result
 
@@ -189,12 +397,13 @@ def get_car_roads_dict(car_roads_csv_data):
     :param car_roads_csv_data: данные csv-файла электронной таблицы по автомобильным дорогам
     :return: словарь с информацией по автомобильным дорогам
     """
-    result = dict()
-    for index, row in car_roads_csv_data.iterrows():
-        item = dict()
-        item["type"] = row["type"]
-        item["geom"] = row["geom"]
-        result[row["id"]] = item
+    result = get_csv_records(car_roads_csv_data, {
+        "type": "type",
+        "geom": "geom",
+    }, "id")
+
+    # Построение слоев с геометриями
+    add_geometry_layer(result, "geom", source=car_roads_csv_data.attrs.get("source"))
 
     return result
 
@@ -205,11 +414,12 @@ def get_railways_dict(railways_csv_data):
     :param railways_csv_data: данные csv-файла электронной таблицы по железным дорогам
     :return: словарь с информацией по железным дорогам
     """
-    result = dict()
-    for index, row in railways_csv_data.iterrows():
-        item = dict()
-        item["geom"] = row["geom"]
-        result[row["id"]] = item
+    result = get_csv_records(railways_csv_data, {
+        "geom": "geom",
+    }, "id")
+
+    # Построение слоев с геометриями
+    add_geometry_layer(result, "geom", source=railways_csv_data.attrs.get("source"))
 
     return result
 
@@ -220,12 +430,13 @@ def get_rivers_dict(rivers_csv_data):
     :param rivers_csv_data: данные csv-файла электронной таблицы по рекам
     :return: словарь с информацией по рекам
     """
-    result = dict()
-    for index, row in rivers_csv_data.iterrows():
-        item = dict()
-        item["name"] = row["name"]
-        item["geom"] = row["geom"]
-        result[row["id"]] = item
+    result = get_csv_records(rivers_csv_data, {
+        "name": "name",
+        "geom": "geom",
+    }, "id")
+
+    # Построение слоев с геометриями
+    add_geometry_layer(result, "geom", source=rivers_csv_data.attrs.get("source"))
 
     return result
 
@@ -236,12 +447,13 @@ def get_lakes_dict(lakes_csv_data):
     :param lakes_csv_data: данные csv-файла электронной таблицы по озерам
     :return: словарь с информацией по озерам
     """
-    result = dict()
-    for index, row in lakes_csv_data.iterrows():
-        item = dict()
-        item["name"] = row["name"]
-        item["geom"] = row["geom"]
-        result[row["id"]] = item
+    result = get_csv_records(lakes_csv_data, {
+        "name": "name",
+        "geom": "geom",
+    }, "id")
+
+    # Построение слоев с геометриями
+    add_geometry_layer(result, "geom", source=lakes_csv_data.attrs.get("source"))
 
     return result
 
@@ -252,13 +464,14 @@ def get_population_density_dict(population_density_csv_data):
     :param population_density_csv_data: данные csv-файла электронной таблицы по плотности населения
     :return: словарь с информацией по плотности населения
     """
-    result = dict()
-    for index, row in population_density_csv_data.iterrows():
-        item = dict()
-        item["name"] = row["name"]
-        item["population_density_2016"] = row["population_density_2016"]
-        item["geom"] = row["geom"]
-        result[row["id"]] = item
+    result = get_csv_records(population_density_csv_data, {
+        "name": "name",
+        "population_density_2016": "population_density_2016",
+        "geom": "geom",
+    }, "id")
+
+    # Построение слоев с геометриями
+    add_geometry_layer(result, "geom", source=population_density_csv_data.attrs.get("source"))
 
     return result
 
@@ -269,13 +482,14 @@ def get_forestry_dict(forestry_csv_data):
     :param forestry_csv_data: данные csv-файла электронной таблицы по лесничествам
     :return: словарь с информацией по лесничествам
     """
-    result = dict()
-    for index, row in forestry_csv_data.iterrows():
-        item = dict()
-        item["oblname"] = row["oblname"]
-        item["frname"] = row["frname"]
-        item["geom"] = row["geom"]
-        result[row["id"]] = item
+    result = get_csv_records(forestry_csv_data, {
+        "oblname": "oblname",
+        "frname": "frname",
+        "geom": "geom",
+    }, "id")
+
+    # Построение слоев с геометриями
+    add_geometry_layer(result, "geom", source=forestry_csv_data.attrs.get("source"))
 
     return result
 
@@ -286,23 +500,16 @@ def get_weather_stations_dict(weather_stations_csv_data):
     :param weather_stations_csv_data: данные csv-файла электронной таблицы по метеостанциям
     :return: словарь с информацией по метеостанциям
     """
-    results = dict()
-    for index, row in weather_stations_csv_data.iterrows():
-        item = dict()
-        number = float(row["sinopticheski_in"])
-        if not math.isnan(number):
-            weather_station_id_exist = False
-            for result in results.values():
-                if result["weather_station_id"] == row["sinopticheski_in"]:
-                    weather_station_id_exist = True
-            if weather_station_id_exist is False:
-                item["weather_station_id"] = row["sinopticheski_in"]
-                item["weather_station_name"] = row["imya_stancii"]
-                item["latitude"] = row["shirota"]
-                item["longitude"] = row["dolgota"]
-                results[row["id"]] = item
-
-    return results
+    # Отбор метеостанций с синоптическим индексом (для повторяющихся индексов остается первая метеостанция)
+    numbers = weather_stations_csv_data["sinopticheski_in"].astype(float)
+    weather_stations_csv_data = weather_stations_csv_data[numbers.notna() & ~numbers.duplicated()]
+
+    return get_csv_records(weather_stations_csv_data, {
+        "weather_station_id": "sinopticheski_in",
+        "weather_station_name": "imya_stancii",
+        "latitude": "shirota",
+        "longitude": "dolgota",
+    }, "id")
 
 
 def get_weather_dict(weather_csv_data):
@@ -311,27 +518,21 @@ def get_weather_dict(weather_csv_data):
     :param weather_csv_data: данные csv-файла электронной таблицы по погоде
     :return: словарь с информацией по погоде
     """
-    result = dict()
-    result_id = 1
-    for index, row in weather_csv_data.iterrows():
-        item = dict()
-        item["datetime"] = row[0]
-        item["RRR"] = row["RRR"]
-        item["Ff"] = row["Ff"]
-        item["U"] = row["U"]
-        item["T"] = row["T"]
-        item["Td"] = row["Td"]
-        item["DD"] = row["DD"]
-        item["WW"] = row["WW"]
-        item["W1"] = row["W1"]
-        item["W2"] = row["W2"]
-        item["Po"] = row["Po"]
-        item["Tn"] = row["Tn"]
-        item["Tx"] = row["Tx"]
-        result[result_id] = item
-        result_id += 1
-
-    return result
+    return get_csv_records(weather_csv_data, {
+        "datetime": 0,
+        "RRR": "RRR",
+        "Ff": "Ff",
+        "U": "U",
+        "T": "T",
+        "Td": "Td",
+        "DD": "DD",
+        "WW": "WW",
+        "W1": "W1",
+        "W2": "W2",
+        "Po": "Po",
+        "Tn": "Tn",
+        "Tx": "Tx",
+    })
 
 
 def get_forest_districts_dict(forest_districts_csv_data):
@@ -340,18 +541,17 @@ def get_forest_districts_dict(forest_districts_csv_data):
     :param forest_districts_csv_data: данные csv-файла электронной таблицы по лесным кварталам
     :return: словарь с информацией по лесным кварталам
     """
-    result = dict()
-    result_id = 1
-    for index, row in forest_districts_csv_data.iterrows():
-        item = dict()
-        # Для исходного файла кварталов из ГИС
-        item["name_in"] = row[0]
-        item["dacha_ru"] = row[4]
-        item["uch_l_ru"] = row[5]
-        item["kv"] = row[11]
-        item["geom"] = row[20]
-        result[result_id] = item
-        result_id += 1
+    # Для исходного файла кварталов из ГИС
+    result = get_csv_records(forest_districts_csv_data, {
+        "name_in": 0,
+        "dacha_ru": 4,
+        "uch_l_ru": 5,
+        "kv": 11,
+        "geom": 20,
+    })
+
+    # Построение слоев с геометриями
+    add_geometry_layer(result, "geom", source=forest_districts_csv_data.attrs.get("source"))
 
     return result
 
@@ -363,42 +563,37 @@ def get_forest_districts_processed_dict(forest_districts_processed_csv_data):
     :param forest_districts_processed_csv_data: обработанные данные csv-файла электронной таблицы по лесным кварталам
     :return: словарь с информацией по лесным кварталам (обработанные)
     """
-    result = dict()
-    result_id = 1
-    for index, row in forest_districts_processed_csv_data.iterrows():
-        item = dict()
-        # Для обработанного файла кварталов
-        item["name_in"] = row[1]
-        item["dacha_ru"] = row[2]
-        item["uch_l_ru"] = row[3]
-        item["kv"] = row[4]
-        item["geom"] = row[5]
-        item["hazard_classes"] = row[6]
-
-        string = str(row[7]).replace(" ", "")
-        string = string.replace("'", "")
-        string = string.replace("[", "")
-        res_string = string.replace("]", "")
-        item["weather_stations"] = res_string.split(",")
-
-        item["RRR"] = row[8]
-        item["Ff"] = row[9]
-        item["U"] = row[10]
-        item["Td"] = row[11]
-        item["DD"] = row[12]
-        item["WW"] = row[13]
-        item["W1"] = row[14]
-        item["W2"] = row[15]
-        item["Po"] = row[16]
-        item["Tn"] = row[17]
-        item["Tx"] = row[18]
-        item["Tx"] = row[18]
-        item["weather_hazard_class"] = row[19]
-        item["snowiness"] = row[20]
-        item["forest_zone"] = row[21]
-        item["forest_seed_zoning_zones"] = row[22]
-        result[result_id] = item
-        result_id += 1
+    # Для обработанного файла кварталов
+    result = get_csv_records(forest_districts_processed_csv_data, {
+        "name_in": 1,
+        "dacha_ru": 2,
+        "uch_l_ru": 3,
+        "kv": 4,
+        "geom": 5,
+        "hazard_classes": 6,
+        "weather_stations": 7,
+        "RRR": 8,
+        "Ff": 9,
+        "U": 10,
+        "Td": 11,
+        "DD": 12,
+        "WW": 13,
+        "W1": 14,
+        "W2": 15,
+        "Po": 16,
+        "Tn": 17,
+        "Tx": 18,
+        "weather_hazard_class": 19,
+        "snowiness": 20,
+        "forest_zone": 21,
+        "forest_seed_zoning_zones": 22,
+    })
+    # Список метеостанций из строкового представления списка (например, "['30230', '30328']")
+    weather_stations = pd.Series(result.get_column("weather_stations"), dtype=object).astype(str)
+    result.set_column("weather_stations", weather_stations.str.replace(r"[ '\[\]]", "", regex=True).str.split(","))
+
+    # Построение слоев с геометриями
+    add_geometry_layer(result, "geom", source=forest_districts_processed_csv_data.attrs.get("source"))
 
     return result
 
@@ -409,18 +604,15 @@ def get_forest_types_dict(forest_types_csv_data):
     :param forest_types_csv_data: данные csv-файла электронной таблицы по типам лесов
     :return: словарь с информацией по типам лесов
     """
-    result = dict()
-    result_id = 1
-    for index, row in forest_types_csv_data.iterrows():
-        item = dict()
-        item["name_in"] = row[0]
-        item["uch_l_ru"] = row[2]
-        item["dacha_ru"] = row[3]
-        item["forest_zone"] = row[4]
-        item["forest_seed_zoning_zone"] = row[5]
-        item["kv"] = str(row[6]).split(",")
-        result[result_id] = item
-        result_id += 1
+    result = get_csv_records(forest_types_csv_data, {
+        "name_in": 0,
+        "uch_l_ru": 2,
+        "dacha_ru": 3,
+        "forest_zone": 4,
+        "forest_seed_zoning_zone": 5,
+        "kv": 6,
+    })
+    result.set_column("kv", pd.Series(result.get_column("kv"), dtype=object).astype(str).str.split(","))
 
     return result
 
@@ -431,17 +623,15 @@ def get_forest_hazard_classes_dict(forest_hazard_classes_csv_data):
     :param forest_hazard_classes_csv_data: данные csv-файла электронной таблицы по классам опасности лесов
     :return: словарь с информацией по классам опасности лесов
     """
-    result = dict()
-    result_id = 1
-    for index, row in forest_hazard_classes_csv_data.iterrows():
-        item = dict()
-        item["municipality"] = row[0]
-        item["forest_plot"] = row[1]
-        item["dacha"] = row[2]
-        item["forest_districts"] = str(row[3]).split(",")
-        item["hazard_class"] = row[4]
-        result[result_id] = item
-        result_id += 1
+    result = get_csv_records(forest_hazard_classes_csv_data, {
+        "municipality": 0,
+        "forest_plot": 1,
+        "dacha": 2,
+        "forest_districts": 3,
+        "hazard_class": 4,
+    })
+    forest_districts = pd.Series(result.get_column("forest_districts"), dtype=object).astype(str)
+    result.set_column("forest_districts", forest_districts.str.split(","))
 
     return result
 
@@ -452,16 +642,10 @@ def get_weather_conditions_dict(weather_conditions_csv_data):
     :param weather_conditions_csv_data: данные csv-файла электронной таблицы по погодным условиям (прогнозу погоды)
     :return: словарь с информацией по погодным условиям (прогнозу погоды)
     """
-    result = dict()
-    result_id = 1
-    for index, row in weather_conditions_csv_data.iterrows():
-        item = dict()
-        item["datetime"] = row[3]
-        item["kp"] = row[10]
-        result[result_id] = item
-        result_id += 1
-
-    return result
+    return get_csv_records(weather_conditions_csv_data, {
+        "datetime": 3,
+        "kp": 10,
+    })
 
 
 def get_snowiness_dict(snowiness_csv_data):
@@ -470,30 +654,18 @@ def get_snowiness_dict(snowiness_csv_data):
     :param snowiness_csv_data: данные csv-файла электронной таблицы по снегу
     :return: словарь с информацией по снегу
     """
-    result = dict()
-    result_id = 1
-    for index, row in snowiness_csv_data.iterrows():
-        item = dict()
-        item["station_id"] = row[0]
-        item["start"] = row[2]
-        item["end"] = row[3]
-        item["percent"] = row[17]
-        result[result_id] = item
-        result_id += 1
-
-    return result
+    return get_csv_records(snowiness_csv_data, {
+        "station_id": 0,
+        "start": 2,
+        "end": 3,
+        "percent": 17,
+    })
 
 
 def get_loc_dict(loc_csv_data):
-    result = dict()
-    result_id = 1
-    for index, row in loc_csv_data.iterrows():
-        item = dict()
-        item["name_locality"] = row["name"]
-        item["municipalities_locality"] = row["ado"]
-        item["distance_to_locality"] = row["distance"]
-        item["name_MO_locality"] = row["name_MO"]
-        result[result_id] = item
-        result_id += 1
-
-    return result
+    return get_csv_records(loc_csv_data, {
+        "name_locality": "name",
+        "municipalities_locality": "ado",
+        "distance_to_locality": "distance",
+        "name_MO_locality": "name_MO",
+    })
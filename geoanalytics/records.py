@@ -0,0 +1,450 @@
+import numpy as np
+import pandas as pd
+from collections.abc import MutableMapping
+
+
+# Признак отсутствия поля у записи (поле добавлено в таблицу после создания записи)
+MISSING = object()
+# Строковый столбец хранится в виде кодов категорий, если различных значений не больше этой доли от числа записей
+CATEGORY_RATIO = 0.5
+# Типы Python для значений числовых столбцов (по виду типа массива)
+PYTHON_SCALAR_TYPES = {"b": bool, "i": int, "u": int, "f": float}
+# Наименьшая длина столбца при добавлении записей (далее длина столбца удваивается)
+MIN_COLUMN_CAPACITY = 16
+
+
+def get_column_dtype(csv_data):
+    """
+    Определение общего типа значений набора данных (как при построчном обходе набора данных).
+    :param csv_data: набор данных
+    :return: тип значений (object, если в наборе данных есть нечисловые столбцы)
+    """
+    dtypes = list(csv_data.dtypes)
+    if dtypes and all(isinstance(dtype, np.dtype) and dtype.kind in "iuf" for dtype in dtypes):
+        return np.result_type(*dtypes)
+
+    return np.dtype(object)
+
+
+def get_csv_columns(csv_data, fields):
+    """
+    Получение столбцов набора данных в виде массивов.
+    Для набора данных с нечисловыми столбцами сохраняются типы столбцов, для полностью числового набора данных
+    столбцы приводятся к общему типу (как при построчном обходе набора данных).
+    :param csv_data: набор данных
+    :param fields: словарь соответствия названий полей записей и столбцов набора данных
+    (название столбца, его порядковый номер или None, если столбца нет и значение поля пустое)
+    :return: словарь массивов значений по названиям полей
+    """
+    dtype = get_column_dtype(csv_data)
+    if dtype == object:
+        dtype = None
+    columns = dict()
+    for field, column in fields.items():
+        if column is None:
+            columns[field] = np.full(len(csv_data), "", dtype=object)
+        elif isinstance(column, str):
+            columns[field] = csv_data[column].to_numpy(dtype=dtype)
+        else:
+            columns[field] = csv_data.iloc[:, column].to_numpy(dtype=dtype)
+
+    return columns
+
+
+class CategoricalColumn:
+    """
+    Строковый столбец с повторяющимися значениями: коды значений и список различных значений (категорий).
+    Пропущенные значения (NaN) имеют код -1.
+    """
+
+    __slots__ = ("codes", "categories", "_codes_by_category")
+
+    def __init__(self, codes, categories):
+        """
+        :param codes: массив кодов значений
+        :param categories: список категорий
+        """
+        self.codes = codes
+        self.categories = list(categories)
+        self._codes_by_category = {category: code for code, category in enumerate(self.categories)}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def get(self, position):
+        """
+        Чтение значения из столбца.
+        :param position: порядковый номер записи
+        :return: значение (NaN для пропущенного значения)
+        """
+        code = self.codes[position]
+
+        return np.nan if code < 0 else self.categories[code]
+
+    def set(self, position, value):
+        """
+        Запись значения в столбец.
+        :param position: порядковый номер записи
+        :param value: значение
+        :return: True, если значение записано (False, если значение не является строкой)
+        """
+        if type(value) is not str:
+            return False
+        code = self._codes_by_category.get(value)
+        if code is None:
+            if len(self.categories) >= np.iinfo(self.codes.dtype).max:
+                self.codes = self.codes.astype(np.int32)
+            code = len(self.categories)
+            self.categories.append(value)
+            self._codes_by_category[value] = code
+        self.codes[position] = code
+
+        return True
+
+    def get_categories(self):
+        """
+        Получение массива категорий, индексируемого кодами значений (код -1 соответствует последнему элементу NaN).
+        :return: массив категорий с NaN в конце
+        """
+        categories = np.empty(len(self.categories) + 1, dtype=object)
+        categories[:-1] = self.categories
+        categories[-1] = np.nan
+
+        return categories
+
+    def take(self, positions):
+        """
+        Получение значений столбца для набора записей.
+        :param positions: массив порядковых номеров записей
+        :return: массив значений
+        """
+        return self.get_categories()[self.codes[positions]]
+
+
+def compact_column(values):
+    """
+    Выбор компактного представления столбца: числовые столбцы хранятся типизированными массивами,
+    строковые столбцы с повторяющимися значениями — кодами категорий.
+    :param values: массив значений столбца
+    :return: массив значений или CategoricalColumn
+    """
+    if values.dtype != object or len(values) == 0:
+        return values
+    # Пропуски должны быть значениями NaN (а не None), иначе при чтении записи пропуск изменится
+    if any(type(value) is not float for value in values[pd.isna(values)].tolist()):
+        return values
+    if pd.api.types.infer_dtype(values, skipna=True) != "string":
+        return values
+    codes, categories = pd.factorize(values)
+    if len(categories) > len(values) * CATEGORY_RATIO:
+        return values
+    code_dtype = np.int16 if len(categories) < np.iinfo(np.int16).max else np.int32
+
+    return CategoricalColumn(codes.astype(code_dtype), categories)
+
+
+class RecordTable:
+    """
+    Таблица записей, хранящая каждое поле отдельным столбцом (типизированным массивом, кодами категорий
+    или массивом объектов). Столбец приводится к массиву объектов только при записи значения другого типа.
+    При добавлении записей столбцы удлиняются с запасом (длина удваивается), поэтому столбец может быть
+    длиннее таблицы; строки после последней записи не используются.
+    """
+
+    def __init__(self, columns, python_scalars=True):
+        """
+        :param columns: словарь массивов значений по названиям полей (в порядке записей)
+        :param python_scalars: приводить значения числовых столбцов к типам Python при чтении
+        """
+        self.python_scalars = python_scalars
+        self.size = len(next(iter(columns.values()))) if columns else 0
+        self.columns = {field: compact_column(np.asarray(values)) for field, values in columns.items()}
+
+    def __len__(self):
+        return self.size
+
+    def get(self, position, field):
+        """
+        Чтение значения поля записи.
+        :param position: порядковый номер записи
+        :param field: название поля
+        :return: значение поля (MISSING, если поля у записи нет)
+        """
+        column = self.columns.get(field)
+        if column is None:
+            return MISSING
+        if isinstance(column, CategoricalColumn):
+            return column.get(position)
+        value = column[position]
+        if self.python_scalars and column.dtype != object:
+            return value.item()
+
+        return value
+
+    def _to_objects(self, field):
+        """
+        Приведение столбца к массиву объектов.
+        :param field: название поля
+        :return: массив объектов
+        """
+        column = self.columns[field]
+        if isinstance(column, CategoricalColumn):
+            column = column.take(np.arange(len(column)))
+        elif column.dtype != object:
+            values = np.empty(len(column), dtype=object)
+            values[:] = column.tolist() if self.python_scalars else list(column)
+            column = values
+        self.columns[field] = column
+
+        return column
+
+    def _reserve(self, field, size):
+        """
+        Удлинение столбца (с запасом) для хранения заданного количества записей без изменения типа столбца.
+        :param field: название поля
+        :param size: количество записей
+        """
+        column = self.columns[field]
+        length = len(column)
+        if length >= size:
+            return
+        capacity = max(size, 2 * length, MIN_COLUMN_CAPACITY)
+        if isinstance(column, CategoricalColumn):
+            codes = np.full(capacity, -1, dtype=column.codes.dtype)
+            codes[:length] = column.codes
+            column.codes = codes
+        else:
+            values = np.empty(capacity, dtype=column.dtype)
+            values[:length] = column
+            self.columns[field] = values
+
+    def set(self, position, field, value):
+        """
+        Запись значения поля записи.
+        :param position: порядковый номер записи
+        :param field: название поля
+        :param value: значение поля (MISSING для удаления поля у записи)
+        """
+        column = self.columns.get(field)
+        if column is None:
+            if value is MISSING:
+                return
+            column = np.full(self.size, MISSING, dtype=object)
+            self.columns[field] = column
+        elif isinstance(column, CategoricalColumn):
+            if column.set(position, value):
+                return
+            column = self._to_objects(field)
+        elif column.dtype != object:
+            # Значение записывается в типизированный массив, только если при чтении вернется значение того же типа
+            scalar_type = PYTHON_SCALAR_TYPES[column.dtype.kind] if self.python_scalars else column.dtype.type
+            if type(value) is scalar_type:
+                try:
+                    column[position] = value
+                    return
+                except OverflowError:
+                    pass
+            column = self._to_objects(field)
+        column[position] = value
+
+    def append(self, item):
+        """
+        Добавление записи в таблицу.
+        Столбцы полей, которых нет у записи, приводятся к массивам объектов (для отметки отсутствия поля).
+        :param item: словарь (отображение) значений полей записи
+        :return: порядковый номер записи
+        """
+        position = self.size
+        self.size += 1
+        for field in list(self.columns):
+            self._reserve(field, self.size)
+            if field not in item:
+                self.set(position, field, MISSING)
+        for field, value in item.items():
+            self.set(position, field, value)
+
+        return position
+
+    def get_values(self, field, positions):
+        """
+        Получение значений поля для набора записей.
+        :param field: название поля
+        :param positions: массив порядковых номеров записей
+        :return: массив значений (MISSING для записей без поля)
+        """
+        column = self.columns.get(field)
+        if column is None:
+            return np.full(len(positions), MISSING, dtype=object)
+        if isinstance(column, CategoricalColumn):
+            return column.take(positions)
+        values = np.empty(len(positions), dtype=object)
+        if self.python_scalars and column.dtype != object:
+            values[:] = column[positions].tolist()
+        else:
+            values[:] = column[positions]
+
+        return values
+
+
+class RecordView(MutableMapping):
+    """
+    Запись таблицы с интерфейсом словаря: значения читаются из столбцов таблицы и записываются в них.
+    """
+
+    __slots__ = ("_table", "_position")
+
+    def __init__(self, table, position):
+        """
+        :param table: таблица записей
+        :param position: порядковый номер записи в таблице
+        """
+        self._table = table
+        self._position = position
+
+    def __getitem__(self, field):
+        value = self._table.get(self._position, field)
+        if value is MISSING:
+            raise KeyError(field)
+
+        return value
+
+    def __setitem__(self, field, value):
+        self._table.set(self._position, field, value)
+
+    def __delitem__(self, field):
+        if self._table.get(self._position, field) is MISSING:
+            raise KeyError(field)
+        self._table.set(self._position, field, MISSING)
+
+    def __iter__(self):
+        return iter([field for field in list(self._table.columns)
+                     if self._table.get(self._position, field) is not MISSING])
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class RecordDict(MutableMapping):
+    """
+    Словарь записей, данные которого хранятся по столбцам в таблице записей (RecordTable).
+    Значениями словаря являются представления записей (RecordView), поэтому записи не копируются в словари.
+    К словарю, как и к GeometryDict, привязываются слои с декодированными геометриями.
+    """
+
+    def __init__(self, keys, columns, python_scalars=True):
+        """
+        :param keys: ключи записей (при повторе ключа сохраняется последняя запись, как при заполнении словаря)
+        :param columns: словарь массивов значений по названиям полей (в порядке записей)
+        :param python_scalars: приводить значения числовых столбцов к типам Python при чтении
+        """
+        self.table = RecordTable(columns, python_scalars)
+        # Порядковые номера записей в таблице по ключам
+        self._positions = {key: position for position, key in enumerate(keys)}
+        self.layers = dict()
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __iter__(self):
+        return iter(self._positions)
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def __getitem__(self, key):
+        return RecordView(self.table, self._positions[key])
+
+    def __setitem__(self, key, item):
+        if isinstance(item, RecordView) and item._table is self.table:
+            self._positions[key] = item._position
+        else:
+            self._positions[key] = self.table.append(item)
+
+    def __delitem__(self, key):
+        del self._positions[key]
+
+    def __repr__(self):
+        return repr({key: dict(item) for key, item in self.items()})
+
+    def get_positions(self):
+        """
+        Получение порядковых номеров записей в таблице.
+        :return: массив порядковых номеров записей в порядке ключей
+        """
+        return np.fromiter(self._positions.values(), dtype=np.int64, count=len(self._positions))
+
+    def get_column(self, field):
+        """
+        Получение значений поля всех записей без создания словарей записей.
+        :param field: название поля
+        :return: массив значений поля в порядке ключей
+        """
+        values = self.table.get_values(field, self.get_positions())
+        if any(value is MISSING for value in values.tolist()):
+            raise KeyError(field)
+
+        return values
+
+    def set_column(self, field, values):
+        """
+        Замена значений поля всех записей.
+        :param field: название поля
+        :param values: значения поля в порядке ключей
+        """
+        column = np.full(self.table.size, MISSING, dtype=object)
+        column[self.get_positions()] = np.asarray(values, dtype=object)
+        self.table.columns[field] = compact_column(column)
+
+    def to_frame(self):
+        """
+        Преобразование словаря записей в набор данных (строки — записи, столбцы — поля).
+        :return: набор данных с ключами записей в качестве индекса
+        """
+        positions = self.get_positions()
+        columns = dict()
+        for field in self.table.columns:
+            values = self.table.get_values(field, positions)
+            missing = np.array([value is MISSING for value in values.tolist()], dtype=bool)
+            if not missing.all():
+                values[missing] = np.nan
+                columns[field] = values
+
+        return pd.DataFrame(columns, index=list(self._positions))
+
+
+def get_field_values(records, field):
+    """
+    Получение значений поля всех записей словаря (для RecordDict — из столбца таблицы без создания записей).
+    :param records: словарь записей (RecordDict или словарь словарей)
+    :param field: название поля
+    :return: массив значений поля в порядке ключей
+    """
+    if isinstance(records, RecordDict):
+        return records.get_column(field)
+    values = np.empty(len(records), dtype=object)
+    values[:] = [item[field] for item in records.values()]
+
+    return values
+
+
+def get_csv_records(csv_data, fields, key=None, start_key=1):
+    """
+    Построение словаря записей по столбцам набора данных (без построчного обхода).
+    :param csv_data: набор данных
+    :param fields: словарь соответствия названий полей записей и столбцов набора данных (см. get_csv_columns)
+    :param key: название столбца с ключами записей (по умолчанию записи нумеруются по порядку)
+    :param start_key: номер первой записи (если ключи не заданы столбцом)
+    :return: словарь записей
+    """
+    python_scalars = get_column_dtype(csv_data) == object
+    if key is None:
+        keys = range(start_key, start_key + len(csv_data))
+    else:
+        keys = get_csv_columns(csv_data, {key: key})[key]
+        if python_scalars:
+            keys = keys.tolist()
+
+    return RecordDict(keys, get_csv_columns(csv_data, fields), python_scalars)
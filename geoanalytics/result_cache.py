@@ -0,0 +1,106 @@
+import os
+import hashlib
+from pathlib import Path
+
+import pandas as pd
+
+import geoanalytics.preprocess as gp
+
+
+# Каталог с кэшем результатов этапов обработки
+RESULT_CACHE_DIR_NAME = "result_cache"
+# Версия алгоритмов этапов обработки (увеличивается при изменении этапов, чтобы не использовать старый кэш)
+RESULT_CACHE_VERSION = 2
+
+
+def get_file_version(file_path):
+    """
+    Получение версии файла по его размеру и времени изменения.
+    :param file_path: путь к файлу
+    :return: строка с версией файла (None, если файла не существует)
+    """
+    if not Path(file_path).exists():
+        return None
+    file_stat = os.stat(file_path)
+
+    return str(file_stat.st_size) + ":" + str(file_stat.st_mtime_ns)
+
+
+def get_layer_version(csv_file_name):
+    """
+    Получение версии справочного слоя по его csv-файлу.
+    :param csv_file_name: название csv-файла слоя
+    :return: строка с версией слоя
+    """
+    return get_file_version(Path(Path.cwd().parent, gp.DATA_DIR_NAME, csv_file_name))
+
+
+def get_directory_version(subdir):
+    """
+    Получение версии каталога с csv-файлами метеостанций (по названиям, размерам и времени изменения файлов).
+    :param subdir: название каталога с csv-файлами (gp.WEATHER_DIR_NAME или gp.WEATHER_CONDITIONS_DIR_NAME)
+    :return: строка с версией каталога
+    """
+    directory = Path(Path.cwd().parent, gp.DATA_DIR_NAME, subdir)
+    if not directory.exists():
+        return None
+    file_hash = hashlib.sha1()
+    for file_name in sorted(os.listdir(directory)):
+        if file_name.endswith(".csv"):
+            file_hash.update((file_name + "=" + str(get_file_version(Path(directory, file_name))) + ";")
+                             .encode("utf-8"))
+
+    return file_hash.hexdigest()
+
+
+def get_stage_version(stage_name, layer_versions, directory_versions=None):
+    """
+    Получение версии результатов этапа обработки по версиям справочных слоев и каталогов метеостанций.
+    :param stage_name: название этапа обработки
+    :param layer_versions: словарь версий справочных слоев (название слоя: версия)
+    :param directory_versions: словарь версий каталогов с csv-файлами метеостанций (название каталога: версия)
+    :return: строка с версией результатов этапа
+    """
+    directory_versions = dict() if directory_versions is None else directory_versions
+    version = [RESULT_CACHE_VERSION, stage_name, sorted(layer_versions.items()), sorted(directory_versions.items())]
+
+    return hashlib.sha1(repr(version).encode("utf-8")).hexdigest()
+
+
+def get_input_hash(item, fields):
+    """
+    Получение хэша входных данных пожара, от которых зависят результаты этапа обработки.
+    :param item: запись о пожаре
+    :param fields: названия полей с входными данными (например, "poly", "dt", "weather_station_id")
+    :return: строка с хэшем входных данных
+    """
+    values = []
+    for field in fields:
+        value = item.get(field)
+        if value is None or pd.isna(value) is True:
+            values.append("")
+        elif isinstance(value, float) and value.is_integer():
+            # Номера (например, метеостанций), прочитанные как числа с плавающей запятой
+            values.append(str(int(value)))
+        else:
+            values.append(str(value))
+
+    return hashlib.sha1("\x1f".join(values).encode("utf-8")).hexdigest()
+
+
+def get_cache_file(stage_name, stage_version):
+    """
+    Получение пути к файлу кэша результатов этапа обработки.
+    Кэш прежних версий этапа удаляется.
+    :param stage_name: название этапа обработки
+    :param stage_version: версия результатов этапа
+    :return: путь к файлу кэша
+    """
+    cache_directory = Path(Path.cwd().parent, gp.DATA_DIR_NAME, RESULT_CACHE_DIR_NAME).resolve()
+    cache_file = Path(cache_directory, stage_name + "_" + stage_version[:16] + ".pkl")
+    if cache_directory.exists():
+        for file in cache_directory.glob(stage_name + "_*.pkl"):
+            if file != cache_file:
+                file.unlink()
+
+    return cache_file
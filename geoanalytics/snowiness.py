@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+
+from geoanalytics.records import get_field_values
+from geoanalytics.station_registry import get_station_id
+
+
+def get_snowiness_categories(percent_values, norm_range=True):
+    """
+    Определение снежности зимы в зависимости от процентов отклонения суммы осадков от нормы.
+    :param percent_values: значения процентов
+    :param norm_range: считать нормой значения от 90 до 100 процентов (как для пожаров)
+    :return: массив категорий снежности ("", если процент не задан)
+    """
+    percent_values = pd.to_numeric(pd.Series(list(percent_values), dtype=object), errors="coerce") \
+        .to_numpy(dtype=np.float64)
+    conditions = [(90 <= percent_values) & (percent_values <= 100)] if norm_range else []
+    conditions += [percent_values < -25, (-25 <= percent_values) & (percent_values <= 25), percent_values > 25]
+    categories = ["норма"] if norm_range else []
+    categories += ["малоснежная", "норма", "многоснежная"]
+
+    return np.select(conditions, categories, "").astype(object)
+
+
+class SnowinessIndex:
+    """
+    Указатель данных по снегу по номеру метеостанции и году окончания зимы.
+    Номера метеостанций и годы разбираются, а категории снежности вычисляются один раз при построении.
+    """
+
+    def __init__(self, snowiness_dict):
+        """
+        :param snowiness_dict: словарь с данными по снегу
+        """
+        percent_values = get_field_values(snowiness_dict, "percent")
+        self.table = pd.DataFrame({
+            "station_id": pd.array([get_station_id(value) for value in get_field_values(snowiness_dict, "station_id")],
+                                   dtype="Int64"),
+            "year": pd.to_datetime(pd.Series(get_field_values(snowiness_dict, "end"), dtype=object),
+                                   format="%Y-%m-%d").dt.year.astype("Int64"),
+            "snowiness": get_snowiness_categories(percent_values),
+            "district_snowiness": get_snowiness_categories(percent_values, norm_range=False)})
+        # Для пожаров берется последняя запись по метеостанции и году
+        self.fire_table = self.table.drop_duplicates(["station_id", "year"], keep="last")[
+            ["station_id", "year", "snowiness"]]
+        # Для лесных кварталов берется первая запись с заданной снежностью (иначе снежность пустая)
+        district_table = self.table.assign(defined=self.table["district_snowiness"] != "") \
+            .sort_values("defined", ascending=False, kind="stable") \
+            .drop_duplicates(["station_id", "year"], keep="first")
+        self._district_snowiness = dict(zip(zip(district_table["station_id"], district_table["year"]),
+                                            zip(district_table["district_snowiness"], district_table["defined"])))
+
+    def get_fire_snowiness(self, station_ids, years):
+        """
+        Определение снежности зим для пожаров (слиянием с указателем).
+        :param station_ids: номера метеостанций пожаров
+        :param years: годы пожаров
+        :return: массив снежности зим (NaN, если данных по метеостанции за год нет)
+        """
+        fires = pd.DataFrame({"station_id": pd.array([get_station_id(value) for value in station_ids], dtype="Int64"),
+                              "year": pd.array(list(years), dtype="Int64")})
+
+        return fires.merge(self.fire_table, how="left", on=["station_id", "year"])["snowiness"].to_numpy(dtype=object)
+
+    def get_district_snowiness(self, station_ids, year):
+        """
+        Определение снежности зимы для лесного квартала по первой метеостанции списка с заданной снежностью.
+        :param station_ids: номера метеостанций в порядке удаленности
+        :param year: год окончания зимы
+        :return: снежность зимы ("", если данные есть, но снежность не задана; None, если данных нет)
+        """
+        snowiness = None
+        for station_id in station_ids:
+            station_snowiness, defined = self._district_snowiness.get((station_id, year), (None, False))
+            if defined:
+                return station_snowiness
+            if station_snowiness is not None:
+                snowiness = station_snowiness
+
+        return snowiness
@@ -0,0 +1,415 @@
+import weakref
+import numpy as np
+import pandas as pd
+import shapely
+from haversine import haversine_vector
+
+from geoanalytics.geo_layer import get_geometry_layer
+
+
+# Вычисленные пространственные соединения слоев (по левому слою)
+_spatial_joins = weakref.WeakKeyDictionary()
+# Построенные STR-деревья по слоям (по слою)
+_layer_trees = weakref.WeakKeyDictionary()
+# Количество точек, для которых расстояния до метеостанций вычисляются за один шаг
+WEATHER_STATION_QUERY_SIZE = 10000
+
+
+class NearestFeatureIndex:
+    """
+    Пространственный индекс (STR-дерево) по слою географических объектов для поиска ближайшего объекта.
+    Геометрии берутся из слоя GeometryLayer в метрической системе координат, который перепроецируется
+    один раз (или читается из сохраненного ранее файла), а не при каждом сравнении с пожаром.
+    """
+
+    def __init__(self, geom_dict, geom_field="geom"):
+        """
+        Построение индекса по слою географических объектов.
+        :param geom_dict: словарь с географическими объектами в WKB
+        :param geom_field: название поля с геометрией в WKB
+        """
+        # Получение геометрий объектов слоя в метрах
+        geometries = get_geometry_layer(geom_dict, geom_field).projected().geometries()
+        self.geometries = geometries[~shapely.is_missing(geometries)]
+        self.tree = shapely.STRtree(self.geometries)
+
+    def __len__(self):
+        return len(self.geometries)
+
+    def get_min_distance(self, polygon_in_meters):
+        """
+        Получение минимального расстояния от полигона до объектов слоя.
+        Кандидаты отбираются по STR-дереву, точное расстояние вычисляется только для ближайших из них.
+        :param polygon_in_meters: полигон в метрах (см. reproject)
+        :return: минимальное расстояния от полигона до географического объекта
+        """
+        min_distance = 99999
+        if len(self.geometries) != 0:
+            indices, distances = self.tree.query_nearest(polygon_in_meters, return_distance=True,
+                                                         all_matches=False)
+            if len(distances) != 0:
+                min_distance = distances[0] / 1e6
+
+        return "{:.3f}".format(min_distance)
+
+
+class SpatialJoin:
+    """
+    Результат пространственного соединения двух слоев: пары порядковых номеров объектов (левый, правый),
+    удовлетворяющих предикату, упорядоченные по левому, а затем по правому объекту.
+    """
+
+    def __init__(self, left_layer, right_layer, left_positions, right_positions):
+        """
+        :param left_layer: левый слой геометрий (например, пожары)
+        :param right_layer: правый слой геометрий (например, лесные кварталы)
+        :param left_positions: массив порядковых номеров объектов левого слоя
+        :param right_positions: массив порядковых номеров объектов правого слоя
+        """
+        order = np.lexsort((right_positions, left_positions))
+        self.left_layer = left_layer
+        self.right_layer = right_layer
+        self.left_positions = left_positions[order]
+        self.right_positions = right_positions[order]
+        # Границы пар для каждого объекта левого слоя
+        counts = np.bincount(self.left_positions, minlength=len(left_layer))
+        self._offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def __len__(self):
+        return len(self.left_positions)
+
+    def get_right_positions(self, left_key):
+        """
+        Получение порядковых номеров объектов правого слоя, соединенных с объектом левого слоя.
+        :param left_key: ключ объекта левого слоя
+        :return: массив порядковых номеров объектов правого слоя
+        """
+        position = self.left_layer.position(left_key)
+
+        return self.right_positions[self._offsets[position]:self._offsets[position + 1]]
+
+    def get_right_keys(self, left_key):
+        """
+        Получение ключей объектов правого слоя, соединенных с объектом левого слоя.
+        :param left_key: ключ объекта левого слоя
+        :return: список ключей объектов правого слоя (в порядке правого слоя)
+        """
+        return [self.right_layer.keys[position] for position in self.get_right_positions(left_key)]
+
+    def has_matches(self, left_key):
+        """
+        Проверка наличия соединенных объектов правого слоя у объекта левого слоя.
+        :param left_key: ключ объекта левого слоя
+        :return: True, если есть хотя бы один соединенный объект
+        """
+        position = self.left_layer.position(left_key)
+
+        return self._offsets[position + 1] > self._offsets[position]
+
+
+def spatial_join(left_layer, right_layer, predicate="intersects"):
+    """
+    Пространственное соединение двух слоев: отбор кандидатов по STR-дереву правого слоя
+    и проверка предиката над массивами геометрий (без попарных вызовов из Python).
+    :param left_layer: левый слой геометрий (например, пожары)
+    :param right_layer: правый слой геометрий (например, лесные кварталы)
+    :param predicate: пространственный предикат (например, "intersects")
+    :return: пары соединенных объектов
+    """
+    tree = get_layer_tree(right_layer)
+    left_positions, right_positions = tree.query(left_layer.geometries(), predicate=predicate)
+
+    return SpatialJoin(left_layer, right_layer, left_positions, right_positions)
+
+
+def get_layer_tree(layer):
+    """
+    Получение STR-дерева по слою геометрий (строится один раз для слоя, например, для справочного слоя,
+    который соединяется с несколькими частями файла с пожарами).
+    :param layer: слой геометрий
+    :return: STR-дерево по геометриям слоя (в порядке ключей слоя)
+    """
+    if layer not in _layer_trees:
+        _layer_trees[layer] = shapely.STRtree(layer.geometries())
+
+    return _layer_trees[layer]
+
+
+def get_spatial_join(left_layer, right_layer, predicate="intersects"):
+    """
+    Получение пространственного соединения двух слоев (вычисляется один раз для пары слоев).
+    :param left_layer: левый слой геометрий (например, пожары)
+    :param right_layer: правый слой геометрий (например, лесные кварталы)
+    :param predicate: пространственный предикат (например, "intersects")
+    :return: пары соединенных объектов
+    """
+    joins = _spatial_joins.setdefault(left_layer, dict())
+    key = (right_layer.id, predicate)
+    if key not in joins:
+        joins[key] = spatial_join(left_layer, right_layer, predicate)
+
+    return joins[key]
+
+
+class UnionFind:
+    """
+    Система непересекающихся множеств (union-find) со сжатием путей и объединением по рангу.
+    """
+
+    def __init__(self, size):
+        """
+        :param size: количество элементов
+        """
+        self.parent = list(range(size))
+        self.rank = [0] * size
+
+    def find(self, element):
+        """
+        Определение представителя множества, содержащего элемент.
+        :param element: номер элемента
+        :return: номер элемента-представителя множества
+        """
+        parent = self.parent
+        while parent[element] != element:
+            parent[element] = parent[parent[element]]
+            element = parent[element]
+
+        return element
+
+    def union(self, first, second):
+        """
+        Объединение множеств, содержащих два элемента.
+        :param first: номер первого элемента
+        :param second: номер второго элемента
+        """
+        first_root = self.find(first)
+        second_root = self.find(second)
+        if first_root == second_root:
+            return
+        if self.rank[first_root] < self.rank[second_root]:
+            first_root, second_root = second_root, first_root
+        self.parent[second_root] = first_root
+        if self.rank[first_root] == self.rank[second_root]:
+            self.rank[first_root] += 1
+
+    def get_components(self):
+        """
+        Получение представителей множеств для всех элементов.
+        :return: массив номеров элементов-представителей
+        """
+        return np.array([self.find(element) for element in range(len(self.parent))], dtype=np.int64)
+
+
+def get_intersection_components(layer, keys=None):
+    """
+    Определение связных компонент графа пересечений геометрий слоя: объекты, пересекающиеся
+    непосредственно или через цепочку других объектов, попадают в одну компоненту.
+    Ребра графа находятся по STR-дереву за один запрос, компоненты — с помощью union-find.
+    :param layer: слой геометрий
+    :param keys: ключи учитываемых объектов слоя (по умолчанию все объекты)
+    :return: массив номеров компонент для объектов в порядке ключей
+    """
+    keys = layer.keys if keys is None else list(keys)
+    geometries = layer.geometries(keys)
+    first_positions, second_positions = shapely.STRtree(geometries).query(geometries, predicate="intersects")
+    components = UnionFind(len(keys))
+    for first, second in zip(first_positions.tolist(), second_positions.tolist()):
+        if first < second:
+            components.union(first, second)
+
+    return components.get_components()
+
+
+def get_days(dates, date_format="%d.%m.%Y"):
+    """
+    Разбор дат (с временем или без) в номера дней.
+    :param dates: даты в виде строк (например, "10.08.2020 12:00")
+    :param date_format: формат даты (без времени)
+    :return: массив номеров дней (от 01.01.1970)
+    """
+    dates = pd.Series(list(dates), dtype=object).str.split(" ").str[0]
+
+    return pd.to_datetime(dates, format=date_format).to_numpy(dtype="datetime64[D]").astype(np.int64)
+
+
+def get_day(date):
+    """
+    Получение номера дня для даты.
+    :param date: дата (datetime или date)
+    :return: номер дня (от 01.01.1970)
+    """
+    return int(np.datetime64(date, "D").astype(np.int64))
+
+
+class SpatioTemporalIndex:
+    """
+    Пространственно-временной индекс по слою географических объектов с датами (например, пожаров).
+    Даты разбираются один раз и упорядочиваются в шкалу времени, для каждого дня шкалы строится
+    (по мере обращения) свое STR-дерево, поэтому поиск объектов, пересекающихся с заданным в пределах
+    нескольких дней до или после, затрагивает только объекты этих дней.
+    """
+
+    def __init__(self, layer, dates, keys=None, date_format="%d.%m.%Y"):
+        """
+        Построение индекса по слою географических объектов.
+        :param layer: слой геометрий
+        :param dates: даты объектов в порядке ключей
+        :param keys: ключи учитываемых объектов слоя (по умолчанию все объекты слоя)
+        :param date_format: формат даты (без времени)
+        """
+        self.layer = layer
+        self.keys = layer.keys if keys is None else list(keys)
+        self.geometries = layer.geometries(keys)
+        self.days = get_days(dates, date_format)
+        # Шкала времени: порядковые номера объектов, упорядоченные по дням (внутри дня — по порядку ключей)
+        self.order = np.argsort(self.days, kind="stable")
+        self.timeline = self.days[self.order]
+        self.bucket_days, bucket_starts = np.unique(self.timeline, return_index=True)
+        self._bucket_offsets = np.append(bucket_starts, len(self.timeline))
+        self._trees = dict()
+        # Таблицы минимумов и максимумов дней на отрезках длиной 2^k (для поиска выхода за интервал дней)
+        self._min_days = [self.days]
+        self._max_days = [self.days]
+        length = 1
+        while 2 * length <= len(self.days):
+            self._min_days.append(np.minimum(self._min_days[-1][:-length], self._min_days[-1][length:]))
+            self._max_days.append(np.maximum(self._max_days[-1][:-length], self._max_days[-1][length:]))
+            length *= 2
+
+    def __len__(self):
+        return len(self.days)
+
+    def get_positions(self, start_day, end_day):
+        """
+        Получение объектов, даты которых входят в интервал дней.
+        :param start_day: номер первого дня интервала
+        :param end_day: номер последнего дня интервала
+        :return: массив порядковых номеров объектов (в порядке шкалы времени)
+        """
+        start = np.searchsorted(self.timeline, start_day, side="left")
+        end = np.searchsorted(self.timeline, end_day, side="right")
+
+        return self.order[start:end]
+
+    def _get_tree(self, bucket):
+        """
+        Получение STR-дерева по объектам одного дня шкалы времени (строится один раз).
+        :param bucket: номер дня в шкале времени
+        :return: STR-дерево и порядковые номера объектов дня
+        """
+        if bucket not in self._trees:
+            positions = self.order[self._bucket_offsets[bucket]:self._bucket_offsets[bucket + 1]]
+            self._trees[bucket] = (shapely.STRtree(self.geometries[positions]), positions)
+
+        return self._trees[bucket]
+
+    def query(self, geometries, start_day, end_day=None, predicate="intersects"):
+        """
+        Поиск объектов, даты которых входят в интервал дней, а геометрии удовлетворяют предикату.
+        :param geometries: массив геометрий для поиска
+        :param start_day: номер первого дня интервала
+        :param end_day: номер последнего дня интервала (по умолчанию до конца шкалы времени)
+        :param predicate: пространственный предикат (например, "intersects")
+        :return: массивы номеров геометрий для поиска и порядковых номеров найденных объектов
+        """
+        geometries = np.asarray(geometries, dtype=object)
+        start = np.searchsorted(self.bucket_days, start_day, side="left")
+        end = len(self.bucket_days) if end_day is None else np.searchsorted(self.bucket_days, end_day, side="right")
+        input_indices = [np.empty(0, dtype=np.int64)]
+        positions = [np.empty(0, dtype=np.int64)]
+        for bucket in range(start, end):
+            tree, bucket_positions = self._get_tree(bucket)
+            bucket_input_indices, tree_indices = tree.query(geometries, predicate=predicate)
+            input_indices.append(bucket_input_indices)
+            positions.append(bucket_positions[tree_indices])
+
+        return np.concatenate(input_indices), np.concatenate(positions)
+
+    def next_position_outside(self, position, start_day, end_day):
+        """
+        Поиск первого объекта после заданного (по порядку ключей), дата которого не входит в интервал дней.
+        :param position: порядковый номер объекта, после которого выполняется поиск
+        :param start_day: номер первого дня интервала
+        :param end_day: номер последнего дня интервала
+        :return: порядковый номер найденного объекта (количество объектов, если такого объекта нет)
+        """
+        position += 1
+        for level in range(len(self._min_days) - 1, -1, -1):
+            if position < len(self._min_days[level]) and self._min_days[level][position] >= start_day and \
+                    self._max_days[level][position] <= end_day:
+                position += 2 ** level
+
+        return position
+
+    def next_position_on_day(self, position, day):
+        """
+        Поиск первого объекта после заданного (по порядку ключей) с заданной датой.
+        :param position: порядковый номер объекта, после которого выполняется поиск
+        :param day: номер дня
+        :return: порядковый номер найденного объекта (количество объектов, если такого объекта нет)
+        """
+        positions = self.get_positions(day, day)
+        index = np.searchsorted(positions, position, side="right")
+
+        return int(positions[index]) if index < len(positions) else len(self.days)
+
+
+class WeatherStationIndex:
+    """
+    Индекс метеостанций для поиска ближайших метеостанций по геодезическому расстоянию (формула гаверсинуса).
+    Координаты метеостанций разбираются один раз, поиск k ближайших метеостанций выполняется сразу
+    для всех точек (пожаров, лесных кварталов) над массивами расстояний.
+    """
+
+    def __init__(self, weather_stations_dict, weather_station_ids=None):
+        """
+        Построение индекса по метеостанциям.
+        :param weather_stations_dict: словарь с данными по метеостанциям
+        :param weather_station_ids: идентификаторы учитываемых метеостанций (по умолчанию все метеостанции),
+        например, метеостанций, по которым есть данные о погоде
+        """
+        self.ids = []
+        self.names = []
+        coordinates = []
+        for weather_station_item in weather_stations_dict.values():
+            weather_station_id = int(weather_station_item["weather_station_id"])
+            if weather_station_ids is None or weather_station_id in weather_station_ids:
+                self.ids.append(weather_station_id)
+                self.names.append(weather_station_item["weather_station_name"])
+                coordinates.append((float(weather_station_item["latitude"]),
+                                    float(weather_station_item["longitude"])))
+        self.coordinates = np.array(coordinates, dtype=np.float64).reshape(-1, 2)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def query(self, latitudes, longitudes, k=1):
+        """
+        Поиск k ближайших метеостанций для точек.
+        :param latitudes: широты точек
+        :param longitudes: долготы точек
+        :param k: количество ближайших метеостанций (None — все метеостанции)
+        :return: массивы номеров метеостанций в индексе и расстояний до них в километрах (по строке на точку,
+        метеостанции упорядочены по возрастанию расстояния)
+        """
+        points = np.column_stack((np.asarray(latitudes, dtype=np.float64), np.asarray(longitudes, dtype=np.float64)))
+        k = len(self.ids) if k is None else min(k, len(self.ids))
+        indices = np.empty((len(points), k), dtype=np.int64)
+        distances = np.empty((len(points), k), dtype=np.float64)
+        if k == 0:
+            return indices, distances
+        for start in range(0, len(points), WEATHER_STATION_QUERY_SIZE):
+            chunk = slice(start, start + WEATHER_STATION_QUERY_SIZE)
+            chunk_distances = haversine_vector(self.coordinates, points[chunk], comb=True).reshape(-1, len(self.ids))
+            if k < len(self.ids):
+                # Отбор k ближайших метеостанций без полной сортировки
+                chunk_indices = np.argpartition(chunk_distances, k - 1, axis=1)[:, :k]
+                chunk_indices.sort(axis=1)
+            else:
+                chunk_indices = np.broadcast_to(np.arange(k), chunk_distances.shape)
+            chunk_distances = np.take_along_axis(chunk_distances, chunk_indices, axis=1)
+            order = np.argsort(chunk_distances, axis=1, kind="stable")
+            indices[chunk] = np.take_along_axis(chunk_indices, order, axis=1)
+            distances[chunk] = np.take_along_axis(chunk_distances, order, axis=1)
+
+        return indices, distances
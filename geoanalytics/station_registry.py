@@ -0,0 +1,112 @@
+import os
+import re
+import fnmatch
+from pathlib import Path
+
+import geoanalytics.preprocess as gp
+
+
+# Шаблон названия csv-файла с информацией о погоде (каталог "weather_data"):
+# "<название метеостанции> <номер метеостанции>.<начало периода>.<конец периода>.1.0.0.ru.<кодировка>.00000000.csv"
+WEATHER_FILE_PATTERN = re.compile(r"(?:^|\s)(\d+)\.\d{2}\.\d{2}\.\d{4}\.\d{2}\.\d{2}\.\d{4}\.")
+# Шаблон названия csv-файла с информацией по погодным условиям (каталог "kp_po_forcast"): "<номер метеостанции>.csv"
+WEATHER_CONDITIONS_FILE_PATTERN = re.compile(r"^(\d+)\.csv$")
+
+# Реестры файлов метеостанций (по каталогам)
+_registries = dict()
+
+
+def get_station_id(value):
+    """
+    Приведение номера метеостанции к целому числу.
+    :param value: номер метеостанции (число или строка, например, "30230" или "30230.0")
+    :return: номер метеостанции или None, если номер не задан
+    """
+    try:
+        return int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+class StationFileRegistry:
+    """
+    Реестр csv-файлов метеостанций в каталоге с данными: каталог просматривается один раз, номер метеостанции
+    определяется по названию файла. Реестр обновляется при изменении каталога (по времени его изменения).
+    """
+
+    def __init__(self, directory, pattern):
+        """
+        :param directory: путь к каталогу с csv-файлами метеостанций
+        :param pattern: регулярное выражение для получения номера метеостанции из названия файла
+        """
+        self.directory = Path(directory)
+        self.pattern = pattern
+        self._modified_time = None
+        self._files = dict()
+
+    def refresh(self):
+        """
+        Просмотр каталога, если он изменился с момента последнего просмотра.
+        """
+        modified_time = os.stat(self.directory).st_mtime_ns
+        if modified_time != self._modified_time:
+            files = dict()
+            for file_name in sorted(os.listdir(self.directory)):
+                if fnmatch.fnmatch(file_name, "*.csv"):
+                    match = self.pattern.search(file_name)
+                    if match:
+                        files.setdefault(int(match.group(1)), []).append(file_name)
+            self._files = files
+            self._modified_time = modified_time
+
+    def get_files(self, station_id):
+        """
+        Получение списка csv-файлов метеостанции.
+        :param station_id: номер метеостанции
+        :return: список названий csv-файлов (пустой, если файлов нет)
+        """
+        self.refresh()
+
+        return self._files.get(get_station_id(station_id), [])
+
+    def get_station_ids(self):
+        """
+        Получение номеров метеостанций, для которых есть csv-файлы.
+        :return: множество номеров метеостанций
+        """
+        self.refresh()
+
+        return set(self._files.keys())
+
+    def __contains__(self, station_id):
+        self.refresh()
+
+        return get_station_id(station_id) in self._files
+
+
+def get_station_registry(subdir):
+    """
+    Получение реестра csv-файлов метеостанций для каталога с данными (реестр создается один раз).
+    :param subdir: название дополнительного каталога (gp.WEATHER_DIR_NAME или gp.WEATHER_CONDITIONS_DIR_NAME)
+    :return: реестр csv-файлов метеостанций
+    """
+    directory = Path(Path.cwd().parent, gp.DATA_DIR_NAME, subdir).resolve()
+    if directory not in _registries:
+        pattern = WEATHER_CONDITIONS_FILE_PATTERN if subdir == gp.WEATHER_CONDITIONS_DIR_NAME \
+            else WEATHER_FILE_PATTERN
+        _registries[directory] = StationFileRegistry(directory, pattern)
+
+    return _registries[directory]
+
+
+def get_weather_stations_with_data(weather_station_ids):
+    """
+    Отбор метеостанций, для которых есть csv-файлы с информацией о погоде (каталог "weather_data")
+    и с информацией об условиях погоды (каталог "kp_po_forcast").
+    :param weather_station_ids: идентификаторы метеостанций
+    :return: множество идентификаторов метеостанций, по которым есть данные
+    """
+    station_ids = get_station_registry(gp.WEATHER_DIR_NAME).get_station_ids() & \
+        get_station_registry(gp.WEATHER_CONDITIONS_DIR_NAME).get_station_ids()
+
+    return {get_station_id(weather_station_id) for weather_station_id in weather_station_ids} & station_ids
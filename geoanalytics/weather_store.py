@@ -0,0 +1,727 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from pathlib import Path
+
+import geoanalytics.preprocess as gp
+from geoanalytics.records import CategoricalColumn
+from geoanalytics.station_registry import get_station_registry, get_station_id
+
+
+# Формат даты и времени пожара
+FIRE_DATETIME_FORMAT = "%d.%m.%Y %H:%M"
+# Формат даты и времени в csv-файлах с информацией о погоде (каталог "weather_data")
+WEATHER_DATETIME_FORMAT = "%d.%m.%Y %H:%M"
+# Формат даты и времени в csv-файлах с информацией по погодным условиям (каталог "kp_po_forcast")
+WEATHER_CONDITIONS_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Характеристики погоды
+WEATHER_COLUMNS = ["RRR", "Ff", "U", "T", "Td", "DD", "WW", "W1", "W2", "Po", "Tn", "Tx"]
+# Текстовые характеристики погоды (хранятся кодами категорий, остальные характеристики числовые)
+WEATHER_TEXT_COLUMNS = ["RRR", "DD", "WW", "W1", "W2"]
+# Характеристики погодных условий (прогноз погоды)
+WEATHER_CONDITIONS_COLUMNS = ["kp"]
+# Текстовые характеристики погодных условий
+WEATHER_CONDITIONS_TEXT_COLUMNS = []
+# Каталог хранилища данных метеостанций
+STATION_STORE_DIR_NAME = "station_store"
+
+# Хранилища данных метеостанций (по каталогам)
+_station_stores = dict()
+
+
+def save_npz_file(npz_file, **arrays):
+    """
+    Сохранение массивов в npz-файл. Файл записывается под временным именем и переименовывается, поэтому
+    параллельные процессы не читают его частично.
+    :param npz_file: путь к npz-файлу
+    :param arrays: сохраняемые массивы по названиям
+    """
+    temporary_file = npz_file.with_name(npz_file.name + "." + str(os.getpid()) + ".tmp")
+    with open(temporary_file, "wb") as file:
+        np.savez(file, **arrays)
+    os.replace(temporary_file, npz_file)
+
+
+def get_categorical_column(values):
+    """
+    Кодирование текстового столбца: коды значений и список различных значений (категорий).
+    Пустые строки и пропущенные значения имеют код -1.
+    :param values: значения столбца
+    :return: столбец в виде CategoricalColumn
+    """
+    values = pd.Series(values, dtype=object).fillna("").astype(str)
+    codes, categories = pd.factorize(values.mask(values == ""))
+
+    return CategoricalColumn(codes.astype(np.int32), categories.tolist())
+
+
+def merge_categorical_columns(columns):
+    """
+    Объединение текстовых столбцов с разными списками категорий (сегментов хранилища) в один столбец.
+    :param columns: список столбцов (CategoricalColumn)
+    :return: объединенный столбец с общим списком категорий
+    """
+    category_codes, categories = pd.factorize(
+        pd.Series([category for column in columns for category in column.categories], dtype=object))
+    codes = []
+    start = 0
+    for column in columns:
+        # Перевод кодов столбца в коды общего списка категорий (код -1 сохраняется)
+        codes.append(np.append(category_codes[start:start + len(column.categories)], -1)[column.codes])
+        start += len(column.categories)
+
+    return CategoricalColumn(np.concatenate(codes).astype(np.int32) if codes else np.zeros(0, dtype=np.int32),
+                             categories.tolist())
+
+
+class StationSeries:
+    """
+    Временной ряд наблюдений метеостанции: моменты наблюдений, упорядоченные по времени (datetime64),
+    и столбцы значений в порядке строк исходных файлов (числовые — массивы, текстовые — коды категорий).
+    Поиск ближайшего по времени наблюдения выполняется двоичным поиском сразу для массива моментов времени.
+    """
+
+    def __init__(self, datetimes, columns):
+        """
+        :param datetimes: моменты наблюдений в порядке строк исходных файлов
+        :param columns: словарь столбцов значений (название столбца: массив значений или CategoricalColumn)
+        """
+        self.datetimes = np.asarray(datetimes, dtype="datetime64[s]")
+        self.columns = columns
+        rows = np.flatnonzero(~np.isnat(self.datetimes))
+        order = rows[np.argsort(self.datetimes[rows], kind="stable")]
+        # Различные моменты наблюдений по возрастанию
+        self.times, starts = np.unique(self.datetimes[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        # Первая и последняя строки с каждым моментом наблюдения
+        self._first_rows = order[starts]
+        self._last_rows = order[ends - 1]
+        self._order = order
+        self._sorted_datetimes = self.datetimes[order]
+
+    def __len__(self):
+        return len(self.datetimes)
+
+    def get_nearest(self, datetimes):
+        """
+        Определение ближайших по времени наблюдений.
+        При равной удаленности выбирается момент, раньше встречающийся в исходных файлах, а при нескольких
+        строках с одним моментом наблюдения — последняя из них.
+        :param datetimes: моменты времени (datetime64)
+        :return: массив номеров строк с ближайшими наблюдениями (-1, если наблюдений нет)
+        """
+        datetimes = np.asarray(datetimes, dtype="datetime64[s]")
+        if len(self.times) == 0:
+            return np.full(len(datetimes), -1, dtype=np.int64)
+        right = np.searchsorted(self.times, datetimes, side="left")
+        left = right - 1
+        right_index = np.minimum(right, len(self.times) - 1)
+        left_index = np.maximum(left, 0)
+        no_distance = np.iinfo(np.int64).max
+        right_distance = np.where(right < len(self.times),
+                                  (self.times[right_index] - datetimes).astype(np.int64), no_distance)
+        left_distance = np.where(left >= 0, (datetimes - self.times[left_index]).astype(np.int64), no_distance)
+        choose_left = (left_distance < right_distance) | \
+                      ((left_distance == right_distance) &
+                       (self._first_rows[left_index] < self._first_rows[right_index]))
+
+        return self._last_rows[np.where(choose_left, left_index, right_index)]
+
+    def get_date_rows(self, date):
+        """
+        Определение наблюдений за сутки.
+        :param date: дата (date или datetime64)
+        :return: массив номеров строк с наблюдениями за эту дату (в порядке строк исходных файлов)
+        """
+        start = np.datetime64(date, "D").astype("datetime64[s]")
+        end = start + np.timedelta64(1, "D")
+        rows = self._order[np.searchsorted(self._sorted_datetimes, start, side="left"):
+                           np.searchsorted(self._sorted_datetimes, end, side="left")]
+
+        return np.sort(rows)
+
+    def get_row(self, row):
+        """
+        Получение значений всех столбцов для строки.
+        :param row: номер строки
+        :return: словарь значений (название столбца: значение)
+        """
+        return {column: values.get(row) if isinstance(values, CategoricalColumn) else values[row:row + 1].tolist()[0]
+                for column, values in self.columns.items()}
+
+    def get_values(self, column, rows):
+        """
+        Получение значений столбца для строк.
+        :param column: название столбца
+        :param rows: номера строк
+        :return: список значений
+        """
+        values = self.columns[column]
+        if isinstance(values, CategoricalColumn):
+            return values.take(np.asarray(rows, dtype=np.int64)).tolist()
+
+        return values[np.asarray(rows, dtype=np.int64)].tolist()
+
+
+class StationStore:
+    """
+    Хранилище данных метеостанций в столбцовом формате: для каждой метеостанции — каталог с сегментами
+    (npz-файлами с типизированными столбцами; текстовые столбцы хранятся кодами со списком категорий сегмента)
+    и описанием загруженных csv-файлов.
+    Наблюдения каждого csv-файла хранятся отдельным сегментом: при изменении загруженного ранее файла
+    (например, уточненных значений kp) его сегмент перезаписывается, а сегменты остальных файлов не меняются,
+    поэтому история метеостанции сохраняется и после удаления старых выгрузок.
+    Сегменты объединяются по моментам наблюдений по правилу "последний загруженный файл побеждает":
+    если момент наблюдения есть в нескольких файлах, берутся строки файла, загруженного (измененного) последним,
+    независимо от порядка названий файлов (например, выгрузки за более ранний период).
+    """
+
+    def __init__(self, subdir, datetime_format, columns, text_columns):
+        """
+        :param subdir: название каталога с csv-файлами (gp.WEATHER_DIR_NAME или gp.WEATHER_CONDITIONS_DIR_NAME)
+        :param datetime_format: формат даты и времени наблюдений в csv-файлах
+        :param columns: названия сохраняемых столбцов
+        :param text_columns: названия текстовых столбцов (остальные столбцы числовые)
+        """
+        self.subdir = subdir
+        self.datetime_format = datetime_format
+        self.columns = columns
+        self.text_columns = text_columns
+        self.directory = Path(Path.cwd().parent, gp.DATA_DIR_NAME, STATION_STORE_DIR_NAME, subdir).resolve()
+        self._series = dict()
+        # Метеостанции, csv-файлы которых уже проверены в этом процессе
+        self._updated = set()
+
+    def get_station_directory(self, station_id):
+        """
+        Получение каталога метеостанции в хранилище.
+        :param station_id: номер метеостанции
+        :return: путь к каталогу метеостанции
+        """
+        return Path(self.directory, str(get_station_id(station_id)))
+
+    def get_manifest(self, station_id):
+        """
+        Получение описания данных метеостанции в хранилище.
+        :param station_id: номер метеостанции
+        :return: словарь с версиями загруженных csv-файлов, сегментами ([csv-файл, номер сегмента] в порядке
+        загрузки), номером следующего сегмента и версией данных метеостанции
+        """
+        manifest_file = Path(self.get_station_directory(station_id), "manifest.json")
+        if manifest_file.exists():
+            with open(manifest_file, encoding="utf-8") as file:
+                return json.load(file)
+
+        return {"files": dict(), "segments": [], "next_segment": 0, "version": 0}
+
+    def _save_manifest(self, station_id, manifest):
+        """
+        Сохранение описания данных метеостанции в хранилище.
+        :param station_id: номер метеостанции
+        :param manifest: описание данных метеостанции
+        """
+        manifest_file = Path(self.get_station_directory(station_id), "manifest.json")
+        # Файл записывается под временным именем и переименовывается (параллельные процессы не читают его частично)
+        temporary_file = manifest_file.with_name(manifest_file.name + "." + str(os.getpid()) + ".tmp")
+        with open(temporary_file, "w", encoding="utf-8") as file:
+            json.dump(manifest, file, ensure_ascii=False, indent=1)
+        os.replace(temporary_file, manifest_file)
+
+    def _get_segment_file(self, station_id, segment):
+        """
+        Получение пути к сегменту метеостанции.
+        :param station_id: номер метеостанции
+        :param segment: номер сегмента
+        :return: путь к npz-файлу сегмента
+        """
+        return Path(self.get_station_directory(station_id), "segment_{:05d}.npz".format(segment))
+
+    def _read_csv_file(self, file_name):
+        """
+        Чтение и приведение к типизированным столбцам csv-файла метеостанции.
+        :param file_name: название csv-файла
+        :return: массив моментов наблюдений и словарь столбцов (None, если файл не удалось прочитать)
+        """
+        data = gp.get_csv_data(file_name, self.subdir)
+        if data is None:
+            return None, None
+        # Дата и время наблюдения: столбец "datetime" или первый столбец ("Местное время в ...")
+        datetime_column = data["datetime"] if "datetime" in data.columns else data.iloc[:, 0]
+        datetimes = pd.to_datetime(datetime_column.astype(str), format=self.datetime_format, errors="coerce") \
+            .to_numpy(dtype="datetime64[s]")
+        data = data.reindex(columns=self.columns)
+        columns = dict()
+        for column in self.columns:
+            if column in self.text_columns:
+                columns[column] = get_categorical_column(data[column])
+            else:
+                columns[column] = pd.to_numeric(data[column], errors="coerce").to_numpy(dtype=np.float64)
+
+        return datetimes, columns
+
+    def append(self, station_id, file_name, datetimes, columns):
+        """
+        Сохранение наблюдений csv-файла метеостанции в хранилище сегментом.
+        Сегмент, сохраненный ранее для этого файла, заменяется и становится последним по порядку загрузки.
+        :param station_id: номер метеостанции
+        :param file_name: название csv-файла
+        :param datetimes: моменты наблюдений (datetime64)
+        :param columns: словарь столбцов значений
+        :return: количество сохраненных наблюдений
+        """
+        manifest = self.get_manifest(station_id)
+        datetimes = np.asarray(datetimes, dtype="datetime64[s]")
+        new_rows = ~np.isnat(datetimes)
+        station_directory = self.get_station_directory(station_id)
+        station_directory.mkdir(parents=True, exist_ok=True)
+        for segment in [segment for segment_file, segment in manifest["segments"] if segment_file == file_name]:
+            self._get_segment_file(station_id, segment).unlink(missing_ok=True)
+        manifest["segments"] = [[segment_file, segment] for segment_file, segment in manifest["segments"]
+                                if segment_file != file_name]
+        if np.any(new_rows):
+            segment = dict()
+            for column in self.columns:
+                if isinstance(columns[column], CategoricalColumn):
+                    segment[column] = columns[column].codes[new_rows]
+                    segment[column + "_categories"] = np.array(columns[column].categories, dtype=str)
+                else:
+                    segment[column] = columns[column][new_rows]
+            save_npz_file(self._get_segment_file(station_id, manifest["next_segment"]), datetime=datetimes[new_rows],
+                          **segment)
+            manifest["segments"].append([file_name, manifest["next_segment"]])
+            manifest["next_segment"] += 1
+        manifest["version"] += 1
+        self._save_manifest(station_id, manifest)
+
+        return int(np.count_nonzero(new_rows))
+
+    def rebuild(self, station_id):
+        """
+        Удаление данных метеостанции из хранилища (для повторной загрузки всех ее csv-файлов).
+        :param station_id: номер метеостанции
+        """
+        station_directory = self.get_station_directory(station_id)
+        if station_directory.exists():
+            for file in station_directory.iterdir():
+                file.unlink()
+
+    def update(self, station_id):
+        """
+        Загрузка в хранилище новых и измененных csv-файлов метеостанции.
+        Данные, сохраненные до хранения сегментов по файлам (с одним последним моментом наблюдения на все файлы),
+        загружаются заново.
+        :param station_id: номер метеостанции
+        :return: количество сохраненных наблюдений
+        """
+        self._updated.add(get_station_id(station_id))
+        registry = get_station_registry(self.subdir)
+        manifest = self.get_manifest(station_id)
+        if not isinstance(manifest["segments"], list):
+            self.rebuild(station_id)
+            manifest = self.get_manifest(station_id)
+        row_number = 0
+        for file_name in registry.get_files(station_id):
+            file_stat = os.stat(Path(registry.directory, file_name))
+            file_version = [file_stat.st_mtime_ns, file_stat.st_size]
+            if manifest["files"].get(file_name) != file_version:
+                datetimes, columns = self._read_csv_file(file_name)
+                if datetimes is not None:
+                    row_number += self.append(station_id, file_name, datetimes, columns)
+                manifest = self.get_manifest(station_id)
+                manifest["files"][file_name] = file_version
+                self.get_station_directory(station_id).mkdir(parents=True, exist_ok=True)
+                self._save_manifest(station_id, manifest)
+
+        return row_number
+
+    def update_once(self, station_id):
+        """
+        Загрузка в хранилище новых и измененных csv-файлов метеостанции, если они еще не проверялись в этом процессе
+        (файлы, измененные во время обработки, загружаются при следующем запуске).
+        :param station_id: номер метеостанции
+        """
+        if get_station_id(station_id) not in self._updated:
+            self.update(station_id)
+
+    def ingest(self):
+        """
+        Загрузка в хранилище csv-файлов всех метеостанций каталога.
+        :return: количество сохраненных наблюдений
+        """
+        row_number = 0
+        for station_id in sorted(get_station_registry(self.subdir).get_station_ids()):
+            start_time = datetime.now()
+            station_row_number = self.update(station_id)
+            row_number += station_row_number
+            print(str(station_id) + ": " + str(station_row_number) + " (" + str(datetime.now() - start_time) + ")")
+
+        return row_number
+
+    def get_series(self, station_id):
+        """
+        Получение временного ряда метеостанции из хранилища (с загрузкой новых csv-файлов при первом обращении).
+        Из сегментов берутся только строки с моментами наблюдений, которых нет в сегментах, загруженных позже.
+        :param station_id: номер метеостанции
+        :return: временной ряд метеостанции или None, если по метеостанции нет данных
+        """
+        station_id = get_station_id(station_id)
+        if station_id is None:
+            return None
+        self.update_once(station_id)
+        manifest = self.get_manifest(station_id)
+        if station_id not in self._series or self._series[station_id][0] != manifest["version"]:
+            station_series = None
+            if len(manifest["segments"]) != 0:
+                segments = []
+                for _, segment in manifest["segments"]:
+                    with np.load(self._get_segment_file(station_id, segment)) as segment_data:
+                        segments.append({name: segment_data[name] for name in segment_data.files})
+                # Последний по порядку загрузки сегмент для каждого момента наблюдения
+                datetimes = np.concatenate([segment["datetime"] for segment in segments])
+                segment_indices = np.repeat(np.arange(len(segments)), [len(segment["datetime"])
+                                                                       for segment in segments])
+                times, time_indices = np.unique(datetimes, return_inverse=True)
+                last_segments = np.full(len(times), -1, dtype=np.int64)
+                np.maximum.at(last_segments, time_indices, segment_indices)
+                rows = np.flatnonzero(segment_indices == last_segments[time_indices])
+                columns = dict()
+                for column in self.columns:
+                    if column in self.text_columns:
+                        merged_column = merge_categorical_columns([
+                            CategoricalColumn(segment[column], segment[column + "_categories"].tolist())
+                            for segment in segments])
+                        columns[column] = CategoricalColumn(merged_column.codes[rows], merged_column.categories)
+                    else:
+                        columns[column] = np.concatenate([segment[column] for segment in segments])[rows]
+                station_series = StationSeries(datetimes[rows], columns)
+            self._series[station_id] = (manifest["version"], station_series)
+
+        return self._series[station_id][1]
+
+
+def get_station_store(subdir):
+    """
+    Получение хранилища данных метеостанций для каталога с csv-файлами (хранилище создается один раз).
+    :param subdir: название каталога с csv-файлами (gp.WEATHER_DIR_NAME или gp.WEATHER_CONDITIONS_DIR_NAME)
+    :return: хранилище данных метеостанций
+    """
+    directory = Path(Path.cwd().parent, gp.DATA_DIR_NAME, STATION_STORE_DIR_NAME, subdir).resolve()
+    if directory not in _station_stores:
+        if subdir == gp.WEATHER_CONDITIONS_DIR_NAME:
+            _station_stores[directory] = StationStore(subdir, WEATHER_CONDITIONS_DATETIME_FORMAT,
+                                                      WEATHER_CONDITIONS_COLUMNS, WEATHER_CONDITIONS_TEXT_COLUMNS)
+        else:
+            _station_stores[directory] = StationStore(subdir, WEATHER_DATETIME_FORMAT, WEATHER_COLUMNS,
+                                                      WEATHER_TEXT_COLUMNS)
+
+    return _station_stores[directory]
+
+
+def ingest_station_files():
+    """
+    Загрузка csv-файлов всех метеостанций (каталоги "weather_data" и "kp_po_forcast") в хранилище.
+    При повторном вызове загружаются только новые и измененные csv-файлы.
+    """
+    start_full_time = datetime.now()
+    for subdir in [gp.WEATHER_DIR_NAME, gp.WEATHER_CONDITIONS_DIR_NAME]:
+        row_number = get_station_store(subdir).ingest()
+        print(subdir + ": " + str(row_number))
+    print("***************************************************")
+    print("Full time: " + str(datetime.now() - start_full_time))
+
+
+def get_weather_series(station_id):
+    """
+    Получение временного ряда погоды по метеостанции (каталог "weather_data").
+    :param station_id: номер метеостанции
+    :return: временной ряд метеостанции или None, если по метеостанции нет данных
+    """
+    return get_station_store(gp.WEATHER_DIR_NAME).get_series(station_id)
+
+
+def get_weather_conditions_series(station_id):
+    """
+    Получение временного ряда погодных условий (прогноз погоды) по метеостанции (каталог "kp_po_forcast").
+    :param station_id: номер метеостанции
+    :return: временной ряд метеостанции или None, если по метеостанции нет данных
+    """
+    return get_station_store(gp.WEATHER_CONDITIONS_DIR_NAME).get_series(station_id)
+
+
+def group_by_station(items, station_field="weather_station_id"):
+    """
+    Группировка объектов (пожаров) по метеостанциям.
+    :param items: объекты (словари с данными)
+    :param station_field: название поля с номером метеостанции
+    :return: словарь (номер метеостанции: список объектов) без объектов, для которых метеостанция не задана
+    """
+    groups = dict()
+    for item in items:
+        station_id = get_station_id(item[station_field])
+        if station_id is not None:
+            groups.setdefault(station_id, []).append(item)
+
+    return groups
+
+
+def get_datetimes(values, datetime_format=FIRE_DATETIME_FORMAT):
+    """
+    Разбор дат и времени.
+    :param values: даты и время в виде строк
+    :param datetime_format: формат даты и времени
+    :return: массив моментов времени (datetime64)
+    """
+    return pd.to_datetime(pd.Series(list(values), dtype=object), format=datetime_format) \
+        .to_numpy(dtype="datetime64[s]")
+
+
+# Классы пожарной опасности по условиям погоды (код класса — номер в списке, 0 — класс не определен)
+WEATHER_HAZARD_CLASSES = ["", "I", "II", "III", "IV", "V"]
+
+
+def get_weather_hazard_class_codes(kp_values):
+    """
+    Определение кодов классов пожарной опасности по условиям погоды (комплексному показателю kp).
+    :param kp_values: значения комплексного показателя
+    :return: массив кодов классов (номеров в WEATHER_HAZARD_CLASSES, 0 — класс не определен)
+    """
+    kp_values = pd.to_numeric(pd.Series(list(kp_values), dtype=object), errors="coerce").to_numpy(dtype=np.float64)
+
+    return np.select([kp_values <= 300,
+                      (301 <= kp_values) & (kp_values <= 1000),
+                      (1001 <= kp_values) & (kp_values <= 4000),
+                      (4001 <= kp_values) & (kp_values <= 10000),
+                      kp_values > 10000], [1, 2, 3, 4, 5], 0).astype(np.int8)
+
+
+def get_weather_hazard_classes(kp_values):
+    """
+    Определение классов пожарной опасности по условиям погоды (комплексному показателю kp).
+    :param kp_values: значения комплексного показателя
+    :return: список классов пожарной опасности ("", если класс не определен)
+    """
+    return np.array(WEATHER_HAZARD_CLASSES, dtype=object)[get_weather_hazard_class_codes(kp_values)].tolist()
+
+
+# Файл суточных характеристик погоды в каталоге метеостанции хранилища
+DAILY_WEATHER_FILE_NAME = "daily.npz"
+# Суточные характеристики погоды (с типами значений): количество наблюдений, сумма осадков (с количеством
+# измеренных значений), средние влажность и давление, последние за сутки минимальная и максимальная температуры,
+# признак сухой грозы, количество наблюдений с заданными условиями погоды (WW, W1, W2) и признак сухой грозы
+# по этим наблюдениям
+DAILY_WEATHER_DTYPES = {"count": np.int32, "RRR": np.float64, "RRR_number": np.int32, "U": np.float64,
+                        "Po": np.float64, "Tn": np.float64, "Tx": np.float64, "thunderstorm": bool,
+                        "conditions_count": np.int32, "conditions_thunderstorm": bool}
+DAILY_WEATHER_COLUMNS = list(DAILY_WEATHER_DTYPES)
+
+# Суточные характеристики погоды метеостанций (по номерам метеостанций)
+_daily_weather = dict()
+
+
+def get_precipitation_values(values):
+    """
+    Приведение значений количества осадков (столбец "RRR") к числам: "Осадков нет" — 0, пустые и нечисловые
+    значения ("Следы осадков") — NaN.
+    :param values: значения количества осадков
+    :return: массив количества осадков и маска числовых (измеренных) значений
+    """
+    values = pd.Series(list(values), dtype=object)
+    precipitation = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64)
+    measured = ~np.isnan(precipitation)
+    no_precipitation = values.astype(str).str.lower().str.contains("осадков нет", regex=False).to_numpy(dtype=bool)
+
+    return np.where(no_precipitation, 0, precipitation), measured & ~no_precipitation
+
+
+def get_last_values(day_indices, values, day_number):
+    """
+    Определение последних за сутки (по порядку строк) заданных значений.
+    :param day_indices: номера суток для строк
+    :param values: значения для строк
+    :param day_number: количество суток
+    :return: массив последних значений по суткам (NaN, если за сутки значений нет)
+    """
+    last_values = np.full(day_number, np.nan)
+    rows = np.flatnonzero(~np.isnan(values))[::-1]
+    days, last = np.unique(day_indices[rows], return_index=True)
+    last_values[days] = values[rows[last]]
+
+    return last_values
+
+
+def get_dry_thunderstorms(weather_columns):
+    """
+    Определение сухой грозы по наблюдениям: в условиях погоды (WW, W1, W2) есть "гроза" без "дожд" и "ливень",
+    а осадков нет (или количество осадков не задано).
+    Условия проверяются один раз для каждого различного сочетания категорий WW, W1, W2 и для каждой категории RRR.
+    :param weather_columns: словарь столбцов значений (RRR, WW, W1, W2 в виде CategoricalColumn)
+    :return: массив признаков сухой грозы по наблюдениям
+    """
+    condition_columns = [weather_columns[column] for column in ["WW", "W1", "W2"]]
+    combinations, combination_indices = np.unique(np.stack([column.codes for column in condition_columns], axis=1),
+                                                  axis=0, return_inverse=True)
+    weather_strings = pd.Series([""] * len(combinations), dtype=object)
+    for index, column in enumerate(condition_columns):
+        weather_strings += pd.Series(column.get_categories()[combinations[:, index]], dtype=object) \
+            .astype(str).str.lower()
+    thunderstorms = (weather_strings.str.contains("гроза", regex=False) &
+                     ~weather_strings.str.contains("дожд", regex=False) &
+                     ~weather_strings.str.contains("ливень", regex=False)).to_numpy(dtype=bool)
+    precipitation = pd.Series(weather_columns["RRR"].get_categories(), dtype=object).astype(str)
+    no_precipitation = (precipitation.str.lower().str.contains("осадков нет", regex=False) |
+                        (precipitation == "nan")).to_numpy(dtype=bool)
+
+    return thunderstorms[combination_indices.reshape(-1)] & no_precipitation[weather_columns["RRR"].codes]
+
+
+def get_series_daily_weather(weather_series):
+    """
+    Вычисление суточных характеристик погоды по временному ряду метеостанции.
+    Влажность усредняется по целым значениям, суммы накапливаются в порядке строк исходных файлов.
+    Текстовые характеристики разбираются по спискам категорий, а не по наблюдениям.
+    :param weather_series: временной ряд погоды метеостанции
+    :return: словарь массивов ("date" — дни с наблюдениями по возрастанию, остальные — DAILY_WEATHER_COLUMNS)
+    """
+    rows = np.flatnonzero(~np.isnat(weather_series.datetimes))
+    dates, day_indices = np.unique(weather_series.datetimes[rows].astype("datetime64[D]"), return_inverse=True)
+    day_number = len(dates)
+    columns = {column: CategoricalColumn(values.codes[rows], values.categories)
+               if isinstance(values, CategoricalColumn) else values[rows]
+               for column, values in weather_series.columns.items()}
+    precipitation, measured = get_precipitation_values(columns["RRR"].get_categories())
+    precipitation, measured = precipitation[columns["RRR"].codes], measured[columns["RRR"].codes]
+    humidity = np.trunc(columns["U"])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        daily_weather = {
+            "date": dates,
+            "count": np.bincount(day_indices, minlength=day_number).astype(np.int32),
+            "RRR": np.bincount(day_indices, np.nan_to_num(precipitation), day_number),
+            "RRR_number": np.bincount(day_indices, measured, day_number).astype(np.int32),
+            "U": np.bincount(day_indices, np.nan_to_num(humidity), day_number) /
+                 np.bincount(day_indices, ~np.isnan(humidity), day_number),
+            "Po": np.bincount(day_indices, np.nan_to_num(columns["Po"]), day_number) /
+                  np.bincount(day_indices, ~np.isnan(columns["Po"]), day_number),
+            "Tn": get_last_values(day_indices, columns["Tn"], day_number),
+            "Tx": get_last_values(day_indices, columns["Tx"], day_number)}
+    thunderstorms = get_dry_thunderstorms(columns)
+    conditions = (columns["WW"].codes != -1) & (columns["W1"].codes != -1) & (columns["W2"].codes != -1)
+    daily_weather["thunderstorm"] = np.bincount(day_indices, thunderstorms, day_number) > 0
+    daily_weather["conditions_count"] = np.bincount(day_indices, conditions, day_number).astype(np.int32)
+    daily_weather["conditions_thunderstorm"] = np.bincount(day_indices, thunderstorms & conditions, day_number) > 0
+
+    return daily_weather
+
+
+def get_daily_weather(station_id):
+    """
+    Получение суточных характеристик погоды по метеостанции (каталог "weather_data").
+    Характеристики вычисляются один раз после загрузки новых наблюдений в хранилище и сохраняются в каталоге
+    метеостанции.
+    :param station_id: номер метеостанции
+    :return: словарь массивов ("date" — дни с наблюдениями, остальные — DAILY_WEATHER_COLUMNS) или None,
+    если по метеостанции нет данных
+    """
+    station_id = get_station_id(station_id)
+    if station_id is None:
+        return None
+    store = get_station_store(gp.WEATHER_DIR_NAME)
+    store.update_once(station_id)
+    manifest = store.get_manifest(station_id)
+    if station_id not in _daily_weather or _daily_weather[station_id][0] != manifest["version"]:
+        daily_weather = None
+        if len(manifest["segments"]) != 0:
+            daily_file = Path(store.get_station_directory(station_id), DAILY_WEATHER_FILE_NAME)
+            if daily_file.exists():
+                with np.load(daily_file) as daily_data:
+                    # Файл пересчитывается после загрузки новых наблюдений и при добавлении характеристик
+                    if "version" in daily_data.files and int(daily_data["version"]) == manifest["version"] and \
+                            set(DAILY_WEATHER_COLUMNS).issubset(daily_data.files):
+                        daily_weather = {name: daily_data[name] for name in daily_data.files if name != "version"}
+            if daily_weather is None:
+                daily_weather = get_series_daily_weather(store.get_series(station_id))
+                save_npz_file(daily_file, version=manifest["version"], **daily_weather)
+        _daily_weather[station_id] = (manifest["version"], daily_weather)
+
+    return _daily_weather[station_id][1]
+
+
+class DailyWeatherCube:
+    """
+    Куб суточных характеристик погоды: метеостанции × дни периода × характеристики (типизированные массивы).
+    Наличие наблюдений метеостанции за день хранится битовой картой, по которой для списка ближайших метеостанций
+    сразу для всех дней выбирается первая метеостанция с наблюдениями.
+    """
+
+    def __init__(self, station_ids, dates):
+        """
+        :param station_ids: номера метеостанций
+        :param dates: дни периода (datetime64[D], по возрастанию без пропусков)
+        """
+        self.station_ids = list(dict.fromkeys(get_station_id(station_id) for station_id in station_ids
+                                              if get_station_id(station_id) is not None))
+        self.dates = np.asarray(dates, dtype="datetime64[D]")
+        self._station_indices = {station_id: index for index, station_id in enumerate(self.station_ids)}
+        shape = (len(self.station_ids), len(self.dates))
+        # Дни без наблюдений: NaN для вещественных характеристик, 0 (False) для остальных
+        self.values = {column: np.full(shape, np.nan if dtype is np.float64 else 0, dtype=dtype)
+                       for column, dtype in DAILY_WEATHER_DTYPES.items()}
+        for index, station_id in enumerate(self.station_ids):
+            daily_weather = get_daily_weather(station_id)
+            if daily_weather is not None and len(self.dates) != 0:
+                day_indices = (daily_weather["date"] - self.dates[0]).astype(np.int64)
+                days = np.flatnonzero((day_indices >= 0) & (day_indices < len(self.dates)))
+                for column in DAILY_WEATHER_COLUMNS:
+                    self.values[column][index, day_indices[days]] = daily_weather[column][days]
+        self.available = self.values["count"] > 0
+
+    def get_day_index(self, date):
+        """
+        Получение номера дня периода.
+        :param date: дата (date или datetime64)
+        :return: номер дня (None, если дата вне периода)
+        """
+        day_index = int((np.datetime64(date, "D") - self.dates[0]).astype(np.int64)) if len(self.dates) else -1
+
+        return day_index if 0 <= day_index < len(self.dates) else None
+
+    def get_sources(self, station_ids, count_column="count"):
+        """
+        Выбор для каждого дня периода первой метеостанции списка, по которой есть наблюдения за этот день.
+        :param station_ids: номера метеостанций в порядке удаленности
+        :param count_column: характеристика с количеством наблюдений ("count" — все наблюдения,
+        "conditions_count" — наблюдения с заданными условиями погоды)
+        :return: массив номеров метеостанций в кубе по дням (-1, если наблюдений нет ни по одной метеостанции)
+        """
+        available = self.available if count_column == "count" else self.values[count_column] > 0
+        sources = np.full(len(self.dates), -1, dtype=np.int64)
+        for station_id in reversed(station_ids):
+            index = self._station_indices.get(get_station_id(station_id))
+            if index is not None:
+                sources = np.where(available[index], index, sources)
+
+        return sources
+
+
+def get_daily_weather_values(station_id, column, dates):
+    """
+    Получение суточной характеристики погоды метеостанции за даты.
+    :param station_id: номер метеостанции
+    :param column: название характеристики (из DAILY_WEATHER_COLUMNS)
+    :param dates: даты (datetime64[D])
+    :return: массив значений по датам (NaN или 0 (False), если наблюдений за дату нет) или None,
+    если по метеостанции нет данных
+    """
+    daily_weather = get_daily_weather(station_id)
+    if daily_weather is None:
+        return None
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    dtype = DAILY_WEATHER_DTYPES[column]
+    values = np.full(len(dates), np.nan if dtype is np.float64 else 0, dtype=dtype)
+    if len(daily_weather["date"]) != 0:
+        positions = np.minimum(np.searchsorted(daily_weather["date"], dates), len(daily_weather["date"]) - 1)
+        found = daily_weather["date"][positions] == dates
+        values[found] = daily_weather[column][positions[found]]
+
+    return values
@@ -0,0 +1,63 @@
+from functools import partial
+
+from geoanalytics.checkpoint import process_fires_with_checkpoints, read_checkpoint, write_checkpoint
+from geoanalytics.result_cache import get_input_hash
+
+
+def get_fires_dict(keys):
+    return {key: {"fire_id": key, "area": float(key)} for key in keys}
+
+
+def define_area_class(fires_dict, calls):
+    for key, item in fires_dict.items():
+        calls.append(key)
+        item["area_class"] = "large" if item["area"] > 4 else "small"
+
+    return fires_dict
+
+
+def test_read_checkpoint_with_keys(tmp_path):
+    checkpoint_file = tmp_path / "stage.pkl"
+    write_checkpoint(checkpoint_file, {1: {"a": 1}, 2: {"a": 2}})
+    write_checkpoint(checkpoint_file, {3: {"a": 3}, 2: {"a": 4}})
+    with open(checkpoint_file, "ab") as file:
+        file.write(b"\x80\x05\x95")
+    assert read_checkpoint(checkpoint_file) == {1: {"a": 1}, 2: {"a": 4}, 3: {"a": 3}}
+    assert read_checkpoint(checkpoint_file, {2, 5}) == {2: {"a": 4}}
+
+
+def test_chunks_are_resumed_from_checkpoint(tmp_path):
+    checkpoint_file = tmp_path / "stage.pkl"
+    calls = []
+    process_fires_with_checkpoints(get_fires_dict(range(6)), define_area_class, checkpoint_file, {"calls": calls},
+                                   checkpoint_interval=4)
+    assert calls == list(range(6))
+    # Вторая часть файла с пожарами: сохраненные результаты берутся только по ее пожарам
+    calls.clear()
+    fires_dict = process_fires_with_checkpoints(get_fires_dict(range(4, 9)), define_area_class, checkpoint_file,
+                                                {"calls": calls}, done=read_checkpoint(checkpoint_file, {4, 5}),
+                                                checkpoint_interval=4)
+    assert calls == [6, 7, 8]
+    assert {key: item["area_class"] for key, item in fires_dict.items()} == \
+           {4: "small", 5: "large", 6: "large", 7: "large", 8: "large"}
+    calls.clear()
+    process_fires_with_checkpoints(get_fires_dict(range(9)), define_area_class, checkpoint_file, {"calls": calls},
+                                   checkpoint_interval=4)
+    assert calls == []
+
+
+def test_cached_results_hold_all_output_fields(tmp_path):
+    cache_file = tmp_path / "cache.pkl"
+    get_key = partial(get_input_hash, fields=("area",))
+    calls = []
+    # Пожар, у которого результат этапа уже записан (поле не изменяется этапом)
+    fires_dict = {1: {"fire_id": 1, "area": 5.0, "area_class": "large"}}
+    process_fires_with_checkpoints(fires_dict, define_area_class, cache_file, {"calls": calls}, get_key=get_key,
+                                   outputs=("area_class",))
+    assert read_checkpoint(cache_file) == {get_key(fires_dict[1]): {"area_class": "large"}}
+    # Другой пожар с теми же входными данными получает результат из кэша
+    fires_dict = process_fires_with_checkpoints({2: {"fire_id": 2, "area": 5.0, "area_class": ""}},
+                                                define_area_class, cache_file, {"calls": calls}, get_key=get_key,
+                                                outputs=("area_class",))
+    assert calls == [1]
+    assert fires_dict == {2: {"fire_id": 2, "area": 5.0, "area_class": "large"}}
@@ -0,0 +1,99 @@
+import random
+
+import pytest
+from Levenshtein._levenshtein import distance
+
+from geoanalytics.gazetteer import NameGazetteer, normalize_name
+
+
+FIELDS = ("municipality", "forest_plot", "dacha")
+NAMES = ["Братское", "Усть-Кутское", "Киренское", "Чунское", "Тулунское", "Нижнеудинское", "Ангарское"]
+PLOTS = ["Кежемское", "Илимское", "Тубинское", "Покоснинское", "Карахунское", "Вихоревское"]
+DACHAS = ["Кобляковская", "Зяба", "Падунская", "Анзёбская", "Ключи-Булак", "О'Шаманка"]
+
+
+def mutate(name, edits, rng):
+    # Замена символов на отсутствующие в названиях (каждая замена — расстояние 1)
+    positions = rng.sample(range(len(name)), edits)
+    characters = list(name)
+    for position in positions:
+        characters[position] = "ж" if characters[position] != "ж" else "щ"
+
+    return "".join(characters)
+
+
+def get_reference(rng, size=300):
+    reference = dict()
+    for key in range(size):
+        item = {"municipality": rng.choice(NAMES), "forest_plot": rng.choice(PLOTS), "dacha": rng.choice(DACHAS)}
+        if rng.random() < 0.3:
+            field = rng.choice(FIELDS)
+            item[field] = mutate(item[field], rng.randint(1, 2), rng)
+        if rng.random() < 0.05:
+            item[rng.choice(FIELDS)] = float("nan")
+        reference[key * 10] = item
+
+    return reference
+
+
+def linear_search(reference, names):
+    # Исходный перебор справочника (записи с незаданными названиями не сравниваются)
+    keys = []
+    for key, item in reference.items():
+        item_names = [normalize_name(item[field]) for field in FIELDS]
+        if None in item_names:
+            continue
+        total_levenshtein_distance = sum(distance(item_name, name) for item_name, name in zip(item_names, names))
+        if total_levenshtein_distance < 4:
+            keys.append(key)
+
+    return keys
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_search_matches_linear_scan(seed):
+    rng = random.Random(seed)
+    reference = get_reference(rng)
+    gazetteer = NameGazetteer(reference, FIELDS)
+    queries = []
+    for item in rng.sample(list(reference.values()), 60):
+        names = [item[field] if isinstance(item[field], str) else rng.choice(NAMES) for field in FIELDS]
+        queries.append(names)
+        for edits in (1, 2, 3, 4):
+            field_index = rng.randrange(3)
+            mutated = list(names)
+            mutated[field_index] = mutate(mutated[field_index], min(edits, len(mutated[field_index])), rng)
+            queries.append(mutated)
+    # Повторяющиеся тройки (результат берется из запомненных)
+    queries += queries[:20]
+    for query in queries:
+        names = [normalize_name(name) for name in query]
+        assert gazetteer.search(*names) == linear_search(reference, names)
+
+
+def test_search_distance_limit():
+    reference = {1: {"municipality": "Братское", "forest_plot": "Кежемское", "dacha": "Зяба"},
+                 2: {"municipality": "Бротское", "forest_plot": "Кежемское", "dacha": "Зяба"},
+                 3: {"municipality": "Братское", "forest_plot": "Кежемское", "dacha": "Зябажжж"},
+                 4: {"municipality": "Братское", "forest_plot": "Кежемское", "dacha": "Зябажжжж"},
+                 5: {"municipality": "Брат-ское", "forest_plot": "КЕЖЕМСКОЕ", "dacha": "Зяба"}}
+    gazetteer = NameGazetteer(reference, FIELDS)
+    # Точное совпадение (после нормализации), расстояния 1 и 3 входят в результат, расстояние 4 — нет
+    assert gazetteer.search("братское", "кежемское", "зяба") == [1, 2, 3, 5]
+    assert gazetteer.search("братское", "кежемское", "зябажжжж") == [3, 4]
+    assert gazetteer.search("братское", "кежемское", "зяба", max_distance=0) == [1, 5]
+    assert len(gazetteer) == 4
+
+
+def test_names_not_set():
+    reference = {1: {"municipality": "Братское", "forest_plot": float("nan"), "dacha": "Зяба"},
+                 2: {"municipality": "Братское", "forest_plot": "nan", "dacha": "Зяба"},
+                 3: {"municipality": "Братское", "forest_plot": "Кежемское", "dacha": "Зяба"}}
+    gazetteer = NameGazetteer(reference, FIELDS)
+    assert normalize_name(float("nan")) is None and normalize_name("nan") is None
+    assert gazetteer.search("братское", "кежемское", "зяба") == [3]
+    assert gazetteer.search("братское", "кежемскаа", "зяба") == [3]
+    assert gazetteer.contains(0, "братское") and gazetteer.contains(1, "кежемское")
+    assert not gazetteer.contains(1, "nan")
+    assert NameGazetteer({1: reference[1]}, FIELDS).search("братское", "кежемское", "зяба") == []
+
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import geoanalytics.preprocess as gp
+from geoanalytics.geo_layer import GeometryDict
+from geoanalytics.parallel import get_shards
+from geoanalytics.pipeline import STAGES, Pipeline
+from geoanalytics.weather_store import get_station_store
+
+
+STATION_IDS = [30507, 30230, 30710]
+HEADER = '"Местное время в Икее";"T";"Po";"U";"Ff";"DD";"WW";"W1";"W2";"Tn";"Tx";"Td";"RRR"\n'
+CONDITIONS = ["", "Гроза (грозы) с осадками или без них.", "Дождь незамерзающий непрерывный.", "Гроза, ливень."]
+PRECIPITATION = ["", "Осадков нет", "1.5", "Следы осадков"]
+
+
+def write_weather_files(directory, station_id, seed):
+    # Две выгрузки метеостанции с пересекающимися периодами (наблюдения каждые 3 часа)
+    rng = np.random.default_rng(seed)
+    for start, period in [("2020-05-01", "01.05.2020.20.05.2020"), ("2020-05-15", "15.05.2020.31.05.2020")]:
+        moments = np.datetime64(start + "T00:00") + np.arange(0, 17 * 24, 3).astype("timedelta64[h]")
+        lines = []
+        for moment in moments:
+            lines.append('"' + pd.Timestamp(moment).strftime("%d.%m.%Y %H:%M") + '";' +
+                         str(round(rng.uniform(-5, 25), 1)) + ";" + str(round(rng.uniform(740, 760), 1)) + ";" +
+                         str(rng.integers(20, 100)) + ";" + str(rng.integers(0, 10)) + ';"";"' +
+                         str(rng.choice(CONDITIONS)) + '";"' + str(rng.choice(CONDITIONS[:2])) + '";"";;;;"' +
+                         str(rng.choice(PRECIPITATION)) + '"\n')
+        file = directory / ("Икей " + str(station_id) + "." + period + ".1.0.0.ru.ansi.00000000.csv")
+        file.write_text(HEADER + "".join(lines), encoding="utf-8")
+
+
+def get_fires_dict(count, seed):
+    # Пожары по метеостанциям с данными, по метеостанции без данных и без метеостанции
+    rng = np.random.default_rng(seed)
+    station_ids = [str(station_id) for station_id in STATION_IDS] + ["99999", ""]
+    days = rng.integers(0, 31, size=count)
+    hours = rng.integers(0, 24, size=count)
+    fires_dict = GeometryDict()
+    for key in range(count):
+        moment = pd.Timestamp("2020-05-01") + pd.Timedelta(days=int(days[key]), hours=int(hours[key]))
+        fires_dict[key] = {"id": key, "new_fire_id": key, "dt": moment.strftime("%d.%m.%Y %H:%M"),
+                           "weather_station_id": str(rng.choice(station_ids))}
+
+    return fires_dict
+
+
+def run_stages(run_directory, monkeypatch, workers):
+    # Каждый запуск выполняется в своем каталоге данных с пустым хранилищем метеостанций
+    weather_directory = run_directory / gp.DATA_DIR_NAME / gp.WEATHER_DIR_NAME
+    weather_directory.mkdir(parents=True)
+    for seed, station_id in enumerate(STATION_IDS):
+        write_weather_files(weather_directory, station_id, seed)
+    (run_directory / "run").mkdir()
+    monkeypatch.chdir(run_directory / "run")
+    pipeline = Pipeline(workers=workers)
+    fires_dict = get_fires_dict(60, 5)
+    for name in ["weather", "thunderstorm"]:
+        fires_dict = pipeline.run_stage(STAGES[name], fires_dict)
+
+    return pd.DataFrame.from_dict(fires_dict, orient="index")
+
+
+def test_parallel_stages_on_cold_store_match_sequential(tmp_path, monkeypatch, capsys):
+    # Параллельный запуск выполняется первым, пока суточные характеристики погоды не вычислены в этом процессе
+    parallel_data = run_stages(tmp_path / "parallel", monkeypatch, 2)
+    store = get_station_store(gp.WEATHER_DIR_NAME)
+    for station_id in STATION_IDS:
+        assert len(store.get_manifest(station_id)["segments"]) == 2
+    assert list(store.directory.rglob("*.tmp")) == []
+    sequential_data = run_stages(tmp_path / "sequential", monkeypatch, None)
+    assert set(parallel_data["thunderstorm"]) == {"", "сухая гроза"}
+    pd.testing.assert_frame_equal(parallel_data, sequential_data)
+
+
+@pytest.mark.parametrize("count, shard_number", [(0, 3), (1, 4), (10, 3), (12, 4), (5, 8)])
+def test_get_shards(count, shard_number):
+    keys = ["fire_" + str(key) for key in range(count)]
+    shards = get_shards(keys, shard_number)
+    assert [key for shard in shards for key in shard] == keys
+    assert len(shards) <= shard_number
+    assert all(len(shard) != 0 for shard in shards)
+    assert len({len(shard) for shard in shards[:-1]}) <= 1
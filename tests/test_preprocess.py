@@ -0,0 +1,71 @@
+import pandas as pd
+import pytest
+
+import geoanalytics.preprocess as gp
+
+
+@pytest.fixture
+def data_directory(tmp_path, monkeypatch):
+    directory = tmp_path / gp.DATA_DIR_NAME
+    directory.mkdir()
+    (tmp_path / "run").mkdir()
+    monkeypatch.chdir(tmp_path / "run")
+
+    return directory
+
+
+def write_csv_file(file, names, encoding, ascii_number=None):
+    # Строки с кириллицей (или ошибочными байтами) только после начала файла, по которому определяется кодировка
+    ascii_number = len(names) if ascii_number is None else ascii_number
+    rows = ["id;name"] + [str(index) + ";" + ("x" * 50 if index < ascii_number else names[index % len(names)])
+                          for index in range(ascii_number + len(names))]
+    file.write_bytes(b"".join(row.encode(encoding, errors="replace") + b"\n" for row in rows))
+
+
+def test_encoding_is_detected_by_sample(data_directory, monkeypatch):
+    monkeypatch.setattr(gp, "CSV_ENCODING_SAMPLE_SIZE", 1024)
+    write_csv_file(data_directory / "utf8.csv", ["Братск"] * 100, "utf-8")
+    write_csv_file(data_directory / "weather 1.ru.ansi.0.csv", ["Братск"] * 100, "cp1251")
+    assert gp.get_csv_encoding(data_directory / "utf8.csv") == ("utf-8", "strict")
+    # Начало выгрузки в ANSI читается в utf-8 (ошибочные байты находятся при чтении)
+    assert gp.get_csv_encoding(data_directory / "weather 1.ru.ansi.0.csv") == ("utf-8", "strict")
+    (data_directory / "cut.csv").write_bytes(b"x" * 1023 + "Б".encode("utf-8"))
+    assert gp.get_csv_encoding(data_directory / "cut.csv") == ("utf-8", "strict")
+    (data_directory / "ansi.csv").write_bytes("Братск".encode("cp1251"))
+    assert gp.get_csv_encoding(data_directory / "ansi.csv") == ("utf-8", "replace")
+
+
+@pytest.mark.parametrize("file_name, encoding, name", [("weather 1.ru.ansi.0.csv", "cp1251", "Братск"),
+                                                        ("other.csv", "cp1251", "�" * 6),
+                                                        ("utf8.csv", "utf-8", "Братск")])
+def test_bytes_after_sample_fall_back(data_directory, monkeypatch, file_name, encoding, name):
+    monkeypatch.setattr(gp, "CSV_ENCODING_SAMPLE_SIZE", 1024)
+    write_csv_file(data_directory / file_name, ["Братск"] * 100, encoding)
+    file_data = gp.get_csv_data(file_name)
+    assert len(file_data) == 200 and file_data["name"].iloc[-1] == name
+    chunks = list(gp.get_csv_chunks(file_name, 30))
+    assert [len(chunk) for chunk in chunks] == [30] * 6 + [20]
+    assert pd.concat(chunks)["id"].tolist() == list(range(200))
+    assert pd.concat(chunks)["name"].tolist() == file_data["name"].tolist()
+
+
+def test_chunks_after_decode_error_are_not_repeated(data_directory, monkeypatch):
+    # Ошибочные байты далеко за началом файла: часть строк уже получена до их обнаружения
+    write_csv_file(data_directory / "weather 1.ru.ansi.0.csv", ["Братск"] * 1000, "cp1251", 30000)
+    chunks = list(gp.get_csv_chunks("weather 1.ru.ansi.0.csv", 1000))
+    assert pd.concat(chunks)["id"].tolist() == list(range(31000))
+    assert pd.concat(chunks)["name"].iloc[-1] == "Братск"
+
+
+def test_weather_conditions_schema_matches_loader(data_directory):
+    (data_directory / gp.WEATHER_CONDITIONS_DIR_NAME).mkdir()
+    (data_directory / gp.WEATHER_CONDITIONS_DIR_NAME / "24713.csv").write_text(
+        "id_station;date;time;datetime;sss;RRR;T;Td;t(t-r);n;kp\n"
+        "24713;2020-12-31 00:00:00;20:00;2020-12-31 20:00:00;;0.0;-32.6;-33.6;-32.6;19.0;-1137.73\n"
+        "24713;2020-12-29 00:00:00;20:00;2020-12-29 20:00:00;;0.0;-26.5;-27.7;-30.9;18.0;\n", encoding="utf-8")
+    weather_conditions_dict = gp.get_weather_conditions_dict(
+        gp.get_csv_data("24713.csv", gp.WEATHER_CONDITIONS_DIR_NAME))
+    assert [item["datetime"] for item in weather_conditions_dict.values()] == ["2020-12-31 20:00:00",
+                                                                               "2020-12-29 20:00:00"]
+    kp_values = [item["kp"] for item in weather_conditions_dict.values()]
+    assert kp_values[0] == -1137.73 and pd.isna(kp_values[1])
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from geoanalytics.records import MISSING, CategoricalColumn, RecordTable, get_csv_records
+
+
+def get_records(size):
+    csv_data = pd.DataFrame({"id": np.arange(size), "area": np.arange(size) * 0.5,
+                             "forestry": ["Братское", "Усть-Кутское"] * (size // 2) + ["Братское"] * (size % 2)})
+
+    return get_csv_records(csv_data, {"id": "id", "area": "area", "forestry": "forestry"}, key="id")
+
+
+def test_append_keeps_column_types():
+    records = get_records(10)
+    expected = {key: dict(item) for key, item in records.items()}
+    for key in range(10, 1000):
+        item = {"id": key, "area": key * 0.5, "forestry": "Киренское" if key % 3 else "Братское"}
+        records[key] = item
+        expected[key] = item
+    columns = records.table.columns
+    assert columns["id"].dtype == np.int64 and columns["area"].dtype == np.float64
+    assert isinstance(columns["forestry"], CategoricalColumn)
+    assert len(records.table) == 1000 and len(columns["id"]) >= 1000
+    assert {key: dict(item) for key, item in records.items()} == expected
+    assert records.get_column("area").tolist() == [expected[key]["area"] for key in expected]
+
+
+def test_append_with_missing_and_other_fields():
+    records = get_records(4)
+    records[4] = {"id": 4, "area": "нет данных", "snowiness": "много"}
+    records[5] = records[0]
+    records[6] = {"id": 6, "area": 3.0, "forestry": "Братское"}
+    assert dict(records[4]) == {"id": 4, "area": "нет данных", "snowiness": "много"}
+    assert dict(records[5]) == dict(records[0])
+    assert dict(records[6]) == {"id": 6, "area": 3.0, "forestry": "Братское"}
+    assert records.table.get(records.get_positions()[0], "snowiness") is MISSING
+    assert records.table.columns["id"].dtype == np.int64
+    frame = records.to_frame()
+    assert list(frame.index) == [0, 1, 2, 3, 4, 5, 6]
+    assert frame.loc[4, "area"] == "нет данных" and pd.isna(frame.loc[0, "snowiness"])
+
+
+def test_append_to_empty_table():
+    table = RecordTable(dict())
+    for position in range(100):
+        assert table.append({"value": position}) == position
+    assert [table.get(position, "value") for position in range(100)] == list(range(100))
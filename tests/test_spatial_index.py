@@ -0,0 +1,259 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+import shapely
+
+from geoanalytics.fire_processor import identify_fire_by_dates
+from geoanalytics.geo_layer import GeometryDict, GeometryLayer, add_geometry_layer
+from geoanalytics.geo_utilitys import get_distance, reproject
+from geoanalytics.spatial_index import NearestFeatureIndex, SpatioTemporalIndex, get_day, get_spatial_join, \
+    get_intersection_components, spatial_join
+
+
+START_DATE = datetime(2020, 5, 1)
+
+
+def get_date(day):
+    return (START_DATE + timedelta(days=int(day))).strftime("%d.%m.%Y") + " 12:00"
+
+
+def get_fire_geometries(count, seed):
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(0, 10, size=(count, 2))
+
+    return [shapely.box(x, y, x + 1, y + 1) for x, y in centers]
+
+
+def get_fire_days(count, seed):
+    # Дни с разрывами (от 0 до 12 дней) между соседними пожарами и возвратами назад
+    rng = np.random.default_rng(seed)
+    days = np.cumsum(rng.choice([0, 0, 1, 2, 3, 5, 9, 10, 12, -4], size=count))
+
+    return days - days.min()
+
+
+def linear_next_position_outside(days, position, start_day, end_day):
+    position += 1
+    while position < len(days) and start_day <= days[position] <= end_day:
+        position += 1
+
+    return position
+
+
+def build_index(count, seed, deleted=()):
+    geometries = get_fire_geometries(count, seed)
+    days = get_fire_days(count, seed)
+    layer = GeometryLayer(range(count), shapely.to_wkb(geometries, hex=True))
+    keys = [key for key in range(count) if key not in set(deleted)]
+    index = SpatioTemporalIndex(layer, [get_date(days[key]) for key in keys], keys)
+
+    return index, keys, [geometries[key] for key in keys], days[keys]
+
+
+@pytest.mark.parametrize("count", [1, 2, 7, 64, 301])
+def test_next_position_outside_matches_linear_scan(count):
+    index, _, _, days = build_index(count, count)
+    first_day = get_day(START_DATE)
+    for position in range(-1, count):
+        for day in set(days.tolist()):
+            for radius in (0, 1, 2, 9):
+                start_day, end_day = first_day + day - radius, first_day + day + radius
+                assert index.next_position_outside(position, start_day, end_day) == \
+                       linear_next_position_outside(index.days, position, start_day, end_day)
+
+
+def test_next_position_outside_with_deleted_keys():
+    count = 200
+    deleted = set(range(0, count, 3)) | set(range(50, 90))
+    index, keys, _, days = build_index(count, 7, deleted)
+    assert len(index) == len(keys)
+    assert np.array_equal(index.days, days + get_day(START_DATE))
+    for position in range(-1, len(keys)):
+        for radius in (0, 2, 9):
+            day = int(index.days[max(position, 0)])
+            assert index.next_position_outside(position, day - radius, day + radius) == \
+                   linear_next_position_outside(index.days, position, day - radius, day + radius)
+
+
+def test_next_position_on_day():
+    index, _, _, _ = build_index(150, 3, deleted=range(20, 40))
+    for position in range(-1, len(index)):
+        for day in range(int(index.days.min()) - 1, int(index.days.max()) + 2):
+            following = [next_position for next_position in range(position + 1, len(index))
+                         if index.days[next_position] == day]
+            assert index.next_position_on_day(position, day) == (following[0] if following else len(index))
+
+
+def test_get_positions_and_query_match_brute_force():
+    index, keys, geometries, days = build_index(250, 11, deleted=range(100, 130))
+    first_day = get_day(START_DATE)
+    assert np.array_equal(index.geometries, np.array(geometries, dtype=object))
+    queries = get_fire_geometries(20, 12)
+    for start, end in [(0, 0), (3, 12), (-5, 2), (30, 1000), (1000, 2000)]:
+        start_day, end_day = first_day + start, first_day + end
+        positions = index.get_positions(start_day, end_day)
+        assert sorted(positions.tolist()) == [position for position in range(len(keys))
+                                              if start <= days[position] <= end]
+        input_indices, positions = index.query(queries, start_day, end_day)
+        expected = {(query_index, position) for query_index, query in enumerate(queries)
+                    for position, geometry in enumerate(geometries)
+                    if start <= days[position] <= end and query.intersects(geometry)}
+        assert set(zip(input_indices.tolist(), positions.tolist())) == expected
+        assert len(input_indices) == len(expected)
+    # Без последнего дня интервала поиск выполняется до конца шкалы времени
+    input_indices, positions = index.query(queries, first_day + 10)
+    expected = {(query_index, position) for query_index, query in enumerate(queries)
+                for position, geometry in enumerate(geometries)
+                if days[position] >= 10 and query.intersects(geometry)}
+    assert set(zip(input_indices.tolist(), positions.tolist())) == expected
+
+
+def linear_identify_fire_by_dates(fires_dict):
+    # Исходный перебор пар пожаров (до построения индекса)
+    index = 1
+    for current_key, current_item in fires_dict.items():
+        for key, item in fires_dict.items():
+            if key > current_key:
+                current_date_obj = datetime.strptime(current_item["dt"].split(" ")[0], "%d.%m.%Y")
+                date_obj = datetime.strptime(item["dt"].split(" ")[0], "%d.%m.%Y")
+                days = abs((date_obj - current_date_obj).days)
+                if days <= 1 or (2 < days < 10):
+                    shape1 = shapely.wkb.loads(current_item["poly"], hex=True)
+                    shape2 = shapely.wkb.loads(item["poly"], hex=True)
+                    if shape1.intersects(shape2):
+                        if current_item["new_fire_id"] == "":
+                            item["new_fire_id"] = index
+                        else:
+                            item["new_fire_id"] = current_item["new_fire_id"]
+                else:
+                    break
+        if current_item["new_fire_id"] == "":
+            current_item["new_fire_id"] = index
+            index += 1
+
+    return fires_dict
+
+
+def get_fires_dict(count, seed, deleted=()):
+    geometries = get_fire_geometries(count, seed)
+    days = get_fire_days(count, seed)
+    fires_dict = GeometryDict()
+    for key in range(count):
+        fires_dict[key] = {"poly": shapely.to_wkb(geometries[key], hex=True), "dt": get_date(days[key]),
+                           "new_fire_id": ""}
+    # Слой геометрий строится до удаления пожаров (как при удалении пожаров на предыдущих этапах)
+    add_geometry_layer(fires_dict, "poly")
+    for key in set(deleted):
+        fires_dict.pop(key)
+
+    return fires_dict
+
+
+@pytest.mark.parametrize("deleted", [(), tuple(range(0, 120, 4)) + tuple(range(40, 70))])
+def test_identify_fire_by_dates_matches_linear_scan(deleted, capsys):
+    fires_dict = identify_fire_by_dates(get_fires_dict(120, 5, deleted))
+    expected = linear_identify_fire_by_dates(get_fires_dict(120, 5, deleted))
+    assert {key: item["new_fire_id"] for key, item in fires_dict.items()} == \
+           {key: item["new_fire_id"] for key, item in expected.items()}
+
+
+def get_geographic_geometries(count, seed):
+    # Точки, линии и полигоны в географических координатах (в районе Иркутской области)
+    rng = np.random.default_rng(seed)
+    geometries = []
+    for x, y in zip(rng.uniform(100, 110, size=count), rng.uniform(51, 58, size=count)):
+        kind = rng.integers(3)
+        if kind == 0:
+            geometries.append(shapely.Point(x, y))
+        elif kind == 1:
+            geometries.append(shapely.LineString([(x, y), (x + rng.uniform(-1, 1), y + rng.uniform(-1, 1))]))
+        else:
+            geometries.append(shapely.box(x, y, x + rng.uniform(0.01, 0.5), y + rng.uniform(0.01, 0.5)))
+
+    return geometries
+
+
+def linear_get_min_distance(polygon, geom_dict):
+    # Исходный перебор всех объектов слоя с перепроецированием каждой пары (до построения индекса)
+    min_distance = 99999
+    for geom_item in geom_dict.values():
+        geom_polygon = shapely.wkb.loads(geom_item["geom"], hex=True)
+        current_distance = get_distance(polygon, geom_polygon)
+        if min_distance > current_distance:
+            min_distance = current_distance
+
+    return "{:.3f}".format(min_distance)
+
+
+@pytest.mark.parametrize("count", [0, 1, 5, 200])
+def test_nearest_feature_index_matches_linear_scan(count):
+    geom_dict = {key: {"geom": shapely.to_wkb(geometry, hex=True)}
+                 for key, geometry in enumerate(get_geographic_geometries(count, count))}
+    index = NearestFeatureIndex(geom_dict)
+    assert len(index) == count
+    for polygon in get_geographic_geometries(30, count + 1):
+        assert index.get_min_distance(reproject(polygon)) == linear_get_min_distance(polygon, geom_dict)
+
+
+def get_layer(geometries, missing=()):
+    # Слой с ключами-строками и нечитаемыми геометриями на позициях missing
+    values = shapely.to_wkb(geometries, hex=True).astype(object)
+    values[list(missing)] = "not a geometry"
+
+    return GeometryLayer(["key_" + str(position) for position in range(len(geometries))], values)
+
+
+def test_spatial_join_matches_linear_scan(capsys):
+    left_geometries = get_fire_geometries(150, 21)
+    right_geometries = [shapely.box(x, y, x + 2, y + 2) for x, y in np.random.default_rng(22).uniform(0, 10, (80, 2))]
+    left_layer = get_layer(left_geometries, missing=(3, 40))
+    right_layer = get_layer(right_geometries, missing=(0, 17))
+    join = spatial_join(left_layer, right_layer)
+    # Исходный перебор всех пар объектов (до построения соединения)
+    expected = {left_key: [right_key for right_key in right_layer.keys
+                           if left_layer.geometry(left_key) is not None
+                           and right_layer.geometry(right_key) is not None
+                           and left_layer.geometry(left_key).intersects(right_layer.geometry(right_key))]
+                for left_key in left_layer.keys}
+    assert len(join) == sum(len(right_keys) for right_keys in expected.values())
+    for left_key, right_keys in expected.items():
+        assert join.get_right_keys(left_key) == right_keys
+        assert join.has_matches(left_key) == (len(right_keys) != 0)
+    assert get_spatial_join(left_layer, right_layer) is get_spatial_join(left_layer, right_layer)
+
+
+def linear_get_components(geometries):
+    # Перебор всех пар объектов с переразметкой компонент при каждом найденном пересечении
+    components = list(range(len(geometries)))
+    for first in range(len(geometries)):
+        for second in range(first + 1, len(geometries)):
+            if geometries[first] is not None and geometries[second] is not None and \
+                    geometries[first].intersects(geometries[second]):
+                old_component, new_component = components[second], components[first]
+                components = [new_component if component == old_component else component
+                              for component in components]
+
+    return components
+
+
+def get_partition(components):
+    # Разбиение объектов на компоненты независимо от выбора номеров компонент
+    groups = dict()
+    for position, component in enumerate(components):
+        groups.setdefault(component, []).append(position)
+
+    return sorted(groups.values())
+
+
+@pytest.mark.parametrize("count, seed", [(1, 1), (30, 2), (200, 3), (400, 4)])
+def test_intersection_components_match_linear_scan(count, seed, capsys):
+    geometries = get_fire_geometries(count, seed)
+    layer = get_layer(geometries, missing=range(0, count, 17))
+    components = get_intersection_components(layer)
+    assert len(components) == count
+    assert get_partition(components.tolist()) == get_partition(linear_get_components(layer.geometries()))
+    # Компоненты по части объектов слоя (в порядке переданных ключей)
+    keys = layer.keys[::-3]
+    components = get_intersection_components(layer, keys)
+    assert get_partition(components.tolist()) == get_partition(linear_get_components(layer.geometries(keys)))
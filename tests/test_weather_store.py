@@ -0,0 +1,90 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import geoanalytics.preprocess as gp
+from geoanalytics.weather_store import get_station_store
+
+
+STATION_ID = 30507
+HEADER = '"Местное время в Икее";"T";"Po";"U";"Ff";"DD";"WW";"W1";"W2";"Tn";"Tx";"Td";"RRR"\n'
+
+
+@pytest.fixture
+def weather_directory(tmp_path, monkeypatch):
+    directory = tmp_path / gp.DATA_DIR_NAME / gp.WEATHER_DIR_NAME
+    directory.mkdir(parents=True)
+    (tmp_path / "run").mkdir()
+    monkeypatch.chdir(tmp_path / "run")
+
+    return directory
+
+
+def write_weather_file(directory, period, rows, version):
+    file = directory / ("Икей " + str(STATION_ID) + "." + period + ".1.0.0.ru.ansi.00000000.csv")
+    file.write_text(HEADER + "".join('"' + moment + '";' + str(value) + ';;;;;;;;;;;""\n' for moment, value in rows),
+                    encoding="utf-8")
+    # Явные моменты изменения файла и каталога (изменение файла в пределах одного тика часов не пропускается)
+    os.utime(file, ns=(version * 10 ** 9, version * 10 ** 9))
+    os.utime(directory, ns=(version * 10 ** 9, version * 10 ** 9))
+
+
+def get_observations(update=True):
+    store = get_station_store(gp.WEATHER_DIR_NAME)
+    if update:
+        store.update(STATION_ID)
+    series = store.get_series(STATION_ID)
+
+    return dict(zip(series.datetimes.astype(str).tolist(), series.columns["T"].tolist()))
+
+
+def test_earlier_period_file_is_merged(weather_directory):
+    write_weather_file(weather_directory, "01.01.2017.31.12.2017", [("01.01.2017 03:00", 1), ("02.01.2017 03:00", 2)],
+                       1)
+    assert get_observations() == {"2017-01-01T03:00:00": 1.0, "2017-01-02T03:00:00": 2.0}
+    # Выгрузка за более ранний период (ее название идет после названия загруженного файла)
+    write_weather_file(weather_directory, "01.06.2016.31.12.2016", [("01.06.2016 03:00", 3), ("31.12.2016 21:00", 4)],
+                       2)
+    assert get_observations() == {"2016-06-01T03:00:00": 3.0, "2016-12-31T21:00:00": 4.0,
+                                  "2017-01-01T03:00:00": 1.0, "2017-01-02T03:00:00": 2.0}
+
+
+def test_last_loaded_file_wins(weather_directory):
+    write_weather_file(weather_directory, "01.01.2017.31.12.2017", [("01.01.2017 03:00", 1), ("02.01.2017 03:00", 2)],
+                       1)
+    write_weather_file(weather_directory, "01.06.2016.31.12.2017", [("31.12.2016 21:00", 3), ("01.01.2017 03:00", 4)],
+                       2)
+    assert get_observations() == {"2016-12-31T21:00:00": 3.0, "2017-01-01T03:00:00": 4.0,
+                                  "2017-01-02T03:00:00": 2.0}
+    # Уточненные значения в загруженном ранее файле заменяют его прежние значения и значения других файлов
+    write_weather_file(weather_directory, "01.01.2017.31.12.2017", [("01.01.2017 03:00", 5), ("02.01.2017 03:00", 6),
+                                                                    ("03.01.2017 03:00", 7)], 3)
+    assert get_observations() == {"2016-12-31T21:00:00": 3.0, "2017-01-01T03:00:00": 5.0,
+                                  "2017-01-02T03:00:00": 6.0, "2017-01-03T03:00:00": 7.0}
+    store = get_station_store(gp.WEATHER_DIR_NAME)
+    manifest = store.get_manifest(STATION_ID)
+    assert len(manifest["segments"]) == 2
+    assert sorted(path.name for path in store.get_station_directory(STATION_ID).glob("segment_*.npz")) == \
+           ["segment_{:05d}.npz".format(segment) for _, segment in sorted(manifest["segments"], key=lambda s: s[1])]
+
+
+def test_store_with_high_water_mark_is_rebuilt(weather_directory):
+    write_weather_file(weather_directory, "01.01.2017.31.12.2017", [("01.01.2017 03:00", 1)], 1)
+    store = get_station_store(gp.WEATHER_DIR_NAME)
+    station_directory = store.get_station_directory(STATION_ID)
+    station_directory.mkdir(parents=True)
+    np.savez(station_directory / "segment_00000.npz", datetime=np.array(["2016-01-01T03:00"], dtype="datetime64[s]"))
+    with open(station_directory / "manifest.json", "w", encoding="utf-8") as file:
+        json.dump({"files": {}, "segments": 1, "last_datetime": "2017-12-31T00:00:00"}, file)
+    assert get_observations() == {"2017-01-01T03:00:00": 1.0}
+
+
+def test_files_are_checked_once_per_process(weather_directory, monkeypatch):
+    write_weather_file(weather_directory, "01.01.2017.31.12.2017", [("01.01.2017 03:00", 1)], 1)
+    assert get_observations(update=False) == {"2017-01-01T03:00:00": 1.0}
+    store = get_station_store(gp.WEATHER_DIR_NAME)
+    monkeypatch.setattr(store, "update", lambda station_id: pytest.fail("csv-files are checked again"))
+    write_weather_file(weather_directory, "01.01.2017.31.12.2017", [("01.01.2017 03:00", 2)], 2)
+    assert get_observations(update=False) == {"2017-01-01T03:00:00": 1.0}